@@ -0,0 +1,40 @@
+"""Measures the throughput of the sequential (`Xsct.do`) and the pipelined (`Xsct.do_many`) command
+execution against the dummy XSCT server.
+"""
+import argparse
+import time
+
+import pylinx
+
+
+def bench(xsct, commands, pipelined):
+    start = time.perf_counter()
+    if pipelined:
+        xsct.do_many(commands)
+    else:
+        for cmd in commands:
+            xsct.do(cmd)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Xsct pipelining benchmark')
+    parser.add_argument('-n', type=int, default=2000, help='Number of commands.')
+    parser.add_argument('--delay', type=int, default=0,
+                        help='Emulated processing time of the dummy server in milliseconds.')
+    parser.add_argument('--port', type=int, default=pylinx.core.PORT)
+    args = parser.parse_args()
+
+    xsct_server = pylinx.XsctServer()
+    xsct_server._start_dummy_server(port=args.port, delay=args.delay, wait_ready=True)
+    xsct = pylinx.Xsct(port=args.port)
+    try:
+        commands = ['incr i'] * args.n
+        sequential = bench(xsct, commands, pipelined=False)
+        pipelined = bench(xsct, commands, pipelined=True)
+        print('sequential: {:8.3f} s  {:10.1f} cmd/s'.format(sequential, args.n / sequential))
+        print('pipelined:  {:8.3f} s  {:10.1f} cmd/s'.format(pipelined, args.n / pipelined))
+        print('speedup:    {:8.2f}x'.format(sequential / pipelined))
+    finally:
+        xsct.close()
+        xsct_server.stop_server()
@@ -1,10 +1,20 @@
 # __init__.py
 from .core import Xsct
+from .core import AsyncXsct
+from .core import XsctPool
 from .core import Vivado
 from .core import XsctServer
+from .core import XsctServerFleet
 from .core import PylinxException
 from .core import VivadoHWServer
+from .core import VivadoPool
 
 from .gt_util import ScanStructure
+from .gt_util import IncrementalScanReader
+from .gt_util import ScanPruner
+from .scan_analysis import analyze_scans
+from .scan_catalog import ScanCatalog
+from .sweep import SweepScheduler
+from .sweep import SweepLink
 
 from .util import __version__
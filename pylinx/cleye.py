@@ -12,7 +12,21 @@ __here__ = os.path.dirname(os.path.realpath(__file__))
 __pylinx__ = os.path.join(__here__, '..')
 sys.path.insert(0, __pylinx__)
 
-from pylinx import ScanStructure
+from pylinx import ScanPruner
+from pylinx.journal import SweepJournal
+from pylinx.optimizer import CoordinateDescent
+from pylinx.optimizer import ParameterSpace
+from pylinx.optimizer import dedupe_values
+from pylinx.optimizer import PatternSearch
+from pylinx.optimizer import SurrogateSearch
+from pylinx.optimizer import optimize
+from pylinx.sweep import COARSE
+from pylinx.sweep import FINE
+from pylinx.sweep import SweepLink
+from pylinx.sweep import apply_settings
+from pylinx.sweep import measure_point
+from pylinx.sweep import scan_filename
+from pylinx.sweep import screen_and_confirm
 from pylinx import VivadoHWServer
 from pylinx import __version__
 from pylinx import PylinxException
@@ -40,7 +54,33 @@ else:
     vivado_path = 'Cannot find out Vivado executable.'
 
 
-def init(rx_hw_server_url="localhost:3121", tx_hw_server_url="localhost:3121"):
+def init(rx_hw_server_url="localhost:3121", tx_hw_server_url="localhost:3121", pool=None):
+    """ Spawns the TX and RX Vivado instances.
+
+    :param rx_hw_server_url: The hw_server of the RX side.
+    :param tx_hw_server_url: The hw_server of the TX side.
+    :param pool: A VivadoPool of VivadoHWServer sessions. The pre-spawned sessions are used instead of
+        spawning new ones. They are connected by the factory of the pool, so they must be connected to the
+        hw_server(s) given above, otherwise PylinxException is raised.
+    :return: vivado_tx, vivado_rx
+    """
+    if pool is not None:
+        logger.info('Acquiring Vivado instances (TX/RX) from the pool')
+        sessions = []
+        try:
+            for name, url in (('TX', tx_hw_server_url), ('RX', rx_hw_server_url)):
+                session = pool.acquire()
+                sessions.append(session)
+                if session.hw_server_url != url:
+                    raise PylinxException('The {} session of the pool is connected to {} instead of {}'.format(
+                        name, session.hw_server_url, url))
+                session.name = name
+        except PylinxException:
+            for session in sessions:
+                pool.release(session)
+            raise
+        return tuple(sessions)
+
     logger.info('Spawning Vivado instances (TX/RX)')
     vivado_tx = VivadoHWServer(vivado_path, tx_hw_server_url, name='TX')
     vivado_rx = VivadoHWServer(vivado_path, rx_hw_server_url, name='RX')
@@ -64,126 +104,139 @@ def choose_link(vivado_tx, vivado_rx):
     vivado_rx.choose_sio()
 
 
-def independent_finder(vivadoTX, vivadoRX, results_dir='runs'):
+TXDIFFSWING_values = [
+    # "{269 mV (0000)}" ,
+    # "{336 mV (0001)}" ,
+    # "{407 mV (0010)}" ,
+    # "{474 mV (0011)}" ,
+    # "{543 mV (0100)}" ,
+    # "{609 mV (0101)}" ,
+    # "{677 mV (0110)}" ,
+    # "{741 mV (0111)}" ,
+    # "{807 mV (1000)}" ,
+    # "{866 mV (1001)}" ,
+    # "{924 mV (1010)}" ,
+    "{973 mV (1011)}",
+    "{1018 mV (1100)}",
+    "{1056 mV (1101)}",
+    "{1092 mV (1110)}",
+    "{1119 mV (1111)}"
+]
+
+TXPRE_values = [
+    "{0.00 dB (00000)}",
+    "{0.22 dB (00001)}",
+    "{0.45 dB (00010)}",
+    "{0.68 dB (00011)}",
+    "{0.92 dB (00100)}",
+    # "{1.16 dB (00101)}",
+    # "{1.41 dB (00110)}",
+    # "{1.67 dB (00111)}",
+    # "{1.94 dB (01000)}",
+    # "{2.21 dB (01001)}",
+    # "{2.50 dB (01010)}",
+    # "{2.79 dB (01011)}",
+    # "{3.10 dB (01100)}",
+    # "{3.41 dB (01101)}",
+    # "{3.74 dB (01110)}",
+    # "{4.08 dB (01111)}",
+    # "{4.44 dB (10000)}",
+    # "{4.81 dB (10001)}",
+    # "{5.19 dB (10010)}",
+    # "{5.60 dB (10011)}",
+    # "{6.02 dB (10100)}",
+    # "{6.02 dB (10101)}",
+    # "{6.02 dB (10110)}",
+    # "{6.02 dB (10111)}",
+    # "{6.02 dB (11000)}",
+    # "{6.02 dB (11001)}",
+    # "{6.02 dB (11010)}",
+    # "{6.02 dB (11011)}",
+    # "{6.02 dB (11100)}",
+    # "{6.02 dB (11101)}",
+    # "{6.02 dB (11110)}",
+    # "{6.02 dB (11111)}",
+]
+
+TXPOST_values = [
+    # "{0.00 dB (00000)}",
+    # "{0.22 dB (00001)}",
+    "{0.45 dB (00010)}",
+    "{0.68 dB (00011)}",
+    "{0.92 dB (00100)}",
+    "{1.16 dB (00101)}",
+    "{1.41 dB (00110)}",
+    # "{1.67 dB (00111)}",
+    # "{1.94 dB (01000)}",
+    # "{2.21 dB (01001)}",
+    # "{2.50 dB (01010)}",
+    # "{2.79 dB (01011)}",
+    # "{3.10 dB (01100)}",
+    # "{3.41 dB (01101)}",
+    # "{3.74 dB (01110)}",
+    # "{4.08 dB (01111)}",
+    # "{4.44 dB (10000)}",
+    # "{4.81 dB (10001)}",
+    # "{5.19 dB (10010)}",
+    # "{5.60 dB (10011)}",
+    # "{6.02 dB (10100)}",
+    # "{6.47 dB (10101)}",
+    # "{6.94 dB (10110)}",
+    # "{7.43 dB (10111)}",
+    # "{7.96 dB (11000)}",
+    # "{8.52 dB (11001)}",
+    # "{9.12 dB (11010)}",
+    # "{9.76 dB (11011)}",
+    # "{10.46 dB (11100)}",
+    # "{11.21 dB (11101)}",
+    # "{12.04 dB (11110)}",
+    # "{12.96 dB (11111)}",
+]
+
+RXTERM_values = [
+    "{100 mV}",
+    "{200 mV}",
+    "{250 mV}",
+    "{300 mV}",
+    "{350 mV}",
+    "{400 mV}",
+    "{500 mV}",
+    "{550 mV}",
+    "{600 mV}",
+    "{700 mV}",
+    "{800 mV}",
+    "{850 mV}",
+    "{900 mV}",
+    "{950 mV}",
+    "{1000 mV}",
+    "{1100 mV}",
+]
+
+
+def independent_finder(vivadoTX, vivadoRX, results_dir='runs', pruner=None, progress_interval=1.0, journal=None):
     """ Runs the optimizer algorithm.
-    """
-    TXDIFFSWING_values = [
-        # "{269 mV (0000)}" ,
-        # "{336 mV (0001)}" ,
-        # "{407 mV (0010)}" ,
-        # "{474 mV (0011)}" ,
-        # "{543 mV (0100)}" ,
-        # "{609 mV (0101)}" ,
-        # "{677 mV (0110)}" ,
-        # "{741 mV (0111)}" ,
-        # "{807 mV (1000)}" ,
-        # "{866 mV (1001)}" ,
-        # "{924 mV (1010)}" ,
-        "{973 mV (1011)}",
-        "{1018 mV (1100)}",
-        "{1056 mV (1101)}",
-        "{1092 mV (1110)}",
-        "{1119 mV (1111)}"
-    ]
-
-    TXPRE_values = [
-        "{0.00 dB (00000)}",
-        "{0.22 dB (00001)}",
-        "{0.45 dB (00010)}",
-        "{0.68 dB (00011)}",
-        "{0.92 dB (00100)}",
-        # "{1.16 dB (00101)}",
-        # "{1.41 dB (00110)}",
-        # "{1.67 dB (00111)}",
-        # "{1.94 dB (01000)}",
-        # "{2.21 dB (01001)}",
-        # "{2.50 dB (01010)}",
-        # "{2.79 dB (01011)}",
-        # "{3.10 dB (01100)}",
-        # "{3.41 dB (01101)}",
-        # "{3.74 dB (01110)}",
-        # "{4.08 dB (01111)}",
-        # "{4.44 dB (10000)}",
-        # "{4.81 dB (10001)}",
-        # "{5.19 dB (10010)}",
-        # "{5.60 dB (10011)}",
-        # "{6.02 dB (10100)}",
-        # "{6.02 dB (10101)}",
-        # "{6.02 dB (10110)}",
-        # "{6.02 dB (10111)}",
-        # "{6.02 dB (11000)}",
-        # "{6.02 dB (11001)}",
-        # "{6.02 dB (11010)}",
-        # "{6.02 dB (11011)}",
-        # "{6.02 dB (11100)}",
-        # "{6.02 dB (11101)}",
-        # "{6.02 dB (11110)}",
-        # "{6.02 dB (11111)}",
-    ]
-
-    TXPOST_values = [
-        # "{0.00 dB (00000)}",
-        # "{0.22 dB (00001)}",
-        "{0.45 dB (00010)}",
-        "{0.68 dB (00011)}",
-        "{0.92 dB (00100)}",
-        "{1.16 dB (00101)}",
-        "{1.41 dB (00110)}",
-        # "{1.67 dB (00111)}",
-        # "{1.94 dB (01000)}",
-        # "{2.21 dB (01001)}",
-        # "{2.50 dB (01010)}",
-        # "{2.79 dB (01011)}",
-        # "{3.10 dB (01100)}",
-        # "{3.41 dB (01101)}",
-        # "{3.74 dB (01110)}",
-        # "{4.08 dB (01111)}",
-        # "{4.44 dB (10000)}",
-        # "{4.81 dB (10001)}",
-        # "{5.19 dB (10010)}",
-        # "{5.60 dB (10011)}",
-        # "{6.02 dB (10100)}",
-        # "{6.47 dB (10101)}",
-        # "{6.94 dB (10110)}",
-        # "{7.43 dB (10111)}",
-        # "{7.96 dB (11000)}",
-        # "{8.52 dB (11001)}",
-        # "{9.12 dB (11010)}",
-        # "{9.76 dB (11011)}",
-        # "{10.46 dB (11100)}",
-        # "{11.21 dB (11101)}",
-        # "{12.04 dB (11110)}",
-        # "{12.96 dB (11111)}",
-    ]
-
-    RXTERM_values = [
-        "{100 mV}",
-        "{200 mV}",
-        "{250 mV}",
-        "{300 mV}",
-        "{350 mV}",
-        "{400 mV}",
-        "{500 mV}",
-        "{550 mV}",
-        "{600 mV}",
-        "{700 mV}",
-        "{800 mV}",
-        "{850 mV}",
-        "{900 mV}",
-        "{950 mV}",
-        "{1000 mV}",
-        "{1100 mV}",
-    ]
 
+    :param pruner: A ScanPruner. If it is given, the partial results of the scans are evaluated while
+        they are running and the hopeless scans are stopped early (their open area is 0.0).
+    :param progress_interval: The period of the partial results (in seconds) if the pruner is used.
+    :param journal: A SweepJournal. The completed points are recorded in it. The points already completed
+        in the journal (with intact scan files) are not scanned again and the best settings recorded in
+        it are restored at the start.
+    """
     globalIteration = 1
     globalParameterSpace = {}
-    globalParameterSpace["TXDIFFSWING"] = TXDIFFSWING_values  # [0::2]
-    globalParameterSpace["TXPRE"] = TXPRE_values  # [0::2]
-    globalParameterSpace["TXPOST"] = TXPOST_values  # [0::2]
+    globalParameterSpace["TXDIFFSWING"] = dedupe_values(TXDIFFSWING_values)  # [0::2]
+    globalParameterSpace["TXPRE"] = dedupe_values(TXPRE_values)  # [0::2]
+    globalParameterSpace["TXPOST"] = dedupe_values(TXPOST_values)  # [0::2]
 
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
 
+    txSioGt = '[get_hw_sio_gts {}]'.format(vivadoTX.sio)
+    if journal is not None and journal.best:
+        logger.info('Restoring the best settings: {}'.format(journal.best))
+        apply_settings(vivadoTX, journal.best)
+
     try:
         read_results_tcl = open("read_results.tcl", "w")
         read_results_tcl.writelines('# Generated file by Cleye' + os.linesep)
@@ -195,7 +248,6 @@ def independent_finder(vivadoTX, vivadoRX, results_dir='runs'):
             for pName, pValues in globalParameterSpace.items():
                 openAreas = []
                 maxArea = 0
-                txSioGt = '[get_hw_sio_gts {}]'.format(vivadoTX.sio)
                 bestValue = vivadoTX.get_property(pName, txSioGt)
 
                 for pValue in pValues:
@@ -203,20 +255,35 @@ def independent_finder(vivadoTX, vivadoRX, results_dir='runs'):
                     # Test keyboard interrupt:
                     time.sleep(.01)
 
-                    logger.info("Create scan ({} {})".format(pName, pValue))
-                    vivadoTX.set_property(pName, pValue, txSioGt)
-                    vivadoTX.do('commit_hw_sio ' + txSioGt)
+                    scan_name = "{}{}{}".format(i, pName, pValue)
+                    scan_name = re.sub('\\W', '_', scan_name)
+                    fname = os.path.join(results_dir, scan_name + '.csv')
 
-                    checkValue = vivadoTX.get_property(pName, txSioGt)
+                    point = {'iteration': i, 'parameter': pName, 'value': pValue}
+                    record = journal.completed(point) if journal is not None else None
+                    if record is not None:
+                        open_area = record['metrics']['open_area']
+                        logger.info('Already scanned, skipped: open_area: {}  (parameters: {} = {})'.format(
+                            open_area, pName, pValue))
+                        read_results_tcl.writelines('read_hw_sio_scan ' + os.path.abspath(fname) + os.linesep)
+                        openAreas.append(open_area)
+                        if open_area > maxArea:
+                            maxArea = open_area
+                            bestValue = pValue
+                        continue
+
+                    logger.info("Create scan ({} {})".format(pName, pValue))
+                    # Set, commit and read back the property in one round trip.
+                    _, _, checkValue = vivadoTX.do_batch([
+                        'set_property {} {} {}'.format(pName, pValue, txSioGt),
+                        'commit_hw_sio ' + txSioGt,
+                        'get_property {} {}'.format(pName, txSioGt)])
                     if checkValue not in pValue:  # Readback does not contains brackets {}
                         logger.error("Something went wrong. Cannot set value {}  {} ".format(checkValue, pValue))
 
                     # set_property PORT.GTRXRESET 0 [get_hw_sio_gts  {localhost:3121/xilinx_tcf/Digilent/210203A2513BA/0_1_0/IBERT/Quad_113/MGT_X1Y0}]
                     # commit_hw_sio  [get_hw_sio_gts  {localhost:3121/xilinx_tcf/Digilent/210203A2513BA/0_1_0/IBERT/Quad_113/MGT_X1Y0}]
 
-                    scan_name = "{}{}{}".format(i, pName, pValue)
-                    scan_name = re.sub('\\W', '_', scan_name)
-                    fname = os.path.join(results_dir, scan_name + '.csv')
                     read_results_tcl.writelines('read_hw_sio_scan ' + os.path.abspath(fname) + os.linesep)
 
                     # HORIZONTAL_INCREMENT: The greater value sorter scan time
@@ -241,14 +308,28 @@ def independent_finder(vivadoTX, vivadoRX, results_dir='runs'):
                     # of which port the scan plot s for.
                     scan_description = scan_name
 
-                    cmd = 'run_scan "{}" {} {} {} {} {}'.format(
-                        fname, hincr, vincr, scanType, link_name, scan_description)
-                    vivadoRX.do(cmd, errmsgs=['ERROR: ', 'args: should be'])
-
-                    scan_struc = ScanStructure(fname)
-                    open_area = scan_struc.get_open_area()
+                    on_progress = None
+                    prune_reasons = []
+                    if pruner is not None:
+                        def on_progress(reader, best=maxArea):
+                            reason = pruner.check(reader, best)
+                            if reason:
+                                prune_reasons.append(reason)
+                            return bool(reason)
+
+                    scan_struc = vivadoRX.run_scan(fname, hincr, vincr, scanType, link_name, scan_description,
+                                                   on_progress=on_progress, progress_interval=progress_interval)
+                    if vivadoRX.last_scan_stopped:
+                        logger.info('Scan pruned ({}): {}'.format(prune_reasons[0], fname))
+                        read_results_tcl.writelines('# pruned ({}): {}'.format(prune_reasons[0], fname) + os.linesep)
+                        open_area = 0.0
+                    else:
+                        open_area = scan_struc.get_open_area()
                     if open_area is None:
                         logger.error('open_area is None after reading file: ' + fname)
+                    if journal is not None:
+                        journal.record_point(point, fname, {'open_area': open_area,
+                                                            'pruned': vivadoRX.last_scan_stopped})
 
                     logger.info('open_area: {}  (parameters: {} = {})'.format(open_area, pName, pValue))
                     openAreas.append(open_area)
@@ -261,9 +342,132 @@ def independent_finder(vivadoTX, vivadoRX, results_dir='runs'):
 
                 vivadoTX.set_property(pName, bestValue, txSioGt)
                 vivadoTX.do('commit_hw_sio ' + txSioGt)
+                if journal is not None:
+                    journal.record_best(pName, bestValue)
     finally:
         read_results_tcl.close()
 
+
+def optimizing_finder(vivadoTX, vivadoRX, strategy=None, budget=None, results_dir='runs', pruner=None,
+                      progress_interval=1.0, journal=None):
+    """ Searches the best TX settings with a sample-efficient strategy (see pylinx.optimizer) instead of
+    the exhaustive sweeps of independent_finder. The values with the same label are scanned only once.
+
+    :param strategy: CoordinateDescent (default), PatternSearch or SurrogateSearch
+    :param budget: The maximum number of evaluations (including the ones taken from the journal). None: no
+        limit.
+    :param pruner: See independent_finder
+    :param progress_interval: See independent_finder
+    :param journal: A SweepJournal. The scans and the best settings found so far are recorded in it. The
+        search starts from the best settings of the journal and the settings already scanned (with intact
+        scan files) are not scanned again.
+    :return: The best settings (dict) and its open area.
+    """
+    space = ParameterSpace([
+        ("TXDIFFSWING", TXDIFFSWING_values),
+        ("TXPRE", TXPRE_values),
+        ("TXPOST", TXPOST_values),
+    ])
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+    txSioGt = '[get_hw_sio_gts {}]'.format(vivadoTX.sio)
+    scores = []
+
+    def evaluate(settings):
+        record = journal.completed(dict(settings)) if journal is not None else None
+        if record is not None:
+            score = record['metrics']['open_area']
+            logger.info('Already scanned, skipped: open_area: {}  (parameters: {})'.format(score, dict(settings)))
+            scores.append(score)
+            return score
+
+        apply_settings(vivadoTX, settings)
+        fname = os.path.join(results_dir, scan_filename(len(scores), settings))
+        on_progress = None
+        if pruner is not None:
+            best = max(scores, default=0.0)
+
+            def on_progress(reader):
+                return bool(pruner.check(reader, best))
+
+        scan_struc = vivadoRX.run_scan(fname, 4, 4, "2d_full_eye", "*", os.path.basename(fname)[:-4],
+                                       on_progress=on_progress, progress_interval=progress_interval)
+        if vivadoRX.last_scan_stopped:
+            logger.info('Scan pruned: ' + fname)
+            score = 0.0
+        else:
+            score = scan_struc.get_open_area()
+        if journal is not None:
+            journal.record_point(dict(settings), fname, {'open_area': score, 'pruned': vivadoRX.last_scan_stopped})
+            if score > max(scores, default=-1.0):
+                for name, value in settings.items():
+                    journal.record_best(name, value)
+        scores.append(score)
+        return score
+
+    if journal is not None and all(name in journal.best for name in space.names):
+        # Resume from the best settings found so far.
+        start = dict((name, journal.best[name]) for name in space.names)
+    else:
+        # Start from the current settings. (Readback does not contains brackets {})
+        start = dict((name, '{' + vivadoTX.get_property(name, txSioGt) + '}') for name in space.names)
+    if not all(start[name] in values for name, values in zip(space.names, space.values)):
+        start = None
+    objective = optimize(space, evaluate, strategy, budget, start)
+
+    best = space.settings(objective.best_point)
+    print("Best settings:  {}    open area: {}  ({} scans)".format(dict(best), objective.best_score,
+                                                                   objective.evaluations))
+    apply_settings(vivadoTX, best)
+    return best, objective.best_score
+
+
+def multi_fidelity_finder(vivadoTX, vivadoRX, top_k=3, results_dir='runs', coarse=COARSE, fine=FINE,
+                          journal=None):
+    """ Screens all the TX settings with cheap (coarse) scans, then re-scans only the top_k of them with
+    full resolution 2D eyes. The settings are ranked by the normalized score (see
+    eye_metrics.normalized_metrics), which is comparable between the fidelities.
+
+    :param top_k: The number of the settings confirmed by fine scans.
+    :param coarse: The ScanFidelity of the screening.
+    :param fine: The ScanFidelity of the confirmation.
+    :param journal: A SweepJournal. The scans are recorded in it, the scans already completed in the
+        journal (with intact scan files) are not scanned again.
+    :return: The best settings (dict) and its fine metrics.
+    """
+    space = ParameterSpace([
+        ("TXDIFFSWING", TXDIFFSWING_values),
+        ("TXPRE", TXPRE_values),
+        ("TXPOST", TXPOST_values),
+    ])
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+    link = SweepLink('cleye', vivadoTX, vivadoRX)
+    points = [space.settings(point) for point in space.points()]
+
+    def measure(settings, fidelity):
+        point = dict(settings, fidelity=fidelity.name)
+        record = journal.completed(point) if journal is not None else None
+        if record is not None:
+            logger.info('Already scanned, skipped: {} score: {}  (parameters: {})'.format(
+                fidelity.name, record['metrics']['score'], dict(settings)))
+            return record['metrics']
+        index = points.index(settings)
+        fname = os.path.join(results_dir, scan_filename(index, settings, '_' + fidelity.name))
+        metrics = measure_point(link, settings, fname, fidelity)
+        if journal is not None:
+            journal.record_point(point, fname, metrics)
+        logger.info('{} score: {}  (parameters: {})'.format(fidelity.name, metrics['score'], dict(settings)))
+        return metrics
+
+    results = screen_and_confirm(points, measure, top_k, coarse, fine)
+    best, _, best_metrics = results[0]
+    print("Best settings:  {}    score: {}  ({} coarse, {} fine scans)".format(
+        dict(best), best_metrics['score'], len(points), min(top_k, len(points))))
+    apply_settings(vivadoTX, best)
+    return best, best_metrics
+
+
 def interactiveVivadoConsole(vivadoTX, vivadoRX):
     """ gives full control for user over the two (TX and RX) Vivado consoles.
     """
@@ -302,7 +506,21 @@ if __name__ == '__main__':
 
     parser.add_argument('--version', action='version', version='%(prog)s {}'.format(__version__))
     parser.add_argument('--debug', action='store_true')
+    parser.add_argument('--prune', action='store_true', help='Stop the hopeless scans early.')
+    parser.add_argument('--prune-closed-ber', type=float, default=None,
+                        help='With --prune: stop the scans with closed center (BER above this) too.')
+    parser.add_argument('--strategy', choices=['independent', 'coordinate', 'pattern', 'surrogate', 'multi-fidelity'],
+                        default='independent', help='The search strategy of the TX settings.')
+    parser.add_argument('--budget', type=int, default=None, help='The maximum number of scans of the search.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted sweep: skip the completed points of the journal.')
+    parser.add_argument('--top-k', type=int, default=3,
+                        help='multi-fidelity: the number of settings re-scanned with full resolution.')
     args = parser.parse_args()
+    if args.budget is not None and args.strategy in ('independent', 'multi-fidelity'):
+        parser.error('--budget is not supported by the {} strategy.'.format(args.strategy))
+    if (args.prune or args.prune_closed_ber is not None) and args.strategy == 'multi-fidelity':
+        parser.error('--prune is not supported by the multi-fidelity strategy.')
     if args.debug:
         logger.setLevel(logging.DEBUG)
 
@@ -315,7 +533,22 @@ if __name__ == '__main__':
 
             choose_link(vivado_tx, vivado_rx)
             results_dir = 'runs'
-            independent_finder(vivado_tx, vivado_rx, results_dir=results_dir)
+            pruner = ScanPruner(closed_ber=args.prune_closed_ber) if args.prune else None
+            with SweepJournal(os.path.join(results_dir, 'journal.jsonl'), resume=args.resume) as journal:
+                if args.strategy == 'independent':
+                    independent_finder(vivado_tx, vivado_rx, results_dir=results_dir, pruner=pruner,
+                                       journal=journal)
+                elif args.strategy == 'multi-fidelity':
+                    multi_fidelity_finder(vivado_tx, vivado_rx, args.top_k, results_dir=results_dir,
+                                          journal=journal)
+                else:
+                    strategy = {
+                        'coordinate': CoordinateDescent,
+                        'pattern': PatternSearch,
+                        'surrogate': SurrogateSearch,
+                    }[args.strategy]()
+                    optimizing_finder(vivado_tx, vivado_rx, strategy, args.budget, results_dir=results_dir,
+                                      pruner=pruner, journal=journal)
             print('')
             print('All Script has been run.')
             print('Results stored in "' + results_dir + '" directory.')
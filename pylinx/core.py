@@ -3,16 +3,27 @@
 #
 # Import built in packages
 #
+import asyncio
+import collections
+import contextlib
 import logging
 import platform
 import os
+import queue
 import time
 import socket
 import subprocess
 import signal
+import threading
+import uuid
 import psutil
 from .util import setup_logger
 from .util import PylinxException
+from .util import tcl_quote
+from .util import tcl_split
+from .util import format_ber
+from .gt_util import IncrementalScanReader
+from .gt_util import ScanStructure
 import re
 
 # Import 3th party modules:
@@ -36,60 +47,136 @@ logger = logging.getLogger('pylinx')
 # xsct_line_end is the line endings in the XSCT console. It doesn't depend on the platform. It is
 # always Windows-style \\r\\n.
 xsct_line_end = '\r\n'
+xsct_line_end_bytes = xsct_line_end.encode()
 
 # The default host and port.
 HOST = '127.0.0.1'  # Standard loop-back interface address (localhost)
 PORT = 4567
 
+# The default amount of data read from the xsdbserver's socket at once.
+RECV_BUFSIZE = 64 * 1024
+
+# The maximum length of an answer of the xsdbserver in the asyncio client.
+ASYNC_STREAM_LIMIT = 64 * 1024 * 1024
+
+# The timeout of Vivado.do and Vivado.do_batch, which waits forever. (None is the default timeout of the
+# session.)
+NO_TIMEOUT = object()
+
 
 class XsctServer:
     """The controller of the XSCT server application. This is an optional feature. The commands will
     be given to the client.
     """
 
-    def __init__(self, xsct_executable=None, port=PORT, verbose=False):
+    def __init__(self, xsct_executable=None, port=PORT, verbose=False, wait_ready=False, ready_timeout=30):
         """ Initialize the Server object.
         
         :param xsct_executable: The full-path to the XSCT/XSDB executable
         :param port: TCP port where the server should be started
         :param verbose: True: prints the XSCT's stdout to python's stdout.
+        :param wait_ready: True: wait until the server accepts connections. See `wait_ready`
+        :param ready_timeout: The maximum time to wait for the server in seconds.
         """
         self._xsct_server = None
+        self._start_time = None
+        self.port = port
+        self.startup_latency = None
         if (xsct_executable is not None) and (port is not None):
-            self.start_server(xsct_executable, port, verbose)
+            self.start_server(xsct_executable, port, verbose, wait_ready=wait_ready, ready_timeout=ready_timeout)
 
-    def start_server(self, xsct_executable=None, port=PORT, verbose=False):
+    def start_server(self, xsct_executable=None, port=PORT, verbose=False, wait_ready=False, ready_timeout=30,
+                     new_process_group=False):
         """Starts the server.
 
         :param xsct_executable: The full-path to the XSCT/XSDB executable
         :param port: TCP port where the server should be started
         :param verbose: True: prints the XSCT's stdout to python's stdout.
+        :param wait_ready: True: wait until the server accepts connections. See `wait_ready`
+        :param ready_timeout: The maximum time to wait for the server in seconds.
+        :param new_process_group: True: start the server in its own process group.
         :return: None
         """
         if (xsct_executable is None) or (port is None):
             raise ValueError("xsct_executable and port must be non None.")
         start_server_command = 'xsdbserver start -port {}'.format(port)
         start_command = '{} -eval "{}" -interactive'.format(xsct_executable, start_server_command)
-        self._launch_child(start_command)
+        self.port = port
+        self._launch_child(start_command, verbose, new_process_group)
+        if wait_ready:
+            self.wait_ready(ready_timeout)
 
-    def _start_dummy_server(self):
+    def _start_dummy_server(self, port=PORT, delay=100, wait_ready=False, ready_timeout=30,
+                            new_process_group=False):
         """Starts a dummy server, just for test purposes.
         
+        :param port: TCP port where the dummy server should be started
+        :param delay: The emulated processing time of each command in milliseconds.
+        :param wait_ready: True: wait until the server accepts connections. See `wait_ready`
+        :param ready_timeout: The maximum time to wait for the server in seconds.
+        :param new_process_group: True: start the server in its own process group.
         :return: None
         """
         dummy_executable = os.path.abspath(os.path.join(__here__, 'dummy_xsct.tcl'))
-        start_command = ['tclsh', dummy_executable]
-        self._launch_child(start_command)
+        start_command = ['tclsh', dummy_executable, str(port), str(delay)]
+        self.port = port
+        self._launch_child(start_command, new_process_group=new_process_group)
+        if wait_ready:
+            self.wait_ready(ready_timeout)
 
-    def _launch_child(self, start_command, verbose=False):
+    def _launch_child(self, start_command, verbose=False, new_process_group=False):
         logger.info('Starting xsct server: %s', start_command)
         if verbose:
             stdout = None
         else:
             stdout = open(os.devnull, 'w')
-        self._xsct_server = subprocess.Popen(start_command, stdout=stdout)
+        kwargs = {}
+        if new_process_group:
+            # The server and all of its children can be signalled at once. (See XsctServerFleet)
+            if platform.system() == 'Windows':
+                kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+            else:
+                kwargs['start_new_session'] = True
+        self.startup_latency = None
+        self._start_time = time.monotonic()
+        self._xsct_server = subprocess.Popen(start_command, stdout=stdout, **kwargs)
         logger.info('xsct started with PID: %d', self._xsct_server.pid)
 
+    def wait_ready(self, timeout=30, host=HOST, first_delay=.005, max_delay=.5):
+        """Waits until the server accepts TCP connections. The port is probed repeatedly with
+        exponentially growing delays between the probes.
+
+        :param timeout: The maximum time to wait in seconds (measured from the start of the server).
+        :param host: The address where the server is probed.
+        :param first_delay: The delay after the first failed probe in seconds.
+        :param max_delay: The maximum delay between two probes in seconds.
+        :return: The startup latency: the time from the start of the server until it got ready in
+            seconds. (It is also stored in `startup_latency`.)
+        """
+        if self._xsct_server is None:
+            raise PylinxException('The server is not started.')
+        if self.startup_latency is not None:
+            return self.startup_latency
+        deadline = self._start_time + timeout
+        delay = first_delay
+        while True:
+            if self._xsct_server.poll() is not None:
+                raise PylinxException('The server has exited with code: {}'.format(self._xsct_server.returncode))
+            remaining = deadline - time.monotonic()
+            try:
+                probe = socket.create_connection((host, self.port), timeout=max(min(remaining, 1), .001))
+            except OSError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PylinxException('The server is not ready after {} seconds.'.format(timeout))
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, max_delay)
+                continue
+            probe.close()
+            self.startup_latency = time.monotonic() - self._start_time
+            logger.info('xsct server is ready in %.3f s', self.startup_latency)
+            return self.startup_latency
+
     def stop_server(self, wait=True):
         """Kills the server.
 
@@ -131,17 +218,156 @@ class XsctServer:
         return self._xsct_server.pid
 
 
+def free_port(host=HOST):
+    """Returns a TCP port, which is free at the moment. (The OS chooses it.)
+    """
+    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _signal_process_group(proc, sig):
+    """Sends a signal to the process group led by `proc`. (On Windows only to the process itself.)
+    """
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, sig)
+        elif sig == signal.SIGTERM:
+            proc.terminate()
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        # The whole group has already exited.
+        pass
+
+
+class XsctServerFleet:
+    """Supervisor of many XSCT servers. The servers are started on free ports (chosen automatically),
+    each in its own process group, so a server can be killed with all of its children at once. The
+    whole fleet is stopped in parallel.
+    """
+
+    def __init__(self, xsct_executable=None, verbose=False):
+        """Initializes the fleet. No server is started here.
+
+        :param xsct_executable: The full-path to the XSCT/XSDB executable
+        :param verbose: True: prints the XSCTs' stdout to python's stdout.
+        """
+        self.xsct_executable = xsct_executable
+        self.verbose = verbose
+        self.servers = []  # type: list[XsctServer]
+
+    def start(self, count, wait_ready=True, ready_timeout=30, retries=3):
+        """Starts new servers.
+
+        :param count: Number of the servers to be started.
+        :param wait_ready: True: wait until all the servers accept connections.
+        :param ready_timeout: The maximum time to wait for a server in seconds.
+        :param retries: Number of restarts (on a new port) of a server, which cannot start. (The
+            free port can be taken by someone else before the server starts listening.)
+        :return: The started servers.
+        """
+        if self.xsct_executable is None:
+            raise ValueError("xsct_executable must be non None.")
+
+        def launch(server):
+            server.start_server(self.xsct_executable, free_port(), self.verbose, new_process_group=True)
+
+        return self._start(count, launch, wait_ready, ready_timeout, retries)
+
+    def _start_dummy_servers(self, count, delay=100, wait_ready=True, ready_timeout=30, retries=3):
+        """Starts dummy servers, just for test purposes.
+        """
+        def launch(server):
+            server._start_dummy_server(free_port(), delay, new_process_group=True)
+
+        return self._start(count, launch, wait_ready, ready_timeout, retries)
+
+    def _start(self, count, launch, wait_ready, ready_timeout, retries):
+        new_servers = [XsctServer() for _ in range(count)]
+        # Launch all the servers first, then wait for them: they start up in parallel.
+        for server in new_servers:
+            launch(server)
+        self.servers.extend(new_servers)
+        if wait_ready:
+            for server in new_servers:
+                for retry in range(retries + 1):
+                    try:
+                        server.wait_ready(ready_timeout)
+                        break
+                    except PylinxException:
+                        if retry == retries or server._xsct_server.poll() is None:
+                            raise
+                        logger.warning('xsct server on port %d has exited, restarting...', server.port)
+                        launch(server)
+        return new_servers
+
+    def endpoints(self, host=HOST):
+        """Returns the (host, port) tuples of the running servers. (See XsctPool)
+        """
+        return [(host, server.port) for server in self.servers if server._xsct_server is not None]
+
+    def alive(self):
+        """Returns the liveness of the servers.
+
+        :return: Dict of port -> True if the server process is running.
+        """
+        return dict((server.port, server._xsct_server is not None and server._xsct_server.poll() is None)
+                    for server in self.servers)
+
+    def stop(self, grace=2.0):
+        """Stops all the servers in parallel. All the process groups get SIGTERM. Those servers,
+        which have not exited within `grace` seconds get SIGKILL. The processes are reaped by blocking
+        waits (waitpid) in parallel threads, so the stop takes as long as the slowest server needs.
+
+        :param grace: The time in seconds given to the servers to exit after SIGTERM.
+        :return: The time of the stop in seconds.
+        """
+        start = time.monotonic()
+        procs = [server._xsct_server for server in self.servers if server._xsct_server is not None]
+        for proc in procs:
+            logger.debug("Terminating process group of pid: %d", proc.pid)
+            _signal_process_group(proc, signal.SIGTERM)
+        reapers = [threading.Thread(target=proc.wait, daemon=True) for proc in procs]
+        for reaper in reapers:
+            reaper.start()
+        deadline = time.monotonic() + grace
+        for reaper in reapers:
+            reaper.join(max(0, deadline - time.monotonic()))
+        for proc, reaper in zip(procs, reapers):
+            if reaper.is_alive():
+                logger.warning("Killing process group of pid: %d", proc.pid)
+                _signal_process_group(proc, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+        for reaper in reapers:
+            reaper.join()
+        for server in self.servers:
+            server._xsct_server = None
+        self.servers = []
+        elapsed = time.monotonic() - start
+        logger.info('%d xsct servers stopped in %.3f s', len(procs), elapsed)
+        return elapsed
+
+
 class Xsct:
     """The XSCT client class. This communicates with the server and sends commands.
     """
 
-    def __init__(self, host=HOST, port=PORT):
+    def __init__(self, host=HOST, port=PORT, recv_bufsize=RECV_BUFSIZE):
         """Initializes the client object.
 
         :param host: the URL of the machine address where the XSDB server is running.
         :param port: the port of the the XSDB server is running.
+        :param recv_bufsize: The maximum amount of data read from the socket at once.
         """
         self._socket = None
+        self.address = None
+        self.recv_bufsize = recv_bufsize
+        # Receive buffer: the (possibly partial) answers, which have not been returned yet.
+        # _recv_start: the beginning of the next answer in the buffer.
+        # _recv_scanned: the line-ending is surely not in the buffer before this position.
+        self._recv_buffer = bytearray()
+        self._recv_start = 0
+        self._recv_scanned = 0
 
         if host is not None:
             self.connect(host, port)
@@ -157,6 +383,8 @@ class Xsct:
         """
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect((host, port))
+        self.address = (host, port)
+        self._reset_recv_buffer()
         if timeout is not None:
             self._socket.settimeout(timeout)
         logger.info('Connected to: %s...', repr((host, port)))
@@ -168,6 +396,30 @@ class Xsct:
         """
         self._socket.close()
 
+    def is_alive(self):
+        """Checks the connection without a round trip to the server. The connection is alive if it
+        has not been closed and there is no unexpected (unrequested) data from the server.
+
+        :return: True if the connection can be used.
+        """
+        if self._socket is None or self._socket.fileno() < 0:
+            return False
+        if self._recv_start < len(self._recv_buffer):
+            return False
+        timeout = self._socket.gettimeout()
+        try:
+            self._socket.setblocking(False)
+            data = self._socket.recv(1, socket.MSG_PEEK)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        finally:
+            self._socket.settimeout(timeout)
+        # Empty data: the server has closed the connection. Otherwise there is an unrequested answer,
+        # so the answers are out of sync.
+        return False
+
     def send(self, msg):
         """Sends a simple message to the xsdbserver through the socket. Note, that this method don't appends
         line-endings. It just sends natively the message. Use `do` instead.
@@ -180,23 +432,72 @@ class Xsct:
         logger.debug('Sending message: %s ...', repr(msg))
         self._socket.sendall(msg)
 
-    def recv(self, bufsize=1024, timeout=None):
+    def _reset_recv_buffer(self):
+        self._recv_buffer = bytearray()
+        self._recv_start = 0
+        self._recv_scanned = 0
+
+    def _pop_frame(self):
+        """Returns the next complete answer from the receive buffer or None if there is no complete
+        answer in it. Every byte is scanned only once for the line-ending.
+        """
+        buf = self._recv_buffer
+        end = buf.find(xsct_line_end_bytes, self._recv_scanned)
+        if end < 0:
+            # The line-ending can be split between two reads.
+            self._recv_scanned = max(self._recv_start, len(buf) - len(xsct_line_end_bytes) + 1)
+            return None
+        frame = buf[self._recv_start:end].decode("utf-8")
+        self._recv_start = end + len(xsct_line_end_bytes)
+        self._recv_scanned = self._recv_start
+        # Drop the consumed answers when they fill the most of the buffer. (Deleting from the front of
+        # the buffer after each answer would make the pipelined answers quadratic.)
+        if self._recv_start * 2 >= len(buf):
+            del buf[:self._recv_start]
+            self._recv_start = 0
+            self._recv_scanned = 0
+        return frame
+
+    def recv(self, bufsize=None, timeout=None):
         """Receives the answer from the server. Not recommended to use it natively. Use `do`
 
+        The data is collected in a persistent receive buffer. The bytes following the answer's
+        line-ending are kept and they will be the beginning of the next answer. (This is needed for
+        pipelined commands, see `do_many`.)
+
         :param bufsize:The maximum amount of data to be received at once is specified by bufsize.
+            Default is the `recv_bufsize` of the client.
         :param timeout:
         :return:
         """
+        if bufsize is None:
+            bufsize = self.recv_bufsize
         if timeout is not None:
             self._socket.settimeout(timeout)
-        ans = ''
         while True:
+            frame = self._pop_frame()
+            if frame is not None:
+                return frame
             data = self._socket.recv(bufsize)
-            logger.debug('Data received: %s ...', repr(data))
-            ans += data.decode("utf-8")
-            ans = ans.split(xsct_line_end)
-            if len(ans) > 1:
-                return ans[0]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Data received: %s ...', repr(data))
+            if not data:
+                raise PylinxException('The connection has been closed by the server.')
+            self._recv_buffer += data
+
+    @staticmethod
+    def _parse_answer(ans):
+        """Processes a raw answer of the xsdbserver.
+
+        :param ans: One answer line (without line-ending) received from the server.
+        :return: The return value of the command.
+        :raises PylinxException: if the command failed or the answer is malformed.
+        """
+        if ans.startswith('okay'):
+            return ans[5:]
+        if ans.startswith('error'):
+            raise PylinxException(ans[6:])
+        raise PylinxException('Illegal start-string in protocol. Answer is: ' + ans)
 
     def do(self, command):
         """The main function of the client. Sends a command and returns the return value of the command.
@@ -208,15 +509,492 @@ class Xsct:
         logger.info('Sending command: %s ...', repr(command))
         self.send(command)
         ans = self.recv()
-        if ans.startswith('okay'):
-            return ans[5:]
-        if ans.startswith('error'):
-            raise PylinxException(ans[6:])
-        raise PylinxException('Illegal start-string in protocol. Answer is: ' + ans)
+        return Xsct._parse_answer(ans)
+
+    def do_many(self, commands, return_exceptions=False, window=256):
+        """Sends many commands in a pipelined way and returns their return values in order.
+
+        The commands are written back-to-back to the socket (at most `window` commands ahead of the
+        answers) so the latency of the round trips is paid only once per window instead of once per
+        command.
+
+        :param commands: Iterable of commands (without line-endings).
+        :param return_exceptions: False: raise the first error after all answers have been read.
+            True: the failed commands' PylinxException objects are returned in place of their return
+            values.
+        :param window: The maximum number of commands sent before reading their answers. This keeps
+            the socket buffers from filling up in both directions.
+        :return: List of the return values in the order of the commands.
+        """
+        commands = list(commands)
+        if window < 1:
+            raise ValueError("window must be positive.")
+        results = []
+        first_error = None
+        for start in range(0, len(commands), window):
+            chunk = commands[start:start + window]
+            logger.info('Sending %d pipelined commands ...', len(chunk))
+            self.send(''.join(cmd + xsct_line_end for cmd in chunk))
+            for cmd in chunk:
+                ans = self.recv()
+                try:
+                    results.append(Xsct._parse_answer(ans))
+                except PylinxException as ex:
+                    logger.debug('Command %s failed: %s', repr(cmd), str(ex))
+                    if first_error is None:
+                        first_error = ex
+                    results.append(ex)
+        if first_error is not None and not return_exceptions:
+            raise first_error
+        return results
+
+
+class AsyncXsct:
+    """The asyncio based XSCT client class. This communicates with the server and sends commands
+    like the `Xsct` class, but it doesn't block a thread while waiting for the answers, so one event
+    loop can drive many xsdbservers at once.
+
+    Commands can be pipelined: `do` can be called concurrently from many tasks on the same connection.
+    The commands are written to the socket immediately and the answers are assigned to them in order.
+    """
+
+    def __init__(self, timeout=10, limit=ASYNC_STREAM_LIMIT):
+        """Initializes the client object. Use `connect` to connect to the server.
+
+        :param timeout: The default timeout of the commands in seconds. None means no timeout.
+        :param limit: The maximum length of an answer in bytes.
+        """
+        self.timeout = timeout
+        self.limit = limit
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        # The futures of the sent commands waiting for their answers. (In the order of sending.)
+        self._pending = collections.deque()
+
+    async def connect(self, host=HOST, port=PORT, timeout=None):
+        """Connect to the xsdbserver
+
+        :param host: Host machine where the xsdbserver is running.
+        :param port: Port of the xsdbserver.
+        :param timeout: Timeout of the connection in seconds. Default is the timeout of the client.
+        :return: None
+        """
+        if timeout is None:
+            timeout = self.timeout
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, limit=self.limit), timeout)
+        self._reader_task = asyncio.ensure_future(self._read_answers())
+        logger.info('Connected to: %s...', repr((host, port)))
+
+    async def close(self):
+        """Closes the connection. The commands waiting for their answers will raise PylinxException.
+
+        :return: None
+        """
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except asyncio.CancelledError:
+            pass
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+
+    async def _read_answers(self):
+        """Reads the answers of the server and resolves the futures of the pending commands in order.
+        """
+        error = PylinxException('The connection has been closed.')
+        try:
+            while True:
+                try:
+                    ans = await self._reader.readuntil(xsct_line_end_bytes)
+                except asyncio.IncompleteReadError:
+                    error = PylinxException('The connection has been closed by the server.')
+                    break
+                except asyncio.LimitOverrunError:
+                    error = PylinxException('The answer is longer than the limit: {}'.format(self.limit))
+                    break
+                ans = ans[:-len(xsct_line_end_bytes)].decode("utf-8")
+                logger.debug('Answer received: %s ...', repr(ans))
+                if not self._pending:
+                    logger.error('Unexpected answer without command: %s', repr(ans))
+                    continue
+                future = self._pending.popleft()
+                # The future is done if the command has been timed out. Its answer is dropped.
+                if not future.done():
+                    future.set_result(ans)
+        finally:
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(error)
+
+    def _send(self, command):
+        """Writes a command to the socket and returns the future of its answer.
+        """
+        if self._writer is None or self._reader_task.done():
+            raise PylinxException('The client is not connected.')
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append(future)
+        self._writer.write((command + xsct_line_end).encode())
+        return future
+
+    async def do(self, command, timeout=None):
+        """The main function of the client. Sends a command and returns the return value of the command.
+
+        :param command: The command (without line-ending).
+        :param timeout: Timeout in seconds. Default is the timeout of the client.
+        :return: The return value of the command.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        logger.info('Sending command: %s ...', repr(command))
+        future = self._send(command)
+        await self._writer.drain()
+        ans = await asyncio.wait_for(future, timeout)
+        return Xsct._parse_answer(ans)
+
+    async def do_many(self, commands, return_exceptions=False, timeout=None):
+        """Sends many commands at once and returns their return values in order.
+
+        :param commands: Iterable of commands (without line-endings).
+        :param return_exceptions: False: raise the first error. True: the failed commands'
+            PylinxException objects are returned in place of their return values.
+        :param timeout: Timeout of the whole batch in seconds. Default is the timeout of the client.
+        :return: List of the return values in the order of the commands.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        futures = [self._send(cmd) for cmd in commands]
+        logger.info('Sending %d pipelined commands ...', len(futures))
+        await self._writer.drain()
+        answers = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        results = []
+        for ans in answers:
+            try:
+                results.append(Xsct._parse_answer(ans))
+            except PylinxException as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+
+class XsctPool:
+    """Thread-safe pool of `Xsct` connections towards one or more xsdbservers.
+
+    The connections are opened lazily (at most `size` per endpoint) and they are kept open between
+    the uses. A connection can be used by one thread at a time: get it by `checkout` and give it back
+    by `checkin`, or use the `connection` context manager. Idle connections are health-checked before
+    they are handed out and the broken ones are reconnected.
+    """
+
+    def __init__(self, endpoints=((HOST, PORT),), size=4, timeout=10, check_idle=1.0,
+                 recv_bufsize=RECV_BUFSIZE):
+        """Initializes the pool. No connection is opened here.
+
+        :param endpoints: List of (host, port) tuples of the xsdbservers.
+        :param size: The maximum number of connections per endpoint.
+        :param timeout: Socket timeout of the connections in seconds.
+        :param check_idle: Connections idle for longer than this (in seconds) are health-checked
+            before checkout. 0 checks all of them.
+        :param recv_bufsize: See `Xsct`
+        """
+        if size < 1:
+            raise ValueError("size must be positive.")
+        self.endpoints = [tuple(endpoint) for endpoint in endpoints]
+        if not self.endpoints:
+            raise ValueError("At least one endpoint is needed.")
+        self.size = size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.recv_bufsize = recv_bufsize
+        self._cond = threading.Condition()
+        # The idle connections: (xsct, endpoint, time of checkin)
+        self._idle = collections.deque()
+        # Number of the connections (idle or checked out) per endpoint.
+        self._opened = dict((endpoint, 0) for endpoint in self.endpoints)
+        self._endpoint_of = {}
+        self._closed = False
+
+    def _free_endpoint(self):
+        """Returns the endpoint with the least connections or None if all of them are full.
+        """
+        endpoint = min(self.endpoints, key=lambda e: self._opened[e])
+        if self._opened[endpoint] < self.size:
+            return endpoint
+        return None
+
+    def _connect(self, endpoint):
+        xsct = Xsct(host=None, recv_bufsize=self.recv_bufsize)
+        xsct.connect(endpoint[0], endpoint[1], timeout=self.timeout)
+        return xsct
+
+    def checkout(self, timeout=None):
+        """Gets a connection from the pool. It must be given back using `checkin`.
+
+        :param timeout: The maximum time to wait for a free connection in seconds. None: wait forever.
+        :return: An Xsct object.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PylinxException('The pool has been closed.')
+                if self._idle:
+                    xsct, endpoint, last_used = self._idle.pop()
+                    break
+                endpoint = self._free_endpoint()
+                if endpoint is not None:
+                    self._opened[endpoint] += 1
+                    xsct, last_used = None, None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PylinxException('No free connection in the pool.')
+                self._cond.wait(remaining)
+
+        # Connect and check out of the lock. These can be slow.
+        try:
+            if xsct is not None and time.monotonic() - last_used >= self.check_idle:
+                if not xsct.is_alive():
+                    logger.info('Reconnecting broken connection to: %s...', repr(endpoint))
+                    xsct.close()
+                    xsct = None
+            if xsct is None:
+                xsct = self._connect(endpoint)
+        except Exception:
+            with self._cond:
+                self._opened[endpoint] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._endpoint_of[id(xsct)] = endpoint
+        return xsct
+
+    def checkin(self, xsct, broken=False):
+        """Gives back a connection to the pool.
+
+        :param xsct: The connection got by `checkout`.
+        :param broken: True: the connection must not be used again. (It will be closed and a new one
+            will be opened when it is needed.)
+        :return: None
+        """
+        with self._cond:
+            endpoint = self._endpoint_of.pop(id(xsct))
+            if broken or self._closed:
+                self._opened[endpoint] -= 1
+                xsct.close()
+            else:
+                self._idle.append((xsct, endpoint, time.monotonic()))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Context manager, which checks out a connection and checks it in at the end. The connection
+        is dropped if a socket error (or a timeout) occurs, because the answers can be out of sync.
+
+        :param timeout: See `checkout`
+        """
+        xsct = self.checkout(timeout)
+        broken = False
+        try:
+            yield xsct
+        except OSError:
+            broken = True
+            raise
+        except PylinxException:
+            broken = not xsct.is_alive()
+            raise
+        finally:
+            self.checkin(xsct, broken)
+
+    def do(self, command, timeout=None):
+        """Runs a command on a connection of the pool. See `Xsct.do`
+        """
+        with self.connection(timeout) as xsct:
+            return xsct.do(command)
+
+    def do_many(self, commands, timeout=None, **kwargs):
+        """Runs many commands on a connection of the pool. See `Xsct.do_many`
+        """
+        with self.connection(timeout) as xsct:
+            return xsct.do_many(commands, **kwargs)
+
+    def close(self):
+        """Closes the idle connections. The checked out connections are closed at their checkin.
+
+        :return: None
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                xsct, endpoint, _ = self._idle.pop()
+                self._opened[endpoint] -= 1
+                xsct.close()
+            self._cond.notify_all()
 
 
 default_vivado_prompt = 'Vivado% '
 
+# These commands can change the properties of the objects given to them, so they invalidate the cached
+# properties of those objects. (The object queries are kept.)
+property_changing_commands = {'set_property', 'reset_property', 'commit_hw_sio'}
+
+# These commands can change the objects (or any properties) in Vivado, so they invalidate the whole cache.
+cache_invalidating_commands = {
+    'refresh_hw_sio', 'refresh_hw_device',
+    'refresh_hw_target', 'refresh_hw_server', 'open_hw_target', 'close_hw_target', 'current_hw_target',
+    'current_hw_device', 'program_hw_devices', 'connect_hw_server', 'disconnect_hw_server',
+    'create_hw_sio_link', 'remove_hw_sio_link', 'set_device', 'create_link', 'init', 'source',
+}
+
+
+class PropertyCache:
+    """Cache of the properties and the object queries of a Vivado session.
+
+    The entries can expire after `ttl` seconds. The numbers of hits and misses are counted.
+    """
+
+    def __init__(self, ttl=None):
+        """Initializes an empty cache.
+
+        :param ttl: Time to live of the entries in seconds. None: the entries don't expire.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, time of store)
+        self._entries = {}
+
+    def get(self, key):
+        """Returns the cached value or None if it is not cached (or it has expired).
+        """
+        try:
+            value, stored = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key=None):
+        """Drops an entry or all of them (if key is None).
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def invalidate_properties(self, matches=None):
+        """Drops the properties of the objects for which matches(object) is True (all the properties if
+        matches is None). The object queries are kept.
+        """
+        for key in [key for key in self._entries
+                    if key[0] == 'property' and (matches is None or matches(key[1]))]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns the hit/miss counters and the number of the entries.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def _refers_to(args, obj):
+    """Returns True if the arguments of a command can refer to the object (as a cache key).
+
+    The object is referred if its text can be found in the arguments. An object query (e.g.
+    [get_hw_sio_gts *X0Y1]) can also be referred by another query of the same command. An object name
+    and an object query cannot be matched, so they are taken as referring each other.
+    """
+    if obj in args:
+        return True
+    queries = re.findall(r'\[\s*([^\s\]]+)', args)
+    obj_query = re.match(r'\[\s*([^\s\]]+)', obj)
+    if obj_query is not None:
+        return obj_query.group(1) in queries or not queries
+    return bool(queries)
+
+
+class CommandHistory:
+    """Bounded history of the commands of a console and their outputs.
+
+    The last `maxlen` entries are kept. If `max_bytes` is given, the oldest entries are dropped while
+    the stored outputs are bigger than that. (The last entry is kept anyway.) Optionally every entry is
+    appended to a transcript file, so the full history is available on the disk.
+    """
+
+    def __init__(self, maxlen=100, max_bytes=None, transcript=None, encoding="utf-8"):
+        """Initializes the history.
+
+        :param maxlen: The maximum number of the entries. None: unlimited.
+        :param max_bytes: The maximum size of the entries in bytes. None: unlimited.
+        :param transcript: Path of the transcript file or None.
+        :param encoding: The encoding of the transcript file.
+        """
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen must be positive.")
+        self.maxlen = maxlen
+        self.max_bytes = max_bytes
+        self.cmds = collections.deque(maxlen=maxlen)
+        self.befores = collections.deque(maxlen=maxlen)
+        self.prompts = collections.deque(maxlen=maxlen)
+        self._sizes = collections.deque(maxlen=maxlen)
+        self.nbytes = 0
+        self._transcript = None
+        if transcript is not None:
+            self._transcript = open(transcript, 'a', encoding=encoding)
+
+    @staticmethod
+    def _size(cmd, before, prompt):
+        return sum(len(x.encode()) for x in (cmd, before, prompt) if x is not None)
+
+    def append(self, cmd, before, prompt):
+        """Stores a command, its output and the prompt after it.
+        """
+        if self.maxlen is not None and len(self.cmds) == self.maxlen:
+            # The deques drop the oldest entry.
+            self.nbytes -= self._sizes[0]
+        size = CommandHistory._size(cmd, before, prompt)
+        self.cmds.append(cmd)
+        self.befores.append(before)
+        self.prompts.append(prompt)
+        self._sizes.append(size)
+        self.nbytes += size
+        while self.max_bytes is not None and self.nbytes > self.max_bytes and len(self.cmds) > 1:
+            self.cmds.popleft()
+            self.befores.popleft()
+            self.prompts.popleft()
+            self.nbytes -= self._sizes.popleft()
+        if self._transcript is not None:
+            # The output starts with the echo of the command, like in the console.
+            self._transcript.write(before + prompt)
+            self._transcript.flush()
+
+    def __len__(self):
+        return len(self.cmds)
+
+    def close(self):
+        """Closes the transcript file.
+        """
+        if self._transcript is not None:
+            self._transcript.close()
+            self._transcript = None
+
 
 class Vivado:
     """Vivado is a native interface towards the Vivado TCL console. You can run TCL commands in it
@@ -224,15 +1002,23 @@ class Vivado:
     """
 
     def __init__(self, executable, args=None, name='Vivado_01',
-                 prompt=default_vivado_prompt, timeout=10, encoding="utf-8", wait_startup=True):
+                 prompt=default_vivado_prompt, timeout=10, encoding="utf-8", wait_startup=True,
+                 history_size=100, history_max_bytes=None, transcript=None, cache=False, cache_ttl=None):
+        """
+        :param history_size: The number of the commands (and their outputs) kept in the history.
+            None: unlimited.
+        :param history_max_bytes: The maximum size of the history in bytes. None: unlimited.
+        :param transcript: Path of a file, where the full history is written. None: no transcript.
+        :param cache: True: cache the properties and the object queries. See `PropertyCache`
+        :param cache_ttl: Time to live of the cached values in seconds. None: no expiration.
+        """
         self.child_proc = None
         self.name = name
         self.prompt = prompt
         self.timeout = timeout
         self.encoding = encoding
-        self.last_cmds = []
-        self.last_befores = []
-        self.last_prompts = []
+        self.history = CommandHistory(history_size, history_max_bytes, transcript, encoding)
+        self.cache = PropertyCache(cache_ttl) if cache else None
 
         if args is None:
             args = ['-mode', 'tcl']
@@ -244,6 +1030,18 @@ class Vivado:
         if wait_startup:
             self.wait_startup()
 
+    @property
+    def last_cmds(self):
+        return self.history.cmds
+
+    @property
+    def last_befores(self):
+        return self.history.befores
+
+    @property
+    def last_prompts(self):
+        return self.history.prompts
+
     def wait_startup(self, **kwargs):
         self.do(cmd=None, **kwargs)
 
@@ -258,6 +1056,7 @@ class Vivado:
 
         if cmd is not None:
             logger.debug('Sending command: ' + str(cmd))
+            self._invalidate_cache(cmd)
             if platform.system() == 'Windows':
                 self.child_proc.sendline(cmd)
             else:
@@ -266,12 +1065,13 @@ class Vivado:
             prompt = self.prompt
         if timeout is None:
             timeout = self.timeout
+        elif timeout is NO_TIMEOUT:
+            timeout = None
         if encoding is None:
             encoding = self.encoding
         if wait_prompt:
             self.child_proc.expect(prompt, timeout=timeout)
             logger.debug("before: " + repr(self.child_proc.before))
-            self.last_cmds.append(cmd)
             
             if platform.system() == 'Windows':
                 before = self.child_proc.before
@@ -279,14 +1079,8 @@ class Vivado:
             else:
                 before = self.child_proc.before.decode(encoding)
                 prompt = self.child_proc.after.decode(encoding)
-            self.last_befores.append(before)
-            self.last_prompts.append(prompt)
-            for em in errmsgs:
-                if isinstance(em, str):
-                    em = re.compile(em)
-                if em.search(before):
-                    logger.error('during running command: {}, before: {}'.format(cmd, before))
-                    raise PylinxException('during running command: {}, before: {}'.format(cmd, before))
+            self._record(cmd, before, prompt)
+            self._check_errmsgs(cmd, before, errmsgs)
 
             if native_answer:
                 return before
@@ -298,6 +1092,137 @@ class Vivado:
 
         return None
 
+    def _invalidate_cache(self, cmd):
+        """Drops the cached values if the command can change them.
+        """
+        if self.cache is None:
+            return
+        words = cmd.split(None, 1)
+        if not words:
+            return
+        if words[0] in property_changing_commands:
+            args = words[1] if len(words) > 1 else ''
+            logger.debug('Cached properties invalidated by: ' + cmd)
+            if '$' in args:
+                # The objects in the variables are not known.
+                self.cache.invalidate_properties()
+            else:
+                self.cache.invalidate_properties(lambda obj: _refers_to(args, obj))
+        elif words[0] in cache_invalidating_commands:
+            logger.debug('Cache invalidated by: ' + words[0])
+            self.cache.invalidate()
+
+    def _record(self, cmd, before, prompt):
+        """Stores a command and its output in the history.
+        """
+        self.history.append(cmd, before, prompt)
+
+    @staticmethod
+    def _check_errmsgs(cmd, before, errmsgs):
+        """Raises PylinxException if any of the error messages (regexps) can be found in the output.
+        """
+        for em in errmsgs:
+            if isinstance(em, str):
+                em = re.compile(em)
+            if em.search(before):
+                logger.error('during running command: {}, before: {}'.format(cmd, before))
+                raise PylinxException('during running command: {}, before: {}'.format(cmd, before))
+
+    def do_batch(self, cmds, prompt=None, timeout=None, errmsgs=[], encoding=None):
+        """ do many commands in Vivado console with a single round trip.
+
+        The commands are sent in one write, wrapped into one TCL command, which prints a unique
+        sentinel after each command. The output is split at the sentinels, so each command gets its
+        own return value and its own error message check. Like in the interactive console, an error of a
+        command doesn't stop the following ones: the error message is its output.
+
+        :param cmds: List of the commands. An item can be a (command, errmsgs) tuple to check
+            command-specific error messages.
+        :param errmsgs: Error messages (regexps) checked in the output of all the commands.
+        :param timeout: The timeout of the whole batch. None: the default timeout of the session,
+            NO_TIMEOUT: wait forever.
+        :return: List of the outputs of the commands (like `do` returns them).
+        """
+        if self.child_proc.terminated:
+            logger.error('The process has been terminated. Sending command is not possible.')
+            raise PylinxException('The process has been terminated. Sending command is not possible.')
+        cmds = [cmd if isinstance(cmd, tuple) else (cmd, []) for cmd in cmds]
+        if not cmds:
+            return []
+        for cmd, _ in cmds:
+            self._invalidate_cache(cmd)
+        if prompt is None:
+            prompt = self.prompt
+        if timeout is None:
+            timeout = self.timeout
+        elif timeout is NO_TIMEOUT:
+            timeout = None
+        if encoding is None:
+            encoding = self.encoding
+
+        # The sentinel is written with escape sequences, so the echo of the sent script doesn't
+        # contain the sentinel itself.
+        tag = 'pylinx_batch_' + uuid.uuid4().hex
+        sentinel = '<{}>'.format(tag)
+        end_sentinel = '<{}/>'.format(tag)
+        puts_sentinel = 'puts "\\x3c{}\\x3e"'.format(tag)
+        puts_end_sentinel = 'puts "\\x3c{}/\\x3e"'.format(tag)
+        script = [puts_sentinel + '; foreach __pylinx_cmd {']
+        script.extend(tcl_quote(cmd) for cmd, _ in cmds)
+        script.append('} {')
+        script.append('    if {[catch {uplevel #0 $__pylinx_cmd} __pylinx_res] || $__pylinx_res ne ""} {')
+        script.append('        puts $__pylinx_res')
+        script.append('    }')
+        script.append('    ' + puts_sentinel)
+        script.append('}; unset __pylinx_cmd __pylinx_res; ' + puts_end_sentinel)
+        script = '\n'.join(script)
+
+        logger.debug('Sending batch of {} commands: {}'.format(len(cmds), script))
+        if platform.system() == 'Windows':
+            self.child_proc.sendline(script)
+        else:
+            self.child_proc.sendline(script.encode())
+        self.child_proc.expect(re.escape(end_sentinel), timeout=timeout)
+        output = self.child_proc.before
+        self.child_proc.expect(prompt, timeout=timeout)
+        if platform.system() == 'Windows':
+            prompt = self.child_proc.after
+        else:
+            output = output.decode(encoding)
+            prompt = self.child_proc.after.decode(encoding)
+
+        # The terminal can add extra carriage returns to the line-endings.
+        # The part before the first sentinel is the echo of the script. The last part is the (empty)
+        # end of the output.
+        segments = re.split(re.escape(sentinel) + '\r*\n', output)[1:-1]
+        if len(segments) != len(cmds):
+            raise PylinxException('Cannot split the output of the batch: {}'.format(output))
+        rets = []
+        for (cmd, cmd_errmsgs), segment in zip(cmds, segments):
+            cmd_lines = re.split('\r*\n', segment)
+            if cmd_lines[-1] == '':
+                cmd_lines.pop()
+            # The first line is the echo of the command. (See do)
+            before = xsct_line_end.join([cmd] + cmd_lines + [''])
+            self._record(cmd, before, prompt)
+            self._check_errmsgs(cmd, before, list(errmsgs) + list(cmd_errmsgs))
+            rets.append(os.linesep.join(cmd_lines).rstrip())
+        self._cache_batch(cmds, rets)
+        return rets
+
+    def _cache_batch(self, cmds, rets):
+        """Stores the properties read by the get_property commands of a batch in the cache. The commands
+        are replayed in order, so a property changed after its read in the same batch is not stored.
+        """
+        if self.cache is None:
+            return
+        for (cmd, _), ret in zip(cmds, rets):
+            words = cmd.split(None, 2)
+            if len(words) == 3 and words[0] == 'get_property' and not words[1].startswith('-'):
+                self.cache.set(('property', words[2], words[1]), ret.strip())
+            else:
+                self._invalidate_cache(cmd)
+
     def interact(self, cmd=None, **kwargs):
         if cmd is not None:
             self.do(cmd, **kwargs)
@@ -320,19 +1245,110 @@ class Vivado:
 
         return ans
 
-    def get_property(self, propName, objectName, **kwargs):
+    def get_property(self, propName, objectName, use_cache=True, **kwargs):
         """ does a get_property command in vivado terminal.
 
-        It fetches the given property and returns it.
+        It fetches the given property and returns it. If the cache is enabled, the cached value is
+        returned (without running any command).
         """
+        key = ('property', objectName, propName)
+        if self.cache is not None and use_cache:
+            value = self.cache.get(key)
+            if value is not None:
+                return value
         cmd = 'get_property {} {}'.format(propName, objectName)
-        return self.do(cmd, **kwargs).strip()
+        value = self.do(cmd, **kwargs).strip()
+        if self.cache is not None:
+            self.cache.set(key, value)
+        return value
 
     def set_property(self, propName, value, objectName, **kwargs):
-        """ Sets a property.
+        """ Sets a property. If the cache is enabled, the new value is written into the cache (after the
+        cached properties of the object have been dropped).
         """
         cmd = 'set_property {} {} {}'.format(propName, value, objectName)
         self.do(cmd, **kwargs)
+        if self.cache is not None:
+            # Vivado reads back the value without the enclosing braces.
+            value = str(value)
+            if value.startswith('{') and value.endswith('}'):
+                value = value[1:-1]
+            self.cache.set(('property', objectName, propName), value)
+
+    def get_properties(self, objectNames, propNames, **kwargs):
+        """ Fetches many properties of one or more objects with a single command.
+
+        :param objectNames: An object (e.g. '[get_hw_sio_gts *MGT_X0Y1]') or a list of objects.
+        :param propNames: List of the property names. None: all the properties of the objects.
+            (See `get_all_properties`)
+        :return: Dict of property name -> value. If a list of objects was given: dict of object ->
+            dict of property name -> value.
+        """
+        single = isinstance(objectNames, str)
+        objects = [objectNames] if single else list(objectNames)
+        if propNames is None:
+            props = '[list_property $__pylinx_o]'
+        else:
+            propNames = list(propNames)
+            props = '[list {}]'.format(' '.join(tcl_quote(name) for name in propNames))
+        indexed_objects = ' '.join('{} {}'.format(i, obj) for i, obj in enumerate(objects))
+        # The output lines are: object index, property name, value separated by \x1f. The newlines in the
+        # values are replaced by \x1e. (The echo of the command contains only the escape sequences.)
+        cmd = ('if {{[catch {{foreach {{__pylinx_i __pylinx_o}} [list {}] {{foreach __pylinx_p {} {{'
+               'puts "$__pylinx_i\\x1f$__pylinx_p\\x1f[string map {{\\n \\x1e}} [get_property $__pylinx_p $__pylinx_o]]"'
+               '}}}}}} __pylinx_err]}} {{puts "\\x15$__pylinx_err"}}; unset -nocomplain __pylinx_i __pylinx_o __pylinx_p'
+               ).format(indexed_objects, props)
+        ans = self.do(cmd, **kwargs)
+
+        results = [{} for _ in objects]
+        # Note: str.splitlines() would split at \x1e too.
+        for line in re.split('[\r\n]+', ans):
+            if line.startswith('\x15'):
+                raise PylinxException('get_properties failed: {}'.format(line[1:]))
+            fields = line.split('\x1f', 2)
+            if len(fields) != 3:
+                # Other messages of Vivado
+                continue
+            index, name, value = fields
+            results[int(index)][name] = value.replace('\x1e', '\n')
+        if self.cache is not None:
+            for obj, props in zip(objects, results):
+                for name, value in props.items():
+                    self.cache.set(('property', obj, name), value)
+        if single:
+            return results[0]
+        return dict(zip(objects, results))
+
+    def get_all_properties(self, objectNames, **kwargs):
+        """ Fetches all the properties (see list_property) of one or more objects with a single command.
+        See `get_properties`
+        """
+        return self.get_properties(objectNames, None, **kwargs)
+
+    def get_objects(self, query, use_cache=True, **kwargs):
+        """ Runs an object query (like get_hw_sio_gts or get_hw_devices) and returns its result.
+        If the cache is enabled, the cached result is returned (without running any command).
+
+        :param query: The query command with its arguments, e.g. 'get_hw_sio_gts *MGT_X0Y1'
+        :return: The list of the objects.
+        """
+        key = ('query', query)
+        if self.cache is not None and use_cache:
+            objects = self.cache.get(key)
+            if objects is not None:
+                return list(objects)
+        objects = self.do(query, **kwargs).split()
+        if self.cache is not None:
+            self.cache.set(key, tuple(objects))
+        return objects
+
+    def invalidate_cache(self):
+        """ Drops all the cached values. Use it after the properties have been changed outside of this
+        session. (The commands, which can change the properties invalidate the cache automatically: the
+        property changes drop the properties of the given objects, the other commands the whole cache.)
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
 
     def pid(self):
         parent = psutil.Process(self.child_proc.pid)
@@ -346,6 +1362,7 @@ class Vivado:
 
     def exit(self, force=False, **kwargs):
         logger.debug('start')
+        self.history.close()
         if self.child_proc is None:
             return None
         if self.child_proc.terminated:
@@ -375,6 +1392,11 @@ class VivadoHWServer(Vivado):
         self.sio = None
         self.sioLink = None
         self.hw_server_url = hw_server_url
+        # True if the last run_scan has been stopped early.
+        self.last_scan_stopped = False
+        # The timing breakdowns of the last fetch_devices and set_device (see hw_server.tcl).
+        self.last_fetch_timing = {}
+        self.last_set_device_timing = {}
         super(VivadoHWServer, self).__init__(executable, wait_startup=wait_startup, **kwargs)
 
         if full_init:
@@ -385,18 +1407,37 @@ class VivadoHWServer(Vivado):
             self.do('source ' + hw_server_tcl, errmsgs=['no such file or directory'])
             self.do('init ' + hw_server_url)
 
-    def fetch_devices(self, force=True):
+    def fetch_devices(self, force=True, refresh=False):
         """_fetchDevices go thorugh the blasters and fetches all the hw devices and stores into the
         allDevices dict. Private method, use get_devices, which will fetch devices if it needed.
+
+        The devices of the targets are cached by hw_server.tcl: only the new targets are opened, the
+        known ones are opened again only if they are refreshed. The timing breakdown of the exploration is
+        stored in last_fetch_timing.
+
+        :param force: Fetch the devices even if they have been fetched already.
+        :param refresh: True: explore all the targets again. A list of targets: explore only these targets
+            again (incremental refresh). False: use the cached devices of the known targets.
         """
 
         if force or self.get_devices(auto_fetch=False) is None:
             logger.info('Exploring target devices (fetch_devices: this can take a while)')
-            self.do('set devices [fetch_devices]', errmsgs=["Labtoolstcl 44-133", "No target blaster found"])
+            if refresh is True:
+                refresh = '*'
+            elif refresh:
+                refresh = ' '.join(tcl_quote(target) for target in refresh)
+            else:
+                refresh = ''
+            start = time.monotonic()
+            self.do('set devices [fetch_devices {{{}}}]'.format(refresh),
+                    errmsgs=["Labtoolstcl 44-133", "No target blaster found"])
             try:
                 devices = self.get_var('devices')
             except PylinxException as ex:
                 raise PylinxException('No target device found. Please connect and power up your device(s)')
+            self.last_fetch_timing = self._get_timing('pylinx_fetch_timing')
+            self.last_fetch_timing['total'] = (time.monotonic() - start) * 1000.0
+            logger.info('fetch_devices timing (ms): %s', self.last_fetch_timing)
 
             # Get a list of all devices on all target.
             # Remove the brackets. (fetch_devices returns lists.)
@@ -407,6 +1448,36 @@ class VivadoHWServer(Vivado):
 
         return self.get_devices(auto_fetch=False)
 
+    def refresh_devices(self, targets=None):
+        """Explores the given targets again (eg. after power cycling a board), the other targets are
+        served from the cache. The new targets are always explored.
+
+        :param targets: List of targets. None: only the new targets are explored.
+        """
+        return self.fetch_devices(force=True, refresh=targets or False)
+
+    def _get_timing(self, varname):
+        """Reads a timing dict of hw_server.tcl."""
+        elements = tcl_split(self.get_var(varname))
+        return dict((name, float(value)) for name, value in zip(elements[0::2], elements[1::2]))
+
+    def set_device(self, device, force=False, **kwargs):
+        """Opens the target and the device. It is skipped if the device is already the current one and it
+        is programmed. The timing breakdown is stored in last_set_device_timing.
+
+        :param device: '<target> <device>' (an element of get_devices()).
+        :param force: Reopen and refresh the device anyway.
+        """
+        target_device = tcl_split(device)
+        if len(target_device) != 2:
+            raise PylinxException('Invalid device: {} (expected: <target> <device>)'.format(device))
+        target, dev = target_device
+        errmsgs = ['DONE status = 0', 'The debug hub core was not detected.']
+        self.do('set_device {} {} {}'.format(tcl_quote(target), tcl_quote(dev), int(force)),
+                errmsgs=errmsgs, **kwargs)
+        self.last_set_device_timing = self._get_timing('pylinx_set_device_timing')
+        logger.debug('set_device timing (ms): %s', self.last_set_device_timing)
+
     def get_devices(self, auto_fetch=True, hw_server_url=None):
         """Returns the hardware devices. auto_fetch fetches automatically the devices, if they have
         not fetched yet."""
@@ -436,8 +1507,7 @@ class VivadoHWServer(Vivado):
         device_id = int(device_id)
         device = devices[device_id]
 
-        errmsgs = ['DONE status = 0', 'The debug hub core was not detected.']
-        self.do('set_device ' + device, errmsgs=errmsgs, **kwargs)
+        self.set_device(device, **kwargs)
 
     def choose_sio(self, createLink=True, **kwargs):
         """ Set the transceiver channel for TX/RX side.
@@ -455,6 +1525,113 @@ class VivadoHWServer(Vivado):
         if createLink:
             self.do('create_link ' + self.sio, **kwargs)
 
+    def run_scan(self, scan_file, hincr=16, vincr=16, scan_type='2d_full_eye', link_name='*',
+                 description='Scan 000', on_progress=None, progress_interval=1.0, timeout=None, dwell_ber=None):
+        """Runs a scan and writes it into scan_file (see run_scan in hw_server.tcl).
+
+        If on_progress is given, Vivado writes the partial results periodically and they are read and
+        evaluated while the scan is running, so the post-processing overlaps with the hardware scan. If
+        on_progress returns True, the scan is stopped early (the scan file contains the rows measured so
+        far) and last_scan_stopped is set.
+
+        :param scan_file: The csv file of the scan.
+        :param on_progress: Callable, which gets the IncrementalScanReader after every new partial result.
+        :param progress_interval: The period of the partial results in seconds.
+        :param timeout: The timeout of the scan in seconds. None: no timeout (a scan can take minutes).
+        :param dwell_ber: The DWELL_BER of the scan, eg. 1e-5 for a fast, coarse scan. None: the default.
+        :return: The ScanStructure of the scan. PylinxException is raised if the scan has been stopped,
+            aborted or it has failed (not by on_progress).
+        """
+        scan_file = scan_file.replace(os.sep, '/')
+        interval_ms = int(progress_interval * 1000) if on_progress is not None else 0
+        cmd = 'run_scan {{{}}} {} {} {} {{{}}} {{{}}} {} {{{}}}'.format(
+            scan_file, hincr, vincr, scan_type, link_name, description, interval_ms,
+            '' if dwell_ber is None else format_ber(dwell_ber))
+        errmsgs = ['ERROR: ', 'args: should be']
+        do_timeout = NO_TIMEOUT if timeout is None else timeout
+        self.last_scan_stopped = False
+        if on_progress is None:
+            self.do(cmd, errmsgs=errmsgs, timeout=do_timeout)
+            return ScanStructure(scan_file)
+
+        # A previous scan in the same file must not be reported as progress.
+        if os.path.exists(scan_file):
+            os.remove(scan_file)
+        outputs = []
+        errors = []
+
+        def run():
+            try:
+                outputs.append(self.do(cmd, errmsgs=errmsgs, timeout=do_timeout))
+            except Exception as ex:
+                errors.append(ex)
+
+        scan_thread = threading.Thread(target=run, daemon=True)
+        scan_thread.start()
+        reader = IncrementalScanReader(scan_file)
+        stop_requested = False
+        try:
+            for _ in reader.follow(interval=min(progress_interval, 0.1), timeout=timeout,
+                                   running=scan_thread.is_alive):
+                if on_progress(reader) and not stop_requested:
+                    # run_scan (Tcl) polls this file.
+                    logger.info('Stopping scan early: %s', scan_file)
+                    open(scan_file + '.stop', 'w').close()
+                    stop_requested = True
+        finally:
+            scan_thread.join()
+        if errors:
+            raise errors[0]
+        self.last_scan_stopped = outputs[0].strip().endswith('stopped')
+        return reader.scan() if reader.complete else ScanStructure(scan_file)
+
+    def run_scans(self, scan_dir, links=None, hincr=16, vincr=16, scan_type='2d_full_eye', dwell_ber=None,
+                  timeout=None):
+        """Runs scans on many links at once (eg. on every GT of a quad) and waits on all of them. See
+        run_scans in hw_server.tcl
+
+        :param scan_dir: The directory of the scan files (one file per link).
+        :param links: List of hw_sio_links. None: all the links.
+        :param timeout: The timeout of the scans in seconds. None: no timeout.
+        :return: OrderedDict of link -> ScanStructure or the PylinxException if the scan of the link has
+            failed. PylinxException is raised if the scans cannot be run at all.
+        """
+        scan_dir = scan_dir.replace(os.sep, '/')
+        links = '' if links is None else ' '.join(tcl_quote(link) for link in links)
+        # The results of a previous call must not be taken for the results of a failed one. (The number
+        # of the results is printed: the error messages of the links must not be checked as errmsgs.)
+        output = self.do('unset -nocomplain pylinx_scans; llength [set pylinx_scans [run_scans {} {{{}}} {} {} {} {{{}}}]]'.format(
+            tcl_quote(scan_dir), links, hincr, vincr, scan_type, '' if dwell_ber is None else format_ber(dwell_ber)),
+            errmsgs=['ERROR: ', 'args: should be'], timeout=NO_TIMEOUT if timeout is None else timeout)
+        if self.do('info exists pylinx_scans') != '1':
+            raise PylinxException('Cannot run the scans: {}'.format(output))
+        results = collections.OrderedDict()
+        for item in tcl_split(self.get_var('pylinx_scans')):
+            link, scan_file, error = tcl_split(item)
+            if error:
+                logger.error('Scan failed on link %s: %s', link, error)
+                results[link] = PylinxException('Scan failed on link {}: {}'.format(link, error))
+                continue
+            try:
+                results[link] = ScanStructure(scan_file)
+            except Exception as ex:
+                results[link] = PylinxException('Cannot read the scan of link {}: {}'.format(link, ex))
+        return results
+
+    def create_links(self, sios, remove_existing=False):
+        """Creates a loopback link for every sio (eg. every GT of a quad).
+
+        :param sios: List of hw_sio_gts.
+        :param remove_existing: True: all the existing links are removed first.
+        :return: The list of the links.
+        """
+        if remove_existing:
+            logger.info('Removing the existing links: %s', self.do('get_hw_sio_links'))
+        self.do('set pylinx_links [create_links {{{}}} {}]'.format(' '.join(tcl_quote(sio) for sio in sios),
+                                                                  int(remove_existing)),
+                errmsgs=['ERROR: '])
+        return tcl_split(self.get_var('pylinx_links'))
+
     def reset_gt(self):
         resetName = 'PORT.GT{}RESET'.format(self.name)
         self.set_property(resetName, '1', '[get_hw_sio_gts  {{}}]'.format(self.sio))
@@ -464,3 +1641,153 @@ class VivadoHWServer(Vivado):
 
     def commit_hw_sio(self):
         self.set_property('commit_hw_sio' '0' '[get_hw_sio_gts  {{}}]'.format(self.sio))
+
+
+class VivadoPool:
+    """Warm pool of pre-spawned Vivado sessions.
+
+    The sessions are spawned and initialized in the background, in parallel, so `acquire` hands out a
+    ready-to-use session without paying the (tens of seconds long) startup. Released sessions are
+    recycled: they are reset by the `reset` hook and they are replaced by a new one after `max_uses`.
+    """
+
+    def __init__(self, size=2, factory=None, reset=None, max_uses=None, **kwargs):
+        """Initializes the pool and starts spawning the sessions in the background.
+
+        :param size: Number of the sessions.
+        :param factory: Callable without arguments, which returns a new, fully initialized session.
+            Default: Vivado(**kwargs). (Use functools.partial(VivadoHWServer, ...) for hardware
+            sessions.)
+        :param reset: Callable, which gets a released session and puts it back into a clean state. If
+            it raises an exception the session is replaced.
+        :param max_uses: A session is replaced after this many uses. None: no limit.
+        :param kwargs: Arguments of the default factory.
+        """
+        if size < 1:
+            raise ValueError("size must be positive.")
+        if factory is None:
+            def factory():
+                return Vivado(**kwargs)
+        self.size = size
+        self.factory = factory
+        self.reset = reset
+        self.max_uses = max_uses
+        # Ready sessions or the exceptions of the failed spawns.
+        self._ready = queue.Queue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._in_background(self._spawn)
+
+    @staticmethod
+    def _in_background(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def _spawn(self):
+        start = time.monotonic()
+        try:
+            session = self.factory()
+        except Exception as ex:
+            logger.error('Cannot spawn session: %s', str(ex))
+            self._ready.put(ex)
+            return
+        logger.info('Session spawned in %.3f s', time.monotonic() - start)
+        with self._lock:
+            if not self._closed:
+                self._uses[id(session)] = 0
+                self._ready.put(session)
+                return
+        VivadoPool._exit_session(session)
+
+    @staticmethod
+    def _exit_session(session):
+        try:
+            session.exit()
+        except Exception:
+            session.exit(force=True)
+
+    def acquire(self, timeout=None):
+        """Gets a ready session from the pool. It must be given back using `release`.
+
+        :param timeout: The maximum time to wait for a session in seconds. None: wait forever.
+        :return: A session created by the factory.
+        """
+        if self._closed:
+            raise PylinxException('The pool has been closed.')
+        try:
+            session = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise PylinxException('No ready session in the pool.')
+        if isinstance(session, Exception):
+            # Try again next time.
+            self._in_background(self._spawn)
+            raise PylinxException('Cannot spawn session: {}'.format(session))
+        return session
+
+    def release(self, session, broken=False):
+        """Gives back a session to the pool. The session is reset (or replaced) in the background.
+
+        :param session: The session got by `acquire`.
+        :param broken: True: the session must not be used again.
+        :return: None
+        """
+        with self._lock:
+            uses = self._uses.pop(id(session)) + 1
+        self._in_background(self._recycle, session, uses, broken)
+
+    def _recycle(self, session, uses, broken):
+        replace = broken or self._closed or session.child_proc.terminated
+        if self.max_uses is not None and uses >= self.max_uses:
+            replace = True
+        if not replace and self.reset is not None:
+            try:
+                self.reset(session)
+            except Exception as ex:
+                logger.warning('Cannot reset session: %s', str(ex))
+                replace = True
+        if replace:
+            VivadoPool._exit_session(session)
+            if not self._closed:
+                self._spawn()
+            return
+        with self._lock:
+            if not self._closed:
+                self._uses[id(session)] = uses
+                self._ready.put(session)
+                return
+        VivadoPool._exit_session(session)
+
+    @contextlib.contextmanager
+    def session(self, timeout=None):
+        """Context manager, which acquires a session and releases it at the end. If the block raises an
+        exception, the state of the session is unknown (eg. a command may still be running), so it is
+        replaced.
+
+        :param timeout: See `acquire`
+        """
+        session = self.acquire(timeout)
+        try:
+            yield session
+        except BaseException:
+            self.release(session, broken=True)
+            raise
+        self.release(session)
+
+    def close(self):
+        """Exits the ready sessions. The acquired (and the spawning) sessions are exited at their
+        release.
+
+        :return: None
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                session = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(session, Exception):
+                VivadoPool._exit_session(session)
@@ -1,27 +1,54 @@
 # This is a dummy TCL script, which emulates the behaviour of the XSCT_server.
+#
+# Usage: tclsh dummy_xsct.tcl ?port? ?delay?
+#   port:  the TCP port to listen on (default: 4567)
+#   delay: the emulated processing time of each command in milliseconds (default: 100)
+#
+# Many clients can be connected at the same time. The commands are evaluated at global level, so the
+# clients share the variables.
 
 # Based on https://wiki.tcl-lang.org/page/The+simplest+possible+socket+demonstration
 
 set run 1
+set port 4567
+set delay 100
 
-proc accept {chan addr port} {          ;# Make a proc to accept connections
-    while {1} {
-        set cmd [gets $chan]
+if {[llength $argv] > 0} {
+    set port [lindex $argv 0]
+}
+if {[llength $argv] > 1} {
+    set delay [lindex $argv 1]
+}
+
+proc handle {chan addr port} {          ;# Make a proc to process the commands of a client
+    global delay
+    while {[gets $chan cmd] >= 0} {
         puts "$addr:$port says $cmd"    ;# Receive a string
-        if {[catch {set ans [eval $cmd]} errmsg]} {
-            set ans "error $ans"
+        if {[catch {set ans [uplevel #0 $cmd]} errmsg]} {
+            set ans "error $errmsg"
         } else {
             set ans "okay $ans"
         }
-        after 100
-        puts $chan $ans                 ;# Send the answer back
-        flush $chan
-        if {$cmd == "exit"} {
-            close $chan                 ;# Close the socket (automatically flushes)
-            set run 0
-            break
+        if {$delay > 0} {
+            after $delay
         }
+        puts $chan $ans                 ;# Send the answer back
+    }
+    if {[eof $chan]} {
+        close $chan                     ;# The client has disconnected
+        return
     }
-}                                        ;#
-socket -server accept 4567               ;# Create a server socket
+    # Flush only when all the pipelined commands have been answered. (Small packets would be
+    # delayed by Nagle's algorithm.)
+    if {[catch {flush $chan}]} {
+        close $chan
+    }
+}
+
+proc accept {chan addr port} {          ;# Make a proc to accept connections
+    fconfigure $chan -blocking 0 -buffering full
+    fileevent $chan readable [list handle $chan $addr $port]
+}
+
+socket -server accept $port             ;# Create a server socket
 vwait run
@@ -0,0 +1,240 @@
+"""Vectorized eye metrics of batches of scans.
+
+The scans of the same shape (same x and y axes) are stacked into a 3D array (scan, y, x) and the metrics
+of all of them are computed at once. The results are the same as the per-scan methods of ScanStructure
+(_test_eye, _get_area, get_open_area), the array of a metric has one element per scan.
+"""
+
+import collections
+import logging
+import numpy as np
+
+from .util import PylinxException
+
+logger = logging.getLogger('pylinx')
+
+# x, y: the common axes, values: 3D array of the BER values (scan, y, x), horizontal_increment and
+# open_area: 1D arrays of the header fields.
+ScanStack = collections.namedtuple('ScanStack', ['x', 'y', 'values', 'horizontal_increment', 'open_area'])
+
+
+def stack_scans(scans):
+    """Stacks equally shaped scans into a ScanStack.
+
+    :param scans: List of ScanStructures.
+    :return: ScanStack
+    """
+    if not scans:
+        raise PylinxException('No scans to stack.')
+    x = scans[0]['scanData']['x']
+    y = scans[0]['scanData']['y']
+    for scan in scans[1:]:
+        scan_data = scan['scanData']
+        if not (np.array_equal(scan_data['x'], x) and np.array_equal(scan_data['y'], y)):
+            raise PylinxException('Cannot stack scans of different axes: {}'.format(scan.filename))
+    return ScanStack(
+        x=x,
+        y=y,
+        values=np.stack([scan['scanData']['values'] for scan in scans]),
+        horizontal_increment=np.array([scan['Horizontal Increment'] for scan in scans], dtype=np.float64),
+        open_area=np.array([scan['Open Area'] for scan in scans], dtype=np.float64))
+
+
+def group_scans(scans):
+    """Groups the scans by their axes.
+
+    :param scans: List of ScanStructures.
+    :return: List of (indexes, ScanStack) pairs. The indexes are the positions of the scans in the list.
+    """
+    groups = collections.OrderedDict()
+    for index, scan in enumerate(scans):
+        scan_data = scan['scanData']
+        key = (scan_data['x'].tobytes(), scan_data['y'].tobytes())
+        groups.setdefault(key, []).append(index)
+    return [(indexes, stack_scans([scans[i] for i in indexes])) for indexes in groups.values()]
+
+
+def valid_eyes(stack, x_limit=0.45, x_val_limit=0.005):
+    """Tests that the scans are eyes or not. See ScanStructure._test_eye
+
+    :return: Boolean array.
+    """
+    edge = np.abs(stack.x) > x_limit
+    if np.count_nonzero(edge) < 2:
+        logger.warning('Too few edge indexes')
+        return np.zeros(len(stack.values), dtype=bool)
+    return stack.values[:, :, edge].min(axis=(1, 2)) >= x_val_limit
+
+
+def center_areas(stack, x_limit=0.2):
+    """The improved area meter: the average of the center area. See ScanStructure._get_area
+
+    :return: Float array. NaN-s if there are too few center columns.
+    """
+    center = np.abs(stack.x) < x_limit
+    center_count = np.count_nonzero(center)
+    if center_count < 2:
+        logger.warning('Too few center indexes')
+        return np.full(len(stack.values), np.nan)
+    center_values = stack.values[:, :, center]
+    center_avg = np.mean(0.1 / center_values.sum(axis=2) / center_count, axis=1)
+    return center_avg * stack.horizontal_increment
+
+
+def open_areas(stack, valid=None, areas=None):
+    """The open areas of the scans. See ScanStructure.get_open_area
+
+    :param valid: The result of valid_eyes (computed if it is None).
+    :param areas: The result of center_areas (computed if it is None).
+    :return: Float array.
+    """
+    if valid is None:
+        valid = valid_eyes(stack)
+    if areas is None:
+        areas = center_areas(stack)
+    improved = np.where(np.isnan(areas), 0.0, areas)
+    return np.where(valid, np.where(stack.open_area < 1.0, improved, stack.open_area), 0.0)
+
+
+def _runs_around(mask, center):
+    """Returns the number of the True elements before and after (both including) the center index along
+    the last axis, in the contiguous run containing the center. Both are 0 if the center is False.
+    """
+    after = np.cumprod(mask[..., center:], axis=-1).sum(axis=-1)
+    before = np.cumprod(mask[..., center::-1], axis=-1).sum(axis=-1)
+    return before, after
+
+
+def _center_index(axis):
+    return int(np.argmin(np.abs(axis)))
+
+
+def _as_levels(ber):
+    levels = np.atleast_1d(np.asarray(ber, dtype=np.float64))
+    return levels, np.ndim(ber) == 0
+
+
+def horizontal_openings(stack, ber=1e-6):
+    """The horizontal opening of the eyes: the width (in x units, i.e. UI) of the contiguous region of the
+    center row (y nearest to 0), around the center column, where the BER is not greater than the limit.
+
+    :param ber: The BER limit or a list of limits.
+    :return: Float array (scan) or 2D array (limit, scan) if ber is a list.
+    """
+    levels, scalar = _as_levels(ber)
+    row = stack.values[:, _center_index(stack.y), :]
+    center = _center_index(stack.x)
+    mask = row[np.newaxis, :, :] <= levels[:, np.newaxis, np.newaxis]
+    before, after = _runs_around(mask, center)
+    openings = np.where(after > 0, stack.x[center + np.maximum(after, 1) - 1] -
+                        stack.x[center - np.maximum(before, 1) + 1], 0.0)
+    return openings[0] if scalar else openings
+
+
+def vertical_openings(stack, ber=1e-6):
+    """The vertical opening of the eyes: the height (in y units) of the contiguous region of the center
+    column (x nearest to 0), around the center row, where the BER is not greater than the limit.
+
+    :param ber: The BER limit or a list of limits.
+    :return: Float array (scan) or 2D array (limit, scan) if ber is a list.
+    """
+    levels, scalar = _as_levels(ber)
+    column = stack.values[:, :, _center_index(stack.x)]
+    center = _center_index(stack.y)
+    mask = column[np.newaxis, :, :] <= levels[:, np.newaxis, np.newaxis]
+    before, after = _runs_around(mask, center)
+    # The extent is measured on the y axis, which can be in any (usually descending) order.
+    first = stack.y[center - np.maximum(before, 1) + 1]
+    last = stack.y[center + np.maximum(after, 1) - 1]
+    openings = np.where(after > 0, np.abs(last - first), 0.0)
+    return openings[0] if scalar else openings
+
+
+def eye_contours(stack, ber=1e-6):
+    """The contours of the eyes: the left and the right edges (x values) of the open region of every row
+    at the BER limits. The open region of a row is the contiguous region around the center column, where
+    the BER is not greater than the limit. The edges are NaN-s if the center of the row is closed.
+
+    :param ber: The BER limit or a list of limits.
+    :return: (left, right) pair of 3D arrays (limit, scan, y). Without the limit axis if ber is a scalar.
+    """
+    levels, scalar = _as_levels(ber)
+    center = _center_index(stack.x)
+    mask = stack.values[np.newaxis, :, :, :] <= levels[:, np.newaxis, np.newaxis, np.newaxis]
+    before, after = _runs_around(mask, center)
+    is_open = after > 0
+    left = np.where(is_open, stack.x[center - np.maximum(before, 1) + 1], np.nan)
+    right = np.where(is_open, stack.x[center + np.maximum(after, 1) - 1], np.nan)
+    return (left[0], right[0]) if scalar else (left, right)
+
+
+# The metrics, which are computed at every BER limit (they have a leading limit axis if ber is a list).
+_per_limit_metrics = ('horizontal_opening', 'vertical_opening', 'contour_left', 'contour_right')
+
+
+def compute_metrics(stack, ber=1e-6):
+    """Computes all the metrics of a ScanStack.
+
+    :param ber: The BER limit (or list of limits) of the openings and the contours.
+    :return: Dict of the metric arrays: valid, center_area, open_area (scan), horizontal_opening,
+        vertical_opening (scan) and contour_left, contour_right (scan, y). The last four have a leading
+        limit axis if ber is a list.
+    """
+    valid = valid_eyes(stack)
+    areas = center_areas(stack)
+    left, right = eye_contours(stack, ber)
+    return {
+        'valid': valid,
+        'center_area': areas,
+        'open_area': open_areas(stack, valid, areas),
+        'horizontal_opening': horizontal_openings(stack, ber),
+        'vertical_opening': vertical_openings(stack, ber),
+        'contour_left': left,
+        'contour_right': right,
+    }
+
+
+def batch_metrics(scans, ber=1e-6):
+    """Computes the metrics of scans of any shape. The scans are grouped by their axes, the metrics of the
+    groups are computed at once.
+
+    :param scans: List of ScanStructures.
+    :param ber: The BER limit (or list of limits) of the openings and the contours.
+    :return: List of dicts of the metrics in the order of the scans (the values are python scalars, the
+        contours are lists of the rows). If ber is a list, the openings and the contours are lists with
+        one item per limit.
+    """
+    scalar = np.ndim(ber) == 0
+    results = [None] * len(scans)
+    for indexes, stack in group_scans(scans):
+        metrics = compute_metrics(stack, ber)
+        for position, index in enumerate(indexes):
+            results[index] = dict(
+                (name, (values[position] if scalar or name not in _per_limit_metrics else values[:, position]).tolist())
+                for name, values in metrics.items())
+    return results
+
+
+def normalized_metrics(scan, ber=1e-5):
+    """Computes the metrics of a scan, which are comparable between scans of different fidelity (scan
+    type, increments and dwell BER). The openings are fractions of the scanned range, so they don't depend
+    on the increments. The BER limit should not be less than the greatest dwell BER of the compared scans.
+
+    :param scan: ScanStructure (2d statistical or 1d bathtub)
+    :param ber: The BER limit of the openings.
+    :return: Dict: valid, horizontal_opening (UI), vertical_opening (fraction of the scanned y range,
+        None for bathtubs), open_fraction (the fraction of the scanned points, where the BER is not greater
+        than the limit) and score (the horizontal opening of the valid eyes, else 0.0).
+    """
+    stack = stack_scans([scan])
+    valid = bool(valid_eyes(stack)[0])
+    horizontal = float(horizontal_openings(stack, ber)[0])
+    y_range = float(np.ptp(stack.y))
+    vertical = float(vertical_openings(stack, ber)[0]) / y_range if y_range > 0 else None
+    return {
+        'valid': valid,
+        'horizontal_opening': horizontal,
+        'vertical_opening': vertical,
+        'open_fraction': float(np.count_nonzero(stack.values[0] <= ber)) / stack.values[0].size,
+        'score': horizontal if valid else 0.0,
+    }
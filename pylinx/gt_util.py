@@ -1,65 +1,272 @@
 import csv
+import json
 import logging
+import os
+import struct
+import time
+import numpy as np
+from collections.abc import MutableMapping
 from .util import PylinxException
-from statistics import mean
 
 logger = logging.getLogger('pylinx')
 
+# The binary cache (sidecar) file of a scan: magic, the length of the json header, the number of rows and
+# columns, the json header (padded to 8 bytes), then the float64 arrays: x, y and values (row-major).
+cache_suffix = '.pxscan'
+_cache_magic = b'PXSCAN01'
+_cache_prefix = struct.Struct('<8sIII4x')
 
-class ScanStructure(dict):
-    def __init__(self, filename):
-        super(ScanStructure, self).__init__()
-        self.read_csv(filename)
+# The note appended to the 'Misc Info' header field of the scans stopped early (see run_scan in
+# hw_server.tcl). Their eyes are truncated.
+stopped_scan_note = 'pylinx: stopped early'
 
-    def read_csv(self, filename):
-        # ret = {}
-        scan_rows = []
-        store_scan_rows = False
 
-        with open(filename) as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter=',')
-            for row in csv_reader:
-                if row[0] == 'Scan Start':
-                    store_scan_rows = True
-                    continue
-                elif row[0] == 'Scan End':
-                    store_scan_rows = False
-                    self['scanData'] = ScanStructure._parse_scan_rows(scan_rows)
-                    continue
-                elif store_scan_rows:
-                    scan_rows.append(row)
-                    continue
-                else:
-                    # Try to convert numbers if ots possible
-                    try:
-                        val = float(row[1])
-                    except ValueError:
-                        val = row[1]
-                    self[row[0]] = val
+class ScanStructure(MutableMapping):
+    """The content of a scan file written by Vivado's write_hw_sio_scan.
+
+    The header fields (like 'Open Area' or 'Scan Name') and the parsed scan data ('scanData') can be
+    accessed like a dict. In lazy mode only the header is read at construction and the scan data is
+    parsed at its first access.
+    """
+
+    __slots__ = ('filename', '_header', '_scan_data', '_data_offset')
+
+    def __init__(self, filename, lazy=False):
+        """Reads a scan file.
+
+        :param filename: The path of the csv file.
+        :param lazy: True: read only the header now, the scan data will be read at the first access.
+        """
+        self.filename = filename
+        self._header = {}
+        self._scan_data = None
+        self._data_offset = None
+        self.read_csv(filename, lazy)
+
+    @classmethod
+    def load(cls, filename, lazy=False, cache=True):
+        """Reads a scan file through its binary cache file (see write_cache). If the cache is missing or
+        it is older than the csv file, the csv is parsed and the cache is regenerated. The scan data is
+        memory mapped from the cache, so repeated loads don't parse anything and the worker processes
+        analyzing the same scans share the pages.
+
+        :param filename: The path of the csv file.
+        :param lazy: See __init__. Used only if the cache is not used.
+        :param cache: False: don't use the cache, the same as ScanStructure(filename, lazy)
+        """
+        if not cache:
+            return cls(filename, lazy)
+        cache_filename = filename + cache_suffix
+        stat = os.stat(filename)
+        try:
+            scan = cls.__new__(cls)
+            if scan._read_cache(cache_filename, filename, stat):
+                return scan
+        except (OSError, ValueError, PylinxException) as ex:
+            logger.warning('Cannot read the scan cache %s: %s', cache_filename, ex)
+
+        scan = cls(filename)
+        try:
+            scan.write_cache(cache_filename, stat)
+        except OSError as ex:
+            logger.warning('Cannot write the scan cache %s: %s', cache_filename, ex)
+        return scan
+
+    def write_cache(self, cache_filename=None, stat=None):
+        """Writes the header and the scan data into a binary cache file.
+
+        :param cache_filename: The path of the cache file. Default: the csv path + '.pxscan'
+        :param stat: os.stat of the csv file (its size and mtime are stored to detect the changes).
+        """
+        if cache_filename is None:
+            cache_filename = self.filename + cache_suffix
+        if stat is None:
+            stat = os.stat(self.filename)
+        scan_data = self['scanData'] if self._data_offset is not None or self._scan_data is not None else None
+        meta = {
+            'csv_size': stat.st_size,
+            'csv_mtime_ns': stat.st_mtime_ns,
+            'header': self._header,
+            'scanType': scan_data['scanType'] if scan_data else None,
+        }
+        meta = json.dumps(meta).encode('utf-8')
+        meta += b' ' * (-len(meta) % 8)
+        rows, cols = scan_data['values'].shape if scan_data else (0, 0)
+
+        # Write and rename: the readers never see a partial file.
+        tmp_filename = '{}.{}.tmp'.format(cache_filename, os.getpid())
+        try:
+            with open(tmp_filename, 'wb') as cache_file:
+                cache_file.write(_cache_prefix.pack(_cache_magic, len(meta), rows, cols))
+                cache_file.write(meta)
+                if scan_data:
+                    for name in ('x', 'y', 'values'):
+                        cache_file.write(np.ascontiguousarray(scan_data[name], dtype='<f8').tobytes())
+            os.replace(tmp_filename, cache_filename)
+        finally:
+            # Nothing is left behind if the writing has failed.
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def _read_cache(self, cache_filename, filename, stat):
+        """Reads the cache file if it is up to date. Returns False if the cache is missing or stale.
+        """
+        with open(cache_filename, 'rb') as cache_file:
+            magic, meta_len, rows, cols = _cache_prefix.unpack(cache_file.read(_cache_prefix.size))
+            if magic != _cache_magic:
+                raise PylinxException('Not a scan cache file.')
+            meta = json.loads(cache_file.read(meta_len).decode('utf-8'))
+        if meta['csv_size'] != stat.st_size or meta['csv_mtime_ns'] != stat.st_mtime_ns:
+            logger.debug('The scan cache is stale: %s', cache_filename)
+            return False
+
+        self.filename = filename
+        self._header = meta['header']
+        self._data_offset = None
+        self._scan_data = None
+        if meta['scanType'] is not None:
+            grid = np.memmap(cache_filename, dtype='<f8', mode='r', offset=_cache_prefix.size + meta_len,
+                             shape=(cols + rows + rows * cols,)).view(np.ndarray)
+            self._scan_data = {
+                'scanType': meta['scanType'],
+                'x': grid[:cols],
+                'y': grid[cols:cols + rows],
+                'values': grid[cols + rows:].reshape(rows, cols),
+            }
+        return True
+
+    def read_csv(self, filename, lazy=False):
+        self.filename = filename
+        with open(filename, 'rb') as csv_file:
+            self._read_header(csv_file)
+            if not lazy and self._data_offset is not None:
+                self._scan_data = ScanStructure._read_scan_data(csv_file)
+
+    def _read_header(self, csv_file):
+        """Reads the header fields until the 'Scan Start' line and records the offset of the data.
+        """
+        self._data_offset = None
+        for line in iter(csv_file.readline, b''):
+            line = line.decode('utf-8').rstrip('\r\n')
+            row = next(csv.reader([line], delimiter=','))
+            if row[0] == 'Scan Start':
+                self._data_offset = csv_file.tell()
+                return
+            self._header[row[0]] = ScanStructure._header_value(row)
+
+    @staticmethod
+    def _header_value(row):
+        # Try to convert numbers if ots possible
+        try:
+            return float(row[1])
+        except ValueError:
+            return row[1]
+
+    @staticmethod
+    def _read_scan_data(csv_file):
+        """Reads the data block until the 'Scan End' line.
+        """
+        scan_lines = []
+        for line in iter(csv_file.readline, b''):
+            line = line.decode('utf-8').rstrip('\r\n')
+            if line.split(',', 1)[0] == 'Scan End':
+                # The data rows are parsed at once, see _parse_scan_rows
+                return ScanStructure._parse_scan_rows(scan_lines)
+            scan_lines.append(line)
+        raise PylinxException('Scan End is missing.')
+
+    @property
+    def header(self):
+        """Returns the header fields (everything, but the scan data) in a new dict.
+        """
+        return dict(self._header)
+
+    def is_loaded(self):
+        """Returns True if the scan data has been parsed (or there is no scan data in the file).
+        """
+        return self._scan_data is not None or self._data_offset is None
+
+    def is_stopped(self):
+        """Returns True if the scan has been stopped early (eg. it has been pruned). Its eye is truncated,
+        so it is not a valid scan and its open area is 0.0.
+        """
+        return stopped_scan_note in str(self._header.get('Misc Info', ''))
+
+    def _load_scan_data(self):
+        with open(self.filename, 'rb') as csv_file:
+            csv_file.seek(self._data_offset)
+            self._scan_data = ScanStructure._read_scan_data(csv_file)
+
+    def __getitem__(self, key):
+        if key == 'scanData':
+            if self._scan_data is None:
+                if self._data_offset is None:
+                    raise KeyError(key)
+                self._load_scan_data()
+            return self._scan_data
+        return self._header[key]
+
+    def __setitem__(self, key, value):
+        if key == 'scanData':
+            self._scan_data = value
+        else:
+            self._header[key] = value
+
+    def __delitem__(self, key):
+        if key == 'scanData':
+            if self._scan_data is None and self._data_offset is None:
+                raise KeyError(key)
+            self._scan_data = None
+            self._data_offset = None
+        else:
+            del self._header[key]
+
+    def __iter__(self):
+        for key in self._header:
+            yield key
+        if self._scan_data is not None or self._data_offset is not None:
+            yield 'scanData'
+
+    def __len__(self):
+        return len(self._header) + (self._scan_data is not None or self._data_offset is not None)
+
+    def __repr__(self):
+        return '{}({!r}, header={!r}, loaded={})'.format(
+            type(self).__name__, self.filename, self._header, self.is_loaded())
 
     @staticmethod
-    def _parse_scan_rows(scan_rows):
+    def _parse_scan_rows(scan_lines):
+        """Parses the data block of the scan (the lines between 'Scan Start' and 'Scan End').
+
+        The first line is the scan type and the x axis, the other lines are the y values and the BER
+        values of the rows. The data is stored in numpy arrays: 'x' and 'y' are 1D arrays, 'values' is a
+        2D array (rows: y, columns: x).
+        """
+        header = scan_lines[0].split(',')
         scan_data = {
-            'scanType': scan_rows[0][0],
-            'x': [],
-            'y': [],
-            'values': []    # type: List[List[float]]
+            'scanType': header[0],
+            'x': None,
+            'y': None,
+            'values': None
         }
 
         if scan_data['scanType'] not in ['1d bathtub', '2d statistical']:
             logger.error('Unknown scan type: ' + scan_data['scanType'])
             raise PylinxException('Unknown scan type: ' + scan_data['scanType'])
 
-        xdata = scan_rows[0][1:]
+        xdata = np.array(header[1:], dtype=np.float64)
         # Need to normalize, dont know why...
-        divider = abs(float(xdata[0]) * 2)
-
-        scan_data['x'] = [float(x) / divider for x in scan_rows[0][1:]]
+        divider = abs(xdata[0] * 2)
+        scan_data['x'] = xdata / divider
 
-        for r in scan_rows[1:]:
-            intr = [float(x) for x in r]
-            scan_data['y'].append(intr[0])
-            scan_data['values'].append(intr[1:])
+        # Parse all the rows at once.
+        rows = len(scan_lines) - 1
+        grid = np.fromstring(','.join(scan_lines[1:]), dtype=np.float64, sep=',')
+        if grid.size != rows * (len(xdata) + 1):
+            raise PylinxException('Malformed scan data: {} values in {} rows.'.format(grid.size, rows))
+        grid = grid.reshape(rows, len(xdata) + 1)
+        scan_data['y'] = grid[:, 0].copy()
+        scan_data['values'] = grid[:, 1:].copy()
 
         return scan_data
 
@@ -70,22 +277,16 @@ class ScanStructure(dict):
         """
         scan_data = self['scanData']
 
-        # Get the indexes of the 'edge'
+        # Get the 'edge' columns.
         # Edge means where abs(x) offset is big, bigger than x_limit=0.45.
-        edge_indexes = [i for i, x in enumerate(scan_data['x']) if abs(x) > x_limit]
-        logger.debug(edge_indexes)
-        if len(edge_indexes) < 2:
+        edge = np.abs(scan_data['x']) > x_limit
+        logger.debug(np.flatnonzero(edge))
+        if np.count_nonzero(edge) < 2:
             logger.warning('Too few edge indexes')
             return False
 
-        # edge_values contains BER values of the edge positions.
-        edge_values = []
-        for v in scan_data['values']:
-            edge_values.append([v[i] for i in edge_indexes])
-
-        # print('edgeValues: ' + str(edgeValues))
         # A valid eye must contains high BER values at the edges:
-        global_minimum = min([min(ev) for ev in edge_values])
+        global_minimum = scan_data['values'][:, edge].min()
 
         if global_minimum < x_val_limit:
             logger.info(
@@ -105,25 +306,25 @@ class ScanStructure(dict):
         """
 
         scan_data = self['scanData']
-        # Get the indexes of the 'center'
+        # Get the 'center' columns.
         # Center means where abs(x) offset is small, less than 0.1.
-        center_indexes = [i for i, x in enumerate(scan_data['x']) if abs(x) < x_limit]
-        if len(center_indexes) < 2:
+        center = np.abs(scan_data['x']) < x_limit
+        center_count = np.count_nonzero(center)
+        if center_count < 2:
             logger.warning('Too few center indexes')
             return False
 
-        # centerValues contains BER values of the center positions.
-        center_values = []
-        for v in scan_data['values']:
-            center_values.append([v[i] for i in center_indexes])
+        # center_values contains BER values of the center positions.
+        center_values = scan_data['values'][:, center]
 
         # Get the avg center value:
-        center_avg = [0.1 / float(sum(cv)) / float(len(cv)) for cv in center_values]
-        center_avg = mean(center_avg)
+        center_avg = np.mean(0.1 / center_values.sum(axis=1) / center_count)
 
-        return center_avg * self['Horizontal Increment']
+        return float(center_avg * self['Horizontal Increment'])
 
     def get_open_area(self):
+        if self.is_stopped():
+            return 0.0
         if self._test_eye():
             if self['Open Area'] < 1.0:
                 # if the 'official open area' is 0 try to improve:
@@ -132,3 +333,206 @@ class ScanStructure(dict):
                 return self['Open Area']
         else:
             return 0.0
+
+
+class IncrementalScanReader:
+    """Reads a scan file incrementally, while it is being written.
+
+    The content is fed in chunks of any size (partial lines are kept until they are completed), the
+    header fields and the data rows are parsed as they arrive. The scan of the rows seen so far can be
+    evaluated at any time, so the post-processing can overlap with the hardware scan. The reader also
+    accepts snapshots: a file, which is rewritten with more and more rows (see dump_scan in
+    hw_server.tcl).
+    """
+
+    def __init__(self, filename=None):
+        """:param filename: The name of the scan (used in the ScanStructures and in the messages).
+        """
+        self.filename = filename
+        self.reset()
+
+    def reset(self):
+        """Forgets everything has been read."""
+        self._pending = b''
+        self._header = {}
+        self._axis = None
+        self._rows = []
+        self._in_data = False
+        self.complete = False
+
+    @property
+    def header(self):
+        return dict(self._header)
+
+    @property
+    def rows_seen(self):
+        return len(self._rows)
+
+    def feed(self, chunk):
+        """Processes a chunk of the file.
+
+        :param chunk: bytes or str
+        :return: The number of the new data rows.
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if self.complete:
+            return 0
+        lines = (self._pending + chunk).split(b'\n')
+        self._pending = lines.pop()
+        rows_before = len(self._rows)
+        for line in lines:
+            self._parse_line(line.decode('utf-8').rstrip('\r'))
+            if self.complete:
+                self._pending = b''
+                break
+        return len(self._rows) - rows_before
+
+    def _parse_line(self, line):
+        if not self._in_data:
+            if not line:
+                return
+            row = next(csv.reader([line], delimiter=','))
+            if row[0] == 'Scan Start':
+                self._in_data = True
+            elif len(row) > 1:
+                self._header[row[0]] = ScanStructure._header_value(row)
+            return
+        if line.split(',', 1)[0] == 'Scan End':
+            self.complete = True
+        elif self._axis is None:
+            # The first line of the data block: the scan type and the x axis.
+            self._axis = ScanStructure._parse_scan_rows([line])
+        else:
+            values = np.fromstring(line, dtype=np.float64, sep=',')
+            if values.size != self._axis['x'].size + 1:
+                raise PylinxException('Malformed scan data row: {} values in {}'.format(values.size, self.filename))
+            self._rows.append(values)
+
+    def scan(self):
+        """Returns the ScanStructure of the rows seen so far.
+        """
+        scan = ScanStructure.__new__(ScanStructure)
+        scan.filename = self.filename
+        scan._header = dict(self._header)
+        scan._data_offset = None
+        scan._scan_data = None
+        if self._axis is not None:
+            grid = np.vstack(self._rows) if self._rows else np.empty((0, self._axis['x'].size + 1))
+            scan._scan_data = {
+                'scanType': self._axis['scanType'],
+                'x': self._axis['x'],
+                'y': grid[:, 0].copy(),
+                'values': grid[:, 1:].copy(),
+            }
+        return scan
+
+    def metrics(self):
+        """Evaluates the rows seen so far.
+
+        :return: Dict: rows, complete, valid, center_area (and open_area, when the scan is complete).
+            valid and center_area are None if there are no rows yet.
+        """
+        metrics = {'rows': self.rows_seen, 'complete': self.complete, 'valid': None, 'center_area': None}
+        if self._rows:
+            scan = self.scan()
+            metrics['valid'] = scan._test_eye()
+            area = scan._get_area()
+            metrics['center_area'] = None if area is False else area
+            if self.complete:
+                metrics['open_area'] = scan.get_open_area()
+        return metrics
+
+    def follow(self, filename=None, interval=0.1, timeout=None, chunk_size=64 * 1024, running=None):
+        """Tails a scan file while it is being written. It yields after every read, which has brought new
+        rows and it returns when the 'Scan End' line has been read. The file may not exist yet, and it
+        may be replaced by a longer snapshot (then the reading restarts from its beginning).
+
+        :param filename: The file to follow. Default: the filename of the reader.
+        :param interval: The polling interval in seconds.
+        :param timeout: Raises PylinxException if the scan is not completed in time. None: no timeout.
+        :param chunk_size: The maximum size of one read.
+        :param running: Callable, which returns False if the writer has finished (or died). Then the file
+            is read for the last time and the following stops, even if the scan is not complete.
+        :return: Generator of the reader itself.
+        """
+        filename = filename or self.filename
+        deadline = None if timeout is None else time.monotonic() + timeout
+        position = 0
+        identity = None
+        while not self.complete:
+            writer_running = running is None or running()
+            new_rows = None
+            try:
+                scan_file = open(filename, 'rb')
+            except FileNotFoundError:
+                scan_file = None
+            if scan_file is not None:
+                with scan_file:
+                    stat = os.fstat(scan_file.fileno())
+                    if identity is not None and ((stat.st_dev, stat.st_ino) != identity or stat.st_size < position):
+                        logger.debug('The scan file has been replaced: %s', filename)
+                        self.reset()
+                        position = 0
+                    identity = (stat.st_dev, stat.st_ino)
+                    if stat.st_size > position:
+                        new_rows = 0
+                        scan_file.seek(position)
+                        for chunk in iter(lambda: scan_file.read(chunk_size), b''):
+                            position += len(chunk)
+                            new_rows += self.feed(chunk)
+            if new_rows is not None:
+                if new_rows or self.complete:
+                    yield self
+                if writer_running:
+                    continue
+            if not writer_running:
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                raise PylinxException('Timeout while following scan: {}'.format(filename))
+            time.sleep(interval)
+
+
+class ScanPruner:
+    """Decides whether a running scan is hopeless, based on its rows measured so far.
+
+    A scan is hopeless if it is not an eye: one of its edge values is already less than the limit of
+    ScanStructure._test_eye, so its open area will be 0.0 whatever the rest of the rows are (exact). As
+    an opt-in heuristic, a scan whose center (at y = 0) is closed is hopeless too, when the current
+    best is an open eye.
+    """
+
+    def __init__(self, x_limit=0.45, x_val_limit=0.005, closed_ber=None, open_area_limit=1.0):
+        """
+        :param x_limit: See ScanStructure._test_eye
+        :param x_val_limit: See ScanStructure._test_eye
+        :param closed_ber: The center of the eye is closed if its BER is greater than this. None: don't
+            prune the closed eyes.
+        :param open_area_limit: The closed eyes are pruned only if the best open area is at least this.
+        """
+        self.x_limit = x_limit
+        self.x_val_limit = x_val_limit
+        self.closed_ber = closed_ber
+        self.open_area_limit = open_area_limit
+
+    def check(self, reader, best=None):
+        """Checks the rows seen by an IncrementalScanReader.
+
+        :param reader: IncrementalScanReader
+        :param best: The best open area so far (see ScanStructure.get_open_area).
+        :return: The reason of pruning or None if the scan should be continued.
+        """
+        if not reader.rows_seen:
+            return None
+        scan_data = reader.scan()['scanData']
+        x, y, values = scan_data['x'], scan_data['y'], scan_data['values']
+        edge = np.abs(x) > self.x_limit
+        if np.count_nonzero(edge) < 2:
+            return 'too few edge indexes'
+        if values[:, edge].min() < self.x_val_limit:
+            return 'not an eye'
+        if self.closed_ber is not None and best is not None and best >= self.open_area_limit:
+            center_rows = np.flatnonzero(y == 0.0)
+            if center_rows.size and values[center_rows[0], np.argmin(np.abs(x))] > self.closed_ber:
+                return 'closed eye'
+        return None
@@ -31,45 +31,109 @@ proc init { {hw_server_url "localhost:3121"} } {
 }
 
 
-proc fetch_devices { } {
+# The devices of the targets (target -> list of devices), filled by fetch_devices.
+if {![info exists ::pylinx_device_cache]} {
+    set ::pylinx_device_cache [dict create]
+}
+# The timing breakdown of the last fetch_devices/set_device (name -> value, the times are in ms).
+set ::pylinx_fetch_timing [dict create]
+set ::pylinx_set_device_timing [dict create]
+
+
+proc pylinx_ms { start } {
+    return [expr {([clock microseconds] - $start) / 1000.0}]
+}
+
+
+proc current_target_name { } {
+    if { [catch {current_hw_target} target] } {
+        return ""
+    }
+    return $target
+}
+
+
+# Returns the {target device} pairs of all targets.
+# The devices of the targets are cached: only the new targets are opened, unless they are refreshed.
+# refreshTargets: the targets to explore again (incremental refresh), "*": all of them.
+proc fetch_devices { {refreshTargets ""} } {
 
     set allDevices ""
-    
+    set timing [dict create get_targets 0.0 open_targets 0.0 get_devices 0.0 opened 0 cached 0]
+
     puts "Getting hardware targets (ie. blasters)"
+    set start [clock microseconds]
     set targets [get_hw_target]
+    dict set timing get_targets [pylinx_ms $start]
 
     # Setting XXside (TX/RX) target
     if { [llength $targets] < 1 } {
         puts "No target blaster found. Please connect one to your machine"
+        set ::pylinx_fetch_timing $timing
         return -1
-    } else {
-        for {set i 0} {$i < [llength $targets]} {incr i} {
-            set trg [lindex $targets $i]
-            close_hw_target -quiet
-            puts "Opening target for side: $trg"
-            # Run quietly to prevent errors when it already opened.
-            open_hw_target $trg -quiet
-            
-            set devices [get_hw_devices]
-            for {set j 0} {$j < [llength $devices]} {incr j} {
-                set dev [lindex $devices $j]
-                # current_hw_device $dev
-                lappend allDevices [list $trg $dev]
+    }
+
+    # Forget the disappeared targets.
+    dict for {trg devices} $::pylinx_device_cache {
+        if { [lsearch -exact $targets $trg] < 0 } {
+            dict unset ::pylinx_device_cache $trg
+        }
+    }
+
+    foreach trg $targets {
+        set refresh [expr {$refreshTargets == "*" || [lsearch -exact $refreshTargets $trg] >= 0}]
+        if { !$refresh && [dict exists $::pylinx_device_cache $trg] } {
+            dict incr timing cached
+        } else {
+            set start [clock microseconds]
+            if { [current_target_name] != $trg } {
+                close_hw_target -quiet
+                puts "Opening target for side: $trg"
+                # Run quietly to prevent errors when it already opened.
+                open_hw_target $trg -quiet
             }
+            dict set timing open_targets [expr {[dict get $timing open_targets] + [pylinx_ms $start]}]
+            dict incr timing opened
+
+            set start [clock microseconds]
+            dict set ::pylinx_device_cache $trg [get_hw_devices]
+            dict set timing get_devices [expr {[dict get $timing get_devices] + [pylinx_ms $start]}]
+        }
+        foreach dev [dict get $::pylinx_device_cache $trg] {
+            lappend allDevices [list $trg $dev]
         }
     }
-    puts $allDevices    
+    set ::pylinx_fetch_timing $timing
+    puts $allDevices
     return $allDevices
 }
 
 
-proc set_device { target device } {
-    close_hw_target -quiet
-    puts "Opening target: $target   $device"
-    # Run quietly to prevent errors when it already opened.
-    open_hw_target $target -quiet
+# Skips the reopening and the refresh if the device is already the current one and it is programmed (its
+# transceivers are visible). force: reopen and refresh anyway.
+proc set_device { target device {force 0} } {
+    set timing [dict create open_target 0.0 refresh_device 0.0 skipped 0]
+    set start [clock microseconds]
+    if { !$force && [current_target_name] == $target
+         && ![catch {current_hw_device} current] && $current == $device
+         && [llength [get_hw_sio_gts -quiet -of_objects [get_hw_devices -quiet $device]]] > 0 } {
+        puts "Target is already open: $target   $device"
+        dict set timing skipped 1
+        set ::pylinx_set_device_timing $timing
+        return
+    }
+    if { $force || [current_target_name] != $target } {
+        close_hw_target -quiet
+        puts "Opening target: $target   $device"
+        # Run quietly to prevent errors when it already opened.
+        open_hw_target $target -quiet
+    }
     current_hw_device $device -quiet
+    dict set timing open_target [pylinx_ms $start]
+    set start [clock microseconds]
     refresh_hw_device -update_hw_probes false [lindex $device 1]
+    dict set timing refresh_device [pylinx_ms $start]
+    set ::pylinx_set_device_timing $timing
 }
 
 
@@ -117,18 +181,185 @@ proc fetch_sio { side } {
 }
 
 
-proc run_scan { scanFile {hincr 16} {vincr 16} {scanType "2d_full_eye"} {linkName "*"} {description {Scan 000}} } {
-    set xil_newScan [create_hw_sio_scan -description $description $scanType  [lindex [get_hw_sio_links $linkName] 0 ]]
-    set_property HORIZONTAL_INCREMENT {$hincr} [get_hw_sio_scans $xil_newScan]
+# Creates (but does not start) a scan on a link.
+# dwellBer: the DWELL_BER of the scan (eg. 1e-5 for fast, coarse scans). Empty: the default of Vivado.
+proc create_scan { link {hincr 16} {vincr 16} {scanType "2d_full_eye"} {description {Scan 000}} {dwellBer ""} } {
+    set xil_newScan [create_hw_sio_scan -description $description $scanType $link]
+    set_property HORIZONTAL_INCREMENT $hincr [get_hw_sio_scans $xil_newScan]
     if { $scanType == "2d_full_eye" } {
-        set_property VERTICAL_INCREMENT   {$vincr} [get_hw_sio_scans $xil_newScan]
+        set_property VERTICAL_INCREMENT   $vincr [get_hw_sio_scans $xil_newScan]
     }
+    if { $dwellBer != "" } {
+        set_property DWELL_BER $dwellBer [get_hw_sio_scans $xil_newScan]
+    }
+    return $xil_newScan
+}
+
+
+proc start_scan { {hincr 16} {vincr 16} {scanType "2d_full_eye"} {linkName "*"} {description {Scan 000}} {dwellBer ""} } {
+    set xil_newScan [create_scan [lindex [get_hw_sio_links $linkName] 0 ] $hincr $vincr $scanType $description $dwellBer]
     run_hw_sio_scan [get_hw_sio_scans $xil_newScan]
+    return $xil_newScan
+}
+
+
+# Returns the status and the progress of a scan, eg. {In Progress} {42%}
+proc scan_progress { scan } {
+    return [list [get_property STATUS $scan] [get_property PROGRESS $scan]]
+}
+
+
+# Returns 1 if a scan status reports that the scan has ended without completing (stopped, aborted or
+# failed).
+proc scan_aborted { status } {
+    return [regexp -nocase {stop|abort|cancel|error|fail} $status]
+}
+
+
+# Returns 1 if the scan has finished: it is done, or it has been stopped, aborted or it has failed.
+proc scan_done { scan } {
+    lassign [scan_progress $scan] status progress
+    return [expr {[string match -nocase "*done*" $status] || $progress == "100%" || [scan_aborted $status]}]
+}
+
+
+# Writes a file atomically: it is written into a temporary file and then it is renamed.
+# note: appended to the 'Misc Info' header field.
+proc write_scan_file { scan scanFile {partial 0} {note ""} } {
+    set tmpFile "$scanFile.[pid].tmp"
+    write_hw_sio_scan $tmpFile [get_hw_sio_scans $scan] -force
+    if { $partial || $note != "" } {
+        set f [open $tmpFile r]
+        set content [read $f]
+        close $f
+        if { $partial } {
+            # The 'Scan End' line marks the complete scans, the readers keep following the partial ones.
+            regsub -line {^Scan End.*$\n?} $content "" content
+        }
+        if { $note != "" } {
+            regsub -line {^Misc Info,[^\r\n]*} $content "& $note" content
+        }
+        set f [open $tmpFile w]
+        puts -nonewline $f $content
+        close $f
+    }
+    file rename -force $tmpFile $scanFile
+}
+
+
+# Writes a snapshot of a running scan (without the 'Scan End' line). Returns 0 if it is not possible.
+proc dump_scan { scan scanFile } {
+    if { [catch {write_scan_file $scan $scanFile 1} err] } {
+        puts "Cannot dump scan: $err"
+        return 0
+    }
+    return 1
+}
+
+
+proc stop_scan { scan } {
+    stop_hw_sio_scan [get_hw_sio_scans $scan]
+}
+
+
+# progressInterval: if it is greater than 0, the partial results are written into the scanFile in every
+# progressInterval ms, while the scan is running. Then the scan can be stopped early by creating the
+# "$scanFile.stop" file: the scan is stopped and its rows measured so far are written into the scanFile.
+# The stopped scans are marked by the "pylinx: stopped early" note in their 'Misc Info' header field.
+# Returns "stopped" if the scan has been stopped early, else "done". An error is raised if the scan has
+# been stopped, aborted or it has failed by other means.
+proc run_scan { scanFile {hincr 16} {vincr 16} {scanType "2d_full_eye"} {linkName "*"} {description {Scan 000}} {progressInterval 0} {dwellBer ""} } {
+    set stopFile "$scanFile.stop"
+    file delete -force $stopFile
+    set xil_newScan [start_scan $hincr $vincr $scanType $linkName $description $dwellBer]
 
     puts "Wait to finish..."
-    wait_on_hw_sio_scan $xil_newScan
+    set result "done"
+    if { $progressInterval > 0 } {
+        while { ![scan_done $xil_newScan] } {
+            after $progressInterval
+            if { [file exists $stopFile] } {
+                puts "Stopping scan early"
+                stop_scan $xil_newScan
+                file delete -force $stopFile
+                set result "stopped"
+                break
+            }
+            dump_scan $xil_newScan $scanFile
+        }
+    }
+    if { $result == "done" } {
+        wait_on_hw_sio_scan $xil_newScan
+        set status [lindex [scan_progress $xil_newScan] 0]
+        if { [scan_aborted $status] } {
+            error "ERROR: The scan has ended with status: $status"
+        }
+    }
+
+    if { $result == "stopped" } {
+        write_scan_file $xil_newScan $scanFile 0 "pylinx: stopped early"
+    } else {
+        write_scan_file $xil_newScan $scanFile
+    }
+    return $result
+}
+
+
+# Runs scans on many links at once: the scans are created for all the links, they are started together
+# and then all of them are waited on. The scan of the i-th link is written into "$scanDir/$prefix$i.csv".
+# links: list of hw_sio_links. Empty: all the links.
+# Returns a list of {link scanFile error} triplets (error is empty if the scan of the link succeeded).
+proc run_scans { scanDir {links ""} {hincr 16} {vincr 16} {scanType "2d_full_eye"} {dwellBer ""} {prefix "link_"} } {
+    if { [llength $links] == 0 } {
+        set links [get_hw_sio_links]
+    }
+    file mkdir $scanDir
 
-    write_hw_sio_scan $scanFile [get_hw_sio_scans $xil_newScan] -force
+    set results [dict create]
+    set scans [dict create]
+    for {set i 0} {$i < [llength $links]} {incr i} {
+        set link [lindex $links $i]
+        set scanFile [file join $scanDir "$prefix$i.csv"]
+        dict set results $link [list $scanFile ""]
+        if { [catch {create_scan $link $hincr $vincr $scanType "$prefix$i" $dwellBer} scan] } {
+            dict set results $link [list $scanFile $scan]
+        } else {
+            dict set scans $link $scan
+        }
+    }
+
+    if { [dict size $scans] > 0 } {
+        puts "Running [dict size $scans] scans..."
+        run_hw_sio_scan [get_hw_sio_scans [dict values $scans]]
+        dict for {link scan} $scans {
+            set scanFile [lindex [dict get $results $link] 0]
+            if { [catch {wait_on_hw_sio_scan $scan; write_scan_file $scan $scanFile} err] } {
+                dict set results $link [list $scanFile $err]
+            }
+        }
+    }
+
+    set retVal {}
+    dict for {link result} $results {
+        lappend retVal [list $link {*}$result]
+    }
+    return $retVal
+}
+
+
+# Creates a (loopback) link for every sio: from the TX to the RX of the same GT. If removeExisting is 1,
+# all the existing links are removed first. Returns the links.
+proc create_links { sios {removeExisting 0} } {
+    if { $removeExisting && [llength [get_hw_sio_links]] > 0 } {
+        puts "Removing the existing links: [get_hw_sio_links]"
+        remove_hw_sio_link [get_hw_sio_links]
+    }
+    set links {}
+    for {set i 0} {$i < [llength $sios]} {incr i} {
+        set sio [lindex $sios $i]
+        lappend links [create_hw_sio_link -description "Link $i" [lindex [get_hw_sio_txs $sio*] 0] [lindex [get_hw_sio_rxs $sio*] 0] ]
+    }
+    return $links
 }
 
 
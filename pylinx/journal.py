@@ -0,0 +1,133 @@
+"""Append-only journal of a sweep.
+
+Every completed point is appended to a JSON lines file immediately (and synced to the disk), so an
+interrupted sweep can be resumed: the completed points are skipped (if their scan files are still
+intact) and the best settings found so far are restored.
+
+Records:
+    {"kind": "point", "point": {...}, "scan_file": ..., "csv_size": ..., "metrics": {...}, "time": ...}
+    {"kind": "best", "name": ..., "value": ..., "time": ...}
+"""
+
+import json
+import logging
+import os
+import time
+
+from .gt_util import ScanStructure
+
+logger = logging.getLogger('pylinx')
+
+
+def _point_key(point):
+    return json.dumps(point, sort_keys=True)
+
+
+class SweepJournal:
+    """Checkpoint journal of a sweep.
+    """
+
+    def __init__(self, path, resume=True):
+        """Opens the journal.
+
+        :param path: The path of the journal file.
+        :param resume: True: the existing records are loaded and the new ones are appended. False: the
+            journal is started from scratch.
+        """
+        self.path = path
+        self.points = {}
+        self.best = {}
+        if resume and os.path.exists(path):
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._file.tell() > 0:
+            with open(path, 'rb') as journal_file:
+                journal_file.seek(-1, os.SEEK_END)
+                if journal_file.read(1) != b'\n':
+                    # Terminate the truncated record, the new records must start on a new line.
+                    self._file.write('\n')
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as journal_file:
+            for number, line in enumerate(journal_file, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be truncated by a crash.
+                    logger.warning('Invalid journal record in %s line %d, ignored', self.path, number)
+                    continue
+                self._apply(record)
+        logger.info('Journal loaded: %d completed points, best settings: %s', len(self.points), self.best)
+
+    def _apply(self, record):
+        if record.get('kind') == 'point':
+            self.points[_point_key(record['point'])] = record
+        elif record.get('kind') == 'best':
+            self.best[record['name']] = record['value']
+
+    def _append(self, record):
+        record['time'] = time.time()
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(record)
+
+    def record_point(self, point, scan_file, metrics):
+        """Records a completed point.
+
+        :param point: Dict, which identifies the point (eg. the parameter values).
+        :param scan_file: The scan file of the point (its size is recorded for the verification).
+        :param metrics: Dict of the metrics (JSON serializable).
+        """
+        size = os.path.getsize(scan_file) if scan_file and os.path.exists(scan_file) else None
+        self._append({'kind': 'point', 'point': point, 'scan_file': scan_file, 'csv_size': size,
+                      'metrics': metrics})
+
+    def record_best(self, name, value):
+        """Records the best value of a parameter."""
+        self._append({'kind': 'best', 'name': name, 'value': value})
+
+    def completed(self, point, verify=True):
+        """Returns the record of a completed point or None. With verify the point is considered to be
+        completed only if its scan file is intact (see verify).
+        """
+        record = self.points.get(_point_key(point))
+        if record is None:
+            return None
+        if verify and not SweepJournal.verify(record):
+            logger.warning('The scan file of a completed point is missing or broken, it is scanned again: %s',
+                           record['scan_file'])
+            return None
+        return record
+
+    @staticmethod
+    def verify(record):
+        """Checks that the scan file of a record exists, it has not changed, it can be parsed and it has
+        been stopped early only if the record says so.
+        """
+        scan_file = record.get('scan_file')
+        if not scan_file:
+            return True
+        try:
+            if os.path.getsize(scan_file) != record.get('csv_size'):
+                return False
+            if ScanStructure(scan_file).is_stopped() != bool((record.get('metrics') or {}).get('pruned')):
+                return False
+        except Exception as ex:
+            logger.debug('Cannot verify %s: %s', scan_file, ex)
+            return False
+        return True
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,285 @@
+"""Sample-efficient search of the transceiver parameters.
+
+Every evaluated point costs a hardware scan, so the strategies try to find a good optimum with as few
+evaluations as possible. The parameters are handled in their ordinal code space: a point is a tuple of
+indexes into the value lists of the parameters. The objective (e.g. the open area of a scan) is maximized.
+
+Strategies:
+    * CoordinateDescent: one parameter at a time, walking away from the current value until the
+      objective stops improving.
+    * PatternSearch: Hooke-Jeeves pattern search on the integer lattice of the codes.
+    * SurrogateSearch: fits a quadratic model to the evaluated points and evaluates the most promising
+      unscanned point next.
+"""
+
+import collections
+import itertools
+import logging
+import re
+
+import numpy as np
+
+from .util import PylinxException
+
+logger = logging.getLogger('pylinx')
+
+
+class BudgetExhausted(PylinxException):
+    """Raised by Objective when the evaluation budget has been used up."""
+
+
+def value_label(value):
+    """Returns the label of a parameter value: the value without the braces and the register code.
+    Eg.: '{6.02 dB (10101)}' -> '6.02 dB'
+    """
+    return re.sub(r'\s*\([01]+\)\s*$', '', value.strip().strip('{}').strip())
+
+
+def dedupe_values(values):
+    """Removes the values with the same label (eg. the saturated '6.02 dB' TXPRE codes), the first one
+    is kept.
+    """
+    labels = set()
+    unique = []
+    for value in values:
+        label = value_label(value)
+        if label not in labels:
+            labels.add(label)
+            unique.append(value)
+    return unique
+
+
+class ParameterSpace:
+    """The values of the parameters. The points are tuples of value indexes (codes).
+    """
+
+    def __init__(self, space, dedupe=True):
+        """
+        :param space: Dict (or list of pairs) of parameter name -> list of values.
+        :param dedupe: Remove the values with the same label. See dedupe_values
+        """
+        self.names = []
+        self.values = []
+        for name, values in (space.items() if hasattr(space, 'items') else space):
+            values = dedupe_values(values) if dedupe else list(values)
+            if not values:
+                raise PylinxException('No values of parameter: {}'.format(name))
+            self.names.append(name)
+            self.values.append(values)
+        self.shape = tuple(len(values) for values in self.values)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def settings(self, point):
+        """Returns the parameter values of a point in a dict."""
+        return collections.OrderedDict((name, values[code])
+                                       for name, values, code in zip(self.names, self.values, point))
+
+    def point(self, settings):
+        """Returns the point of a dict of parameter values."""
+        return tuple(values.index(settings[name]) for name, values in zip(self.names, self.values))
+
+    def contains(self, point):
+        return all(0 <= code < size for code, size in zip(point, self.shape))
+
+    def center(self):
+        return tuple(size // 2 for size in self.shape)
+
+    def points(self):
+        return itertools.product(*(range(size) for size in self.shape))
+
+
+class Objective:
+    """Wraps the evaluation function: the results are memoized and the evaluations are counted against a
+    budget.
+    """
+
+    def __init__(self, space, function, budget=None):
+        """
+        :param space: ParameterSpace
+        :param function: Callable, which gets the settings (dict of parameter name -> value) and returns
+            the score (greater is better).
+        :param budget: The maximum number of evaluations. None: no limit.
+        """
+        self.space = space
+        self.function = function
+        self.budget = budget
+        self.scores = collections.OrderedDict()
+        self.best_point = None
+        self.best_score = None
+
+    @property
+    def evaluations(self):
+        return len(self.scores)
+
+    def __call__(self, point):
+        point = tuple(point)
+        if point in self.scores:
+            return self.scores[point]
+        if self.budget is not None and len(self.scores) >= self.budget:
+            raise BudgetExhausted('The budget of {} evaluations is exhausted.'.format(self.budget))
+        score = self.function(self.space.settings(point))
+        logger.info('Evaluation %d: %s -> %s', len(self.scores) + 1, dict(self.space.settings(point)), score)
+        self.scores[point] = score
+        if self.best_score is None or score > self.best_score:
+            self.best_point, self.best_score = point, score
+        return score
+
+
+class CoordinateDescent:
+    """Optimizes one parameter at a time. From the current value it walks in both directions and stops a
+    direction after `patience` evaluations without improvement. The passes over the parameters are
+    repeated until a pass does not improve.
+    """
+
+    def __init__(self, patience=2, max_passes=3):
+        self.patience = patience
+        self.max_passes = max_passes
+
+    def search(self, objective, start):
+        current = tuple(start)
+        best = objective(current)
+        for _ in range(self.max_passes):
+            improved = False
+            for dim in range(len(current)):
+                for direction in (1, -1):
+                    misses = 0
+                    code = current[dim] + direction
+                    while 0 <= code < objective.space.shape[dim] and misses < self.patience:
+                        point = current[:dim] + (code,) + current[dim + 1:]
+                        score = objective(point)
+                        if score > best:
+                            best, current, improved, misses = score, point, True, 0
+                        else:
+                            misses += 1
+                        code += direction
+            if not improved:
+                break
+
+
+class PatternSearch:
+    """Hooke-Jeeves pattern search on the lattice of the codes. The neighbours in +-step distance are
+    probed along every parameter, the search moves to the best one (and tries to continue in the same
+    direction). If no neighbour is better, the step is halved, the search ends after step 1.
+    """
+
+    def __init__(self, step=None):
+        """:param step: The initial step. Default: a quarter of the largest dimension."""
+        self.step = step
+
+    def search(self, objective, start):
+        space = objective.space
+        step = self.step or max(1, max(space.shape) // 4)
+        current = tuple(start)
+        best = objective(current)
+        while step >= 1:
+            # Exploratory moves.
+            candidate, candidate_score = current, best
+            for dim in range(len(current)):
+                for direction in (step, -step):
+                    point = candidate[:dim] + (candidate[dim] + direction,) + candidate[dim + 1:]
+                    if space.contains(point):
+                        score = objective(point)
+                        if score > candidate_score:
+                            candidate, candidate_score = point, score
+                            break
+            if candidate_score <= best:
+                step //= 2
+                continue
+            # Pattern move: continue in the direction of the improvement while it improves.
+            while True:
+                point = tuple(2 * c - p for c, p in zip(candidate, current))
+                current, best = candidate, candidate_score
+                if not space.contains(point) or objective(point) <= best:
+                    break
+                candidate, candidate_score = point, objective(point)
+
+
+class SurrogateSearch:
+    """Fits a quadratic model (ridge regression in the normalized codes) to the evaluated points and
+    evaluates the unscanned point with the greatest predicted score. It stops when `patience`
+    consecutive evaluations do not improve the best score.
+    """
+
+    def __init__(self, initial=None, patience=4, ridge=1e-3, max_candidates=20000, seed=0):
+        """
+        :param initial: The number of the initial (space filling) points. Default: 2 * dimensions + 1
+        :param patience: Stop after this many evaluations without improvement.
+        :param ridge: The regularization of the model.
+        :param max_candidates: The number of the candidates (randomly sampled if the space is greater).
+        :param seed: The seed of the random initial points and candidates.
+        """
+        self.initial = initial
+        self.patience = patience
+        self.ridge = ridge
+        self.max_candidates = max_candidates
+        self.seed = seed
+
+    @staticmethod
+    def _features(points, shape):
+        x = np.asarray(points, dtype=np.float64) / np.maximum(np.asarray(shape) - 1, 1) * 2 - 1
+        columns = [np.ones(len(x))] + [x[:, i] for i in range(x.shape[1])]
+        columns += [x[:, i] * x[:, j] for i in range(x.shape[1]) for j in range(i, x.shape[1])]
+        return np.column_stack(columns)
+
+    def _predict(self, objective, candidates):
+        points = list(objective.scores)
+        scores = np.array([objective.scores[p] for p in points], dtype=np.float64)
+        features = self._features(points, objective.space.shape)
+        # Ridge regression: (F'F + rI) w = F'y
+        gram = features.T @ features + self.ridge * np.eye(features.shape[1])
+        weights = np.linalg.solve(gram, features.T @ scores)
+        return self._features(candidates, objective.space.shape) @ weights
+
+    def search(self, objective, start):
+        space = objective.space
+        rng = np.random.RandomState(self.seed)
+        if space.size <= self.max_candidates:
+            candidates = list(space.points())
+        else:
+            candidates = list(set(tuple(int(c) for c in row) for row in
+                                  (rng.rand(self.max_candidates, len(space.shape)) * space.shape)))
+
+        objective(start)
+        initial = self.initial or 2 * len(space.shape) + 1
+        for index in rng.permutation(len(candidates)):
+            if objective.evaluations >= min(initial, len(candidates)):
+                break
+            objective(candidates[index])
+
+        misses = 0
+        while misses < self.patience:
+            unscanned = [point for point in candidates if point not in objective.scores]
+            if not unscanned:
+                break
+            best = objective.best_score
+            predictions = self._predict(objective, unscanned)
+            objective(unscanned[int(np.argmax(predictions))])
+            misses = 0 if objective.best_score > best else misses + 1
+
+
+def optimize(space, function, strategy=None, budget=None, start=None):
+    """Searches the best settings.
+
+    :param space: ParameterSpace or dict of parameter name -> list of values.
+    :param function: Callable, which gets the settings (dict) and returns the score (eg. open area).
+    :param strategy: CoordinateDescent (default), PatternSearch or SurrogateSearch
+    :param budget: The maximum number of evaluations. None: no limit.
+    :param start: The settings (dict) to start from. Default: the center of the space.
+    :return: Objective (best_point, best_score, scores). Use space.settings(objective.best_point)
+    """
+    if not isinstance(space, ParameterSpace):
+        space = ParameterSpace(space)
+    if strategy is None:
+        strategy = CoordinateDescent()
+    objective = Objective(space, function, budget)
+    start = space.center() if start is None else space.point(start)
+    try:
+        strategy.search(objective, start)
+    except BudgetExhausted:
+        logger.info('The budget of %d evaluations is exhausted.', budget)
+    logger.info('Best score %s after %d evaluations: %s', objective.best_score, objective.evaluations,
+                dict(space.settings(objective.best_point)) if objective.best_point else None)
+    return objective
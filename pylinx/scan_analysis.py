@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Batch analysis of scan files.
+
+The scans are parsed and evaluated in parallel, by a process pool. The results are streamed back as
+they complete. Malformed files don't stop the batch: their results contain the error.
+
+Usage as a script:
+    python -m pylinx.scan_analysis runs/ --workers 8
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import logging
+import os
+
+from .gt_util import ScanStructure
+
+logger = logging.getLogger('pylinx')
+
+# path: the scan file, scan_name: the 'Scan Name' header field, metrics: dict returned by the scorer,
+# error: None or the description of the error if the file cannot be analyzed.
+ScanResult = collections.namedtuple('ScanResult', ['path', 'scan_name', 'metrics', 'error'])
+
+
+def default_scorer(scan):
+    """Computes the default metrics of a scan: the validity of the eye, its open area and whether it has
+    been stopped early (the stopped scans are not valid, see ScanStructure.is_stopped).
+
+    A scorer is a function, which gets a ScanStructure and returns a dict of metrics. (Scorers must be
+    module level functions, because they are sent to the worker processes.)
+    """
+    stopped = scan.is_stopped()
+    return {
+        'valid': not stopped and scan._test_eye(),
+        'open_area': scan.get_open_area(),
+        'stopped': stopped,
+    }
+
+
+def iter_scan_files(paths, pattern='*.csv'):
+    """Lists the scan files. Directories are searched (non-recursively) for files matching the pattern.
+
+    :param paths: A path or a list of paths of files or directories.
+    :param pattern: Glob pattern of the scan files in the directories.
+    :return: Generator of the file paths.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if os.path.isdir(path):
+            for filename in sorted(glob.glob(os.path.join(path, pattern))):
+                yield filename
+        else:
+            yield path
+
+
+def analyze_scan(path, scorer=default_scorer, cache=False):
+    """Parses and evaluates one scan file. Errors are not raised but returned in the result.
+
+    :param path: The scan file.
+    :param scorer: See `default_scorer`
+    :param cache: True: load the scan through its binary cache file, see `ScanStructure.load`
+    :return: ScanResult
+    """
+    try:
+        scan = ScanStructure.load(path, cache=cache)
+        return ScanResult(path, scan.get('Scan Name'), scorer(scan), None)
+    except Exception as ex:
+        return ScanResult(path, None, None, '{}: {}'.format(type(ex).__name__, ex))
+
+
+def analyze_scans(paths, workers=None, scorer=default_scorer, pattern='*.csv', cache=False):
+    """Analyzes many scan files in parallel. The results are yielded as they complete (not in the order
+    of the files).
+
+    :param paths: A path or a list of paths of scan files or directories of scan files.
+    :param workers: Number of the worker processes. None: the number of the CPUs. 1: analyze in this
+        process, without a process pool.
+    :param scorer: See `default_scorer`
+    :param pattern: Glob pattern of the scan files in the directories.
+    :param cache: True: load the scans through their binary cache files, see `ScanStructure.load`
+    :return: Generator of ScanResults.
+    """
+    files = list(iter_scan_files(paths, pattern))
+    if workers == 1:
+        for path in files:
+            yield analyze_scan(path, scorer, cache)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(analyze_scan, path, scorer, cache), path) for path in files)
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as ex:
+                # The worker process has died.
+                path = futures[future]
+                logger.error('Cannot analyze %s: %s', path, ex)
+                yield ScanResult(path, None, None, '{}: {}'.format(type(ex).__name__, ex))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyzes scan files in parallel.')
+    parser.add_argument('paths', nargs='+', help='Scan files or directories of scan files.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes.')
+    parser.add_argument('--pattern', default='*.csv', help='Pattern of the scan files in directories.')
+    parser.add_argument('--cache', action='store_true', help='Use (and create) binary cache files.')
+    parser.add_argument('--sort', action='store_true', help='Print the results ranked by the open area.')
+    args = parser.parse_args(argv)
+
+    results = analyze_scans(args.paths, workers=args.workers, pattern=args.pattern,
+                            cache=args.cache)
+    if args.sort:
+        results = sorted(results, key=lambda r: -1 if r.error else r.metrics['open_area'], reverse=True)
+    for result in results:
+        if result.error:
+            print('{}\tERROR\t{}'.format(result.path, result.error))
+        else:
+            print('{}\t{}\t{}\t{}'.format(result.path, result.scan_name, result.metrics['valid'],
+                                          result.metrics['open_area']))
+
+
+if __name__ == '__main__':
+    main()
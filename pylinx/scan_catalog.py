@@ -0,0 +1,207 @@
+"""Persistent catalog of scan files.
+
+The header fields, the parameters and the computed metrics of the scans are stored in an SQLite
+database, keyed by the path, the size and the modification time (in ns) of the files. Updating the catalog
+parses only the new and the changed files, and the queries don't touch the scan files at all.
+"""
+
+import functools
+import json
+import logging
+import os
+import sqlite3
+
+from .scan_analysis import analyze_scans
+from .scan_analysis import iter_scan_files
+from .util import PylinxException
+from .util import tcl_split
+
+logger = logging.getLogger('pylinx')
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS scans (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    scan_name TEXT,
+    header TEXT,
+    valid INTEGER,
+    open_area REAL,
+    improved_area REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    path TEXT NOT NULL REFERENCES scans(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (path, name)
+);
+CREATE INDEX IF NOT EXISTS params_name_value ON params(name, value);
+'''
+
+# The columns, which can be used to order the query results.
+_order_columns = ('open_area', 'improved_area', 'scan_name', 'path', 'mtime_ns')
+
+
+def link_settings_params(scan):
+    """Returns the parameters of a scan from its 'Link Settings' header field. Vivado writes the
+    settings as a TCL list of name-value pairs, e.g.: RXTERM {850 mV}
+    """
+    settings = scan.get('Link Settings', '')
+    if not isinstance(settings, str):
+        return {}
+    elements = tcl_split(settings)
+    return dict(zip(elements[0::2], elements[1::2]))
+
+
+def catalog_scorer(scan, param_parser=link_settings_params):
+    """The scorer of the catalog (see scan_analysis.default_scorer). Besides the metrics it returns the
+    header and the parameters of the scan. The scans stopped early are not valid and they have no area.
+    """
+    if scan.is_stopped():
+        return {'valid': False, 'open_area': 0.0, 'improved_area': None, 'header': scan.header,
+                'params': param_parser(scan)}
+    valid = scan._test_eye()
+    improved_area = scan._get_area()
+    return {
+        'valid': valid,
+        'open_area': scan.get_open_area(),
+        'improved_area': None if improved_area is False else improved_area,
+        'header': scan.header,
+        'params': param_parser(scan),
+    }
+
+
+class ScanCatalog:
+    """SQLite backed catalog of scan files.
+    """
+
+    def __init__(self, db_path):
+        """Opens (or creates) the catalog.
+
+        :param db_path: Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA foreign_keys = ON')
+        columns = [row['name'] for row in self._db.execute('PRAGMA table_info(scans)')]
+        if columns and 'mtime_ns' not in columns:
+            # An old catalog with float modification times: it is rebuilt at the next update.
+            logger.info('Rebuilding the old scan catalog: %s', db_path)
+            self._db.executescript('DROP TABLE params; DROP TABLE scans;')
+        self._db.executescript(_schema)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM scans').fetchone()[0]
+
+    def update(self, paths, workers=None, pattern='*.csv', param_parser=link_settings_params):
+        """Adds the new and the changed scan files to the catalog. The unchanged files (same size and
+        modification time) are not parsed again.
+
+        :param paths: A path or a list of paths of scan files or directories of scan files.
+        :param workers: Number of the worker processes. See `analyze_scans`
+        :param pattern: Glob pattern of the scan files in the directories.
+        :param param_parser: Function, which gets a ScanStructure and returns its parameters in a dict.
+            It must be a module level function (it is sent to the worker processes).
+        :return: The number of the parsed files.
+        """
+        known = dict((row['path'], (row['size'], row['mtime_ns']))
+                     for row in self._db.execute('SELECT path, size, mtime_ns FROM scans'))
+        stats = {}
+        for path in iter_scan_files(paths, pattern):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                stats[path] = stat
+        if not stats:
+            return 0
+
+        logger.info('Updating scan catalog: %d new or changed files', len(stats))
+        scorer = functools.partial(catalog_scorer, param_parser=param_parser)
+        with self._db:
+            for result in analyze_scans(list(stats), workers=workers, scorer=scorer):
+                self._store(result, stats[result.path])
+        return len(stats)
+
+    def _store(self, result, stat):
+        self._db.execute('DELETE FROM scans WHERE path = ?', (result.path,))
+        if result.error is not None:
+            logger.warning('Cannot analyze %s: %s', result.path, result.error)
+            self._db.execute('INSERT INTO scans (path, size, mtime_ns, error) VALUES (?, ?, ?, ?)',
+                             (result.path, stat.st_size, stat.st_mtime_ns, result.error))
+            return
+        metrics = result.metrics
+        self._db.execute(
+            'INSERT INTO scans (path, size, mtime_ns, scan_name, header, valid, open_area, improved_area) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (result.path, stat.st_size, stat.st_mtime_ns, result.scan_name, json.dumps(metrics['header']),
+             int(metrics['valid']), metrics['open_area'], metrics['improved_area']))
+        self._db.executemany('INSERT INTO params (path, name, value) VALUES (?, ?, ?)',
+                             [(result.path, name, value) for name, value in metrics['params'].items()])
+
+    def prune(self):
+        """Removes the files from the catalog, which do not exist anymore.
+
+        :return: The number of the removed files.
+        """
+        missing = [row['path'] for row in self._db.execute('SELECT path FROM scans')
+                   if not os.path.exists(row['path'])]
+        with self._db:
+            self._db.executemany('DELETE FROM scans WHERE path = ?', [(path,) for path in missing])
+        return len(missing)
+
+    def _row_to_dict(self, row):
+        entry = dict(row)
+        entry['header'] = json.loads(entry['header']) if entry['header'] is not None else None
+        if entry['valid'] is not None:
+            entry['valid'] = bool(entry['valid'])
+        entry['params'] = dict((p['name'], p['value']) for p in self._db.execute(
+            'SELECT name, value FROM params WHERE path = ?', (entry['path'],)))
+        return entry
+
+    def get(self, path):
+        """Returns the catalog entry of a scan file or None if it is not in the catalog.
+        """
+        row = self._db.execute('SELECT * FROM scans WHERE path = ?', (os.path.abspath(path),)).fetchone()
+        return None if row is None else self._row_to_dict(row)
+
+    def top(self, n=20, order_by='open_area', where=None, valid_only=False):
+        """Returns the best scans.
+
+        :param n: The maximum number of the results. None: all.
+        :param order_by: The column to order by (descending). One of: open_area, improved_area,
+            scan_name, path, mtime_ns
+        :param where: Dict of parameter name -> value. Only the scans with these parameters are returned.
+        :param valid_only: True: only the valid eyes are returned.
+        :return: List of dicts (the catalog entries).
+        """
+        if order_by not in _order_columns:
+            raise PylinxException('Cannot order by: {}'.format(order_by))
+        conditions = ['error IS NULL']
+        args = []
+        if valid_only:
+            conditions.append('valid = 1')
+        for name, value in (where or {}).items():
+            conditions.append('EXISTS (SELECT 1 FROM params p WHERE p.path = scans.path AND p.name = ? AND p.value = ?)')
+            args.extend([name, str(value)])
+        query = 'SELECT * FROM scans WHERE {} ORDER BY {} DESC'.format(' AND '.join(conditions), order_by)
+        if n is not None:
+            query += ' LIMIT ?'
+            args.append(n)
+        return [self._row_to_dict(row) for row in self._db.execute(query, args)]
+
+    def errors(self):
+        """Returns the (path, error) pairs of the files, which cannot be analyzed.
+        """
+        return [(row['path'], row['error']) for row in
+                self._db.execute('SELECT path, error FROM scans WHERE error IS NOT NULL ORDER BY path')]
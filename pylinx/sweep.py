@@ -0,0 +1,272 @@
+"""Parallel parameter sweeps over many links.
+
+A link is a TX/RX pair of VivadoHWServer sessions (with chosen SIOs), typically one per board. The
+SweepScheduler distributes the parameter points across the links: every link has a worker thread, which
+takes the next point, sets the TX parameters, runs the scan on the RX side and evaluates it. A failed
+point is retried (preferably on another link) and a link which keeps failing is retired. The results of
+all the links are merged into one list, ranked by the open area.
+"""
+
+import collections
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+
+from .eye_metrics import normalized_metrics
+from .util import PylinxException
+
+logger = logging.getLogger('pylinx')
+
+# tx, rx: VivadoHWServer sessions, name: identifies the link in the results and in the messages.
+SweepLink = collections.namedtuple('SweepLink', ['name', 'tx', 'rx'])
+
+# The resolution of the scans: scan_type: '2d_full_eye' or '1d_bathtub', hincr/vincr: the increments,
+# dwell_ber: the DWELL_BER of the scan (None: the default of Vivado).
+ScanFidelity = collections.namedtuple('ScanFidelity', ['name', 'scan_type', 'hincr', 'vincr', 'dwell_ber'])
+
+# Cheap screening scan: a bathtub through the center of the eye with a short dwell time.
+COARSE = ScanFidelity('coarse', '1d_bathtub', 8, 16, 1e-5)
+# Full resolution 2D eye (the settings of cleye).
+FINE = ScanFidelity('fine', '2d_full_eye', 4, 4, None)
+
+# index: the position of the point in the sweep, settings: dict of the TX parameters, link: the name of
+# the link, which has measured the point, metrics: dict returned by the measure function (None on error),
+# error: None or the description of the last error, attempts: the number of the measurements.
+SweepResult = collections.namedtuple('SweepResult', ['index', 'settings', 'link', 'scan_file', 'metrics',
+                                                     'error', 'attempts'])
+
+
+def grid_points(space):
+    """Returns the points of the full grid of a parameter space.
+
+    :param space: Dict of parameter name -> list of values.
+    :return: List of dicts (parameter name -> value).
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def scan_filename(index, settings, suffix=''):
+    """The default name of the scan file of a point: the index, the settings without special characters
+    and the suffix.
+    """
+    name = '_'.join('{}{}'.format(name, value) for name, value in settings.items())
+    return '{:04d}_{}{}.csv'.format(index, re.sub('\\W', '_', name), suffix)
+
+
+def apply_settings(vivado, settings):
+    """Sets and commits the TX parameters of the sio of a session, then reads them back (in one round
+    trip).
+
+    :param vivado: VivadoHWServer with a chosen sio.
+    :param settings: Dict of parameter name -> value.
+    :raise PylinxException: If a command fails or a read back value differs from the set one.
+    """
+    sio_gt = '[get_hw_sio_gts {}]'.format(vivado.sio)
+    names = list(settings)
+    outputs = vivado.do_batch(['set_property {} {} {}'.format(name, settings[name], sio_gt) for name in names] +
+                              ['commit_hw_sio ' + sio_gt] +
+                              ['get_property {} {}'.format(name, sio_gt) for name in names],
+                              errmsgs=['ERROR: '])
+    for name, check_value in zip(names, outputs[len(names) + 1:]):
+        # Readback does not contains brackets {}
+        if not check_value or check_value not in str(settings[name]):
+            raise PylinxException('Cannot set {} to {} (read back: {})'.format(name, settings[name], check_value))
+
+
+def measure_point(link, settings, scan_file, fidelity=FINE, ber=1e-5, **scan_kwargs):
+    """Measures a point on a link: sets and commits the TX parameters (see apply_settings), then runs a
+    scan on the RX side.
+
+    :param link: SweepLink
+    :param settings: Dict of TX parameter name -> value.
+    :param scan_file: The file of the scan.
+    :param fidelity: The ScanFidelity of the scan.
+    :param ber: The BER limit of the normalized metrics. See eye_metrics.normalized_metrics
+    :param scan_kwargs: Further arguments of VivadoHWServer.run_scan
+    :return: Dict of the metrics: valid, open_area, pruned, fidelity and the normalized metrics (the
+        'score' is comparable between the fidelities).
+    """
+    apply_settings(link.tx, settings)
+    scan = link.rx.run_scan(scan_file, fidelity.hincr, fidelity.vincr, fidelity.scan_type,
+                            dwell_ber=fidelity.dwell_ber, **scan_kwargs)
+    if link.rx.last_scan_stopped:
+        return {'valid': False, 'open_area': 0.0, 'pruned': True, 'fidelity': fidelity.name, 'score': 0.0}
+    metrics = normalized_metrics(scan, ber)
+    metrics.update({'open_area': scan.get_open_area(), 'pruned': False, 'fidelity': fidelity.name})
+    return metrics
+
+
+class _SweepRun:
+    """The state of one SweepScheduler.run: the points to measure, the results and the active links. All
+    the fields are guarded by the condition, which is notified at every change.
+    """
+
+    def __init__(self, points, links, measure_kwargs):
+        self.cond = threading.Condition()
+        # index, settings, attempts, the names of the links failed on this point, the last error
+        self.todo = collections.deque((index, dict(settings), 0, set(), None)
+                                      for index, settings in enumerate(points))
+        self.results = []
+        # The number of the points without a result.
+        self.remaining = len(self.todo)
+        self.active = set(link.name for link in links)
+        self.measure_kwargs = measure_kwargs
+        # The scans of different fidelities are written into different files.
+        self.suffix = '_' + measure_kwargs['fidelity'].name if 'fidelity' in measure_kwargs else ''
+
+
+class SweepScheduler:
+    """Runs the points of a sweep in parallel on many links.
+    """
+
+    def __init__(self, links, measure=measure_point, results_dir='runs', retries=2, max_link_failures=3,
+                 on_result=None):
+        """
+        :param links: List of SweepLinks.
+        :param measure: Callable(link, settings, scan_file), which returns a dict of metrics containing
+            'open_area'. It is called from the worker thread of the link. See measure_point
+        :param results_dir: The directory of the scan files.
+        :param retries: A failed point is measured again at most this many times.
+        :param max_link_failures: A link is retired after this many consecutive failures.
+        :param on_result: Callable, which gets every SweepResult as soon as it is ready (from the worker
+            threads).
+        """
+        if not links:
+            raise PylinxException('No links to sweep on.')
+        self.links = list(links)
+        self.measure = measure
+        self.results_dir = results_dir
+        self.retries = retries
+        self.max_link_failures = max_link_failures
+        self.on_result = on_result
+
+    def run(self, points, rank_by='open_area', **measure_kwargs):
+        """Measures all the points.
+
+        :param points: List of dicts (parameter name -> value). See grid_points
+        :param rank_by: The metric to rank the results by.
+        :param measure_kwargs: Further arguments of the measure function (eg. fidelity).
+        :return: List of SweepResults ranked by the metric (the failed points are at the end).
+        """
+        if not os.path.exists(self.results_dir):
+            os.makedirs(self.results_dir)
+        # The state is local to the run, so the runs of a scheduler don't interfere.
+        run = _SweepRun(points, self.links, measure_kwargs)
+
+        start = time.monotonic()
+        workers = [threading.Thread(target=self._work, args=(run, link), name='sweep-' + link.name, daemon=True)
+                   for link in self.links]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # All the links have been retired.
+        for index, settings, attempts, _, error in run.todo:
+            self._finish(run, SweepResult(index, settings, None, None, None, error or 'No active link.', attempts))
+
+        logger.info('Sweep of %d points on %d links finished in %.1f s', len(points), len(self.links),
+                    time.monotonic() - start)
+        return SweepScheduler.rank(run.results, rank_by)
+
+    @staticmethod
+    def rank(results, rank_by='open_area'):
+        """Sorts the results by a metric (descending), the failed points are at the end.
+        """
+        return sorted(results, key=lambda r: (r.metrics is None, -(r.metrics or {}).get(rank_by, 0.0), r.index))
+
+    def run_multi_fidelity(self, points, top_k=3, coarse=COARSE, fine=FINE, **measure_kwargs):
+        """Screens all the points with cheap scans, then measures the top_k of them with full resolution
+        scans. See screen_and_confirm
+
+        :return: List of SweepResults: the fine results ranked by the score, then the remaining coarse
+            results ranked by the score.
+        """
+        screened = self.run(points, rank_by='score', fidelity=coarse, **measure_kwargs)
+        top = [r for r in screened if r.metrics is not None][:top_k]
+        confirmed = self.run([r.settings for r in top], rank_by='score', fidelity=fine, **measure_kwargs)
+        # Keep the indexes of the screening.
+        confirmed = [r._replace(index=top[r.index].index) for r in confirmed]
+        return confirmed + [r for r in screened if r not in top]
+
+    def _finish(self, run, result):
+        with run.cond:
+            run.results.append(result)
+            run.remaining -= 1
+            run.cond.notify_all()
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _take(self, run, link):
+        """Takes the next point for a link. The points failed on this link are left to the other links
+        (while there are other active links). It waits while all the points are measured by other links
+        (they can fail). Returns None if all the points have been finished.
+        """
+        with run.cond:
+            while run.remaining > 0:
+                for position, item in enumerate(run.todo):
+                    others = run.active - item[3] - {link.name}
+                    if link.name not in item[3] or not others:
+                        del run.todo[position]
+                        return item
+                run.cond.wait()
+        return None
+
+    def _retry(self, run, item):
+        with run.cond:
+            run.todo.append(item)
+            run.cond.notify_all()
+
+    def _retire(self, run, link):
+        with run.cond:
+            run.active.discard(link.name)
+            # The points failed on the other links can be taken by the remaining ones.
+            run.cond.notify_all()
+
+    def _work(self, run, link):
+        failures = 0
+        while True:
+            item = self._take(run, link)
+            if item is None:
+                return
+            index, settings, attempts, failed_links, _ = item
+            scan_file = os.path.join(self.results_dir, scan_filename(index, settings, run.suffix))
+            try:
+                metrics = self.measure(link, settings, scan_file, **run.measure_kwargs)
+            except Exception as ex:
+                failures += 1
+                error = '{}: {}'.format(type(ex).__name__, ex)
+                logger.warning('Point %d failed on link %s: %s', index, link.name, error)
+                if attempts < self.retries:
+                    self._retry(run, (index, settings, attempts + 1, failed_links | {link.name}, error))
+                else:
+                    self._finish(run, SweepResult(index, settings, link.name, scan_file, None, error,
+                                                  attempts + 1))
+                if failures >= self.max_link_failures:
+                    # Nobody takes the remaining points after the last link, run() collects them.
+                    logger.error('Link %s is retired after %d failures', link.name, failures)
+                    self._retire(run, link)
+                    return
+                continue
+            failures = 0
+            self._finish(run, SweepResult(index, settings, link.name, scan_file, metrics, None, attempts + 1))
+
+
+def screen_and_confirm(points, measure, top_k=3, coarse=COARSE, fine=FINE):
+    """Multi-fidelity search on one link: all the points are measured with the coarse fidelity, then the
+    top_k of them (ranked by the normalized score) are measured again with the fine fidelity.
+
+    :param points: List of dicts (parameter name -> value).
+    :param measure: Callable(settings, fidelity), which returns a dict of metrics containing 'score'.
+    :return: List of (settings, coarse metrics, fine metrics) tuples, ranked by the fine score, then by
+        the coarse score. The fine metrics are None for the points not confirmed.
+    """
+    screened = [(settings, measure(settings, coarse)) for settings in points]
+    screened.sort(key=lambda item: -item[1]['score'])
+    confirmed = [(settings, metrics, measure(settings, fine)) for settings, metrics in screened[:top_k]]
+    confirmed.sort(key=lambda item: -item[2]['score'])
+    return confirmed + [(settings, metrics, None) for settings, metrics in screened[top_k:]]
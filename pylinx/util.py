@@ -41,3 +41,95 @@ class PylinxException(Exception):
     """The exception for this project.
     """
     pass
+
+
+def tcl_quote(value):
+    """Quotes a string to be a single word (or list element) in a TCL command.
+
+    The string is enclosed into braces if it is possible, otherwise the special characters are
+    escaped by backslashes.
+    """
+    value = str(value)
+    if value == '':
+        return '{}'
+    # Braces are usable if the string doesn't contain backslashes and its braces are balanced.
+    depth = 0
+    for c in value:
+        if c == '\\':
+            break
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth < 0:
+                break
+    else:
+        if depth == 0:
+            return '{' + value + '}'
+    escaped = []
+    for c in value:
+        if c in '\\{}[]$";':
+            escaped.append('\\' + c)
+        elif c == '\n':
+            escaped.append('\\n')
+        elif c == ' ':
+            escaped.append('\\ ')
+        elif c == '\t':
+            escaped.append('\\t')
+        else:
+            escaped.append(c)
+    return ''.join(escaped)
+
+
+def tcl_split(text):
+    """Splits a TCL list into its elements. (Only the braces, the double quotes and the escaped
+    characters are handled, substitutions are not.)
+    """
+    elements = []
+    i = 0
+    n = len(text)
+    while True:
+        while i < n and text[i].isspace():
+            i += 1
+        if i >= n:
+            return elements
+        if text[i] == '{':
+            depth = 1
+            start = i + 1
+            i += 1
+            while i < n and depth > 0:
+                if text[i] == '\\':
+                    i += 1
+                elif text[i] == '{':
+                    depth += 1
+                elif text[i] == '}':
+                    depth -= 1
+                i += 1
+            if depth > 0:
+                raise PylinxException('Unmatched open brace in list: ' + text)
+            elements.append(text[start:i - 1])
+        else:
+            quoted = text[i] == '"'
+            if quoted:
+                i += 1
+            element = []
+            while i < n and (text[i] != '"' if quoted else not text[i].isspace()):
+                if text[i] == '\\' and i + 1 < n:
+                    i += 1
+                element.append(text[i])
+                i += 1
+            if quoted:
+                if i >= n:
+                    raise PylinxException('Unmatched open quote in list: ' + text)
+                i += 1
+            elements.append(''.join(element))
+
+
+def format_ber(ber):
+    """Formats a BER value the way Vivado spells it (eg. in DWELL_BER): in exponential notation without
+    the zero padding of the exponent, eg. 1e-5 instead of 1e-05. Strings are returned unchanged.
+    """
+    if isinstance(ber, str):
+        return ber
+    mantissa, exponent = '{:.14e}'.format(ber).split('e')
+    return '{}e{}'.format(mantissa.rstrip('0').rstrip('.'), int(exponent))
@@ -0,0 +1,175 @@
+# This is a dummy TCL script, which emulates the IBERT (hw_sio) commands of the Vivado.
+# The scans take ::scan_ms milliseconds, they report their progress by time and they write the rows of a
+# resource scan file proportionally to their progress. The links matching *bad* cannot be scanned.
+
+set ::here [file dirname [file normalize [info script]]]
+set ::scan_source [file join $::here resources valid_eye_sweep_01.csv]
+set ::scan_ms 300
+set ::links {link_0 link_1 link_2 link_3}
+set ::scan_count 0
+set ::scan_runs 0
+array set ::props {}
+
+proc open_hw {} {}
+proc connect_hw_server {args} {}
+
+proc get_hw_sio_links {{pattern *}} {
+    return [lsearch -all -inline -glob $::links $pattern]
+}
+
+proc get_hw_sio_scans {scans} {
+    return $scans
+}
+
+proc create_hw_sio_scan {args} {
+    set link [lindex $args end]
+    if { [string match *bad* $link] } {
+        error "ERROR: \[Labtoolstcl 44-1\] The link is down: $link"
+    }
+    set scan "SCAN_[incr ::scan_count]"
+    set ::props($scan,LINK) $link
+    set ::props($scan,START) ""
+    set ::props($scan,STOPPED) ""
+    return $scan
+}
+
+proc set_property {propName value objects} {
+    foreach obj $objects {
+        set ::props($obj,$propName) $value
+    }
+}
+
+proc run_hw_sio_scan {scans} {
+    incr ::scan_runs
+    foreach scan $scans {
+        set ::props($scan,START) [clock milliseconds]
+    }
+}
+
+proc stop_hw_sio_scan {scans} {
+    foreach scan $scans {
+        set ::props($scan,STOPPED) [clock milliseconds]
+    }
+}
+
+# The progress of a scan in 0..1
+proc scan_fraction {scan} {
+    set end [clock milliseconds]
+    if { $::props($scan,STOPPED) != "" } {
+        set end $::props($scan,STOPPED)
+    }
+    return [expr {min(1.0, double($end - $::props($scan,START)) / $::scan_ms)}]
+}
+
+proc commit_hw_sio {args} {}
+
+proc get_property {propName obj} {
+    switch $propName {
+        STATUS {
+            if { [scan_fraction $obj] >= 1.0 } { return "Done" }
+            if { $::props($obj,STOPPED) != "" } { return "Stopped" }
+            return "In Progress"
+        }
+        PROGRESS { return "[expr {int([scan_fraction $obj] * 100)}]%" }
+        default { return $::props($obj,$propName) }
+    }
+}
+
+proc wait_on_hw_sio_scan {args} {
+    set scan [lindex $args end]
+    while { [scan_fraction $scan] < 1.0 && $::props($scan,STOPPED) == "" } {
+        after 5
+    }
+}
+
+proc write_hw_sio_scan {args} {
+    set scanFile [lindex $args 0]
+    set scan [lindex $args 1]
+    set f [open $::scan_source r]
+    set lines [split [string trimright [read $f] "\n"] "\n"]
+    close $f
+    set start [lsearch -glob $lines {Scan Start*}]
+    set end [lsearch -glob $lines {Scan End*}]
+    # The header, the 'Scan Start' and the axis line, then the measured rows.
+    set rows [expr {int(($end - $start - 2) * [scan_fraction $scan])}]
+    set f [open $scanFile w]
+    puts $f [join [lrange $lines 0 [expr {$start + 1 + $rows}]] "\n"]
+    puts $f [lindex $lines $end]
+    close $f
+}
+
+# Targets (blasters) and devices. Opening a target and refreshing a device take ::open_ms milliseconds.
+set ::open_ms 20
+set ::targets [dict create target_0 {dev_0 dev_1} target_1 {dev_2}]
+set ::open_target ""
+set ::device ""
+set ::opens 0
+set ::refreshes 0
+# The refreshed devices of the open target have transceivers, except the ones in ::no_gts (eg. not
+# programmed).
+set ::refreshed {}
+set ::no_gts {}
+
+proc get_hw_target {} {
+    return [dict keys $::targets]
+}
+
+proc open_hw_target {target args} {
+    after $::open_ms
+    incr ::opens
+    set ::open_target $target
+}
+
+proc close_hw_target {args} {
+    set ::open_target ""
+    set ::device ""
+    set ::refreshed {}
+}
+
+proc current_hw_target {} {
+    if { $::open_target == "" } {
+        error "ERROR: \[Labtoolstcl 44-158\] No current hw_target."
+    }
+    return $::open_target
+}
+
+proc get_hw_devices {args} {
+    set patterns [lsearch -all -inline -not -exact $args -quiet]
+    if { [llength $patterns] == 0 } {
+        return [dict get $::targets $::open_target]
+    }
+    return [lsearch -all -inline -glob [dict get $::targets $::open_target] [lindex $patterns 0]]
+}
+
+proc current_hw_device {args} {
+    if { [llength $args] > 0 && [lindex $args 0] != "-quiet" } {
+        set ::device [lindex $args 0]
+    }
+    if { $::device == "" } {
+        error "ERROR: \[Labtoolstcl 44-159\] No current hw_device."
+    }
+    return $::device
+}
+
+proc refresh_hw_device {args} {
+    after $::open_ms
+    incr ::refreshes
+    if { [lsearch -exact $::refreshed $::device] < 0 } {
+        lappend ::refreshed $::device
+    }
+}
+
+proc get_hw_sio_gts {args} {
+    set devices $::refreshed
+    set i [lsearch -exact $args -of_objects]
+    if { $i >= 0 } {
+        set devices [lindex $args [expr {$i + 1}]]
+    }
+    set gts {}
+    foreach dev $devices {
+        if { [lsearch -exact $::refreshed $dev] >= 0 && [lsearch -exact $::no_gts $dev] < 0 } {
+            lappend gts "$::open_target/$dev/MGT_X0Y0"
+        }
+    }
+    return $gts
+}
@@ -1,16 +1,18 @@
 # This is a dummy TCL script, which emulates the behaviour of the Vivado.
-
-global objects
+# The objects are global arrays, the properties are the elements of the arrays.
 
 proc get_property {propName objectName} {
-    eval "global $objectName"
-    set varname "${objectName}($propName)"
-    set ret [subst $$varname]
-    puts $ret
+    upvar #0 $objectName obj
+    return $obj($propName)
 }
 
 proc set_property {propName value objectName} {
-    eval "global $objectName"
-    eval "set ${objectName}($propName) $value"
+    upvar #0 $objectName obj
+    set obj($propName) $value
+    return
 }
 
+proc list_property {objectName} {
+    upvar #0 $objectName obj
+    return [lsort [array names obj]]
+}
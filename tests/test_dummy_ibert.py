@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import os
+
+import pytest
+
+# import DUT
+import pylinx
+from pylinx import cleye
+from pylinx.journal import SweepJournal
+from pylinx.scan_analysis import analyze_scan
+from pylinx.sweep import apply_settings
+
+# The directory of this script file.
+__here__ = os.path.dirname(os.path.realpath(__file__))
+hw_server_tcl = os.path.join(__here__, '..', 'pylinx', 'hw_server.tcl')
+
+
+@pytest.fixture
+def vivado():
+    vivado = pylinx.VivadoHWServer('tclsh', args=[], prompt='% ', full_init=False)
+    vivado.do('source ' + os.path.join(__here__, 'dummy_ibert.tcl').replace(os.sep, '/'))
+    vivado.do('source ' + hw_server_tcl.replace(os.sep, '/'))
+    yield vivado
+    vivado.exit()
+
+
+def test_run_scan(vivado, tmp_path):
+    scan_file = str(tmp_path / 'scan.csv')
+    scan = vivado.run_scan(scan_file, 4, 4)
+    assert not vivado.last_scan_stopped
+    assert len(scan['scanData']['y']) == 31
+
+    # The scans have no timeout by default: a scan takes 0.3 s.
+    vivado.timeout = 0.1
+    assert len(vivado.run_scan(scan_file, 4, 4)['scanData']['y']) == 31
+
+    vivado.run_scan(scan_file, 8, 16, '1d_bathtub', dwell_ber=1e-7)
+    assert vivado.do('set ::props(SCAN_$::scan_count,DWELL_BER)') == '1e-7'
+
+
+def test_run_scan_progress(vivado, tmp_path):
+    scan_file = str(tmp_path / 'scan.csv')
+    progress = []
+    scan = vivado.run_scan(scan_file, on_progress=lambda reader: progress.append(reader.rows_seen),
+                           progress_interval=0.05)
+    assert not vivado.last_scan_stopped
+    assert progress[-1] == 31
+    assert len(progress) > 1
+    assert len(scan['scanData']['y']) == 31
+    assert not scan.is_stopped()
+
+    # Stop early.
+    scan = vivado.run_scan(scan_file, on_progress=lambda reader: reader.rows_seen > 5, progress_interval=0.05)
+    assert vivado.last_scan_stopped
+    assert 5 < len(scan['scanData']['y']) < 31
+    assert not os.path.exists(scan_file + '.stop')
+
+    # The stopped scans are marked in the file, the readers don't take them for complete eyes.
+    assert scan.is_stopped()
+    assert scan.get_open_area() == 0.0
+    assert pylinx.ScanStructure(scan_file).is_stopped()
+    assert analyze_scan(scan_file).metrics == {'valid': False, 'open_area': 0.0, 'stopped': True}
+    record = {'scan_file': scan_file, 'csv_size': os.path.getsize(scan_file), 'metrics': {'pruned': True}}
+    assert SweepJournal.verify(record)
+    record['metrics']['pruned'] = False
+    assert not SweepJournal.verify(record)
+
+
+def test_run_scan_aborted(vivado, tmp_path):
+    # The scans are stopped by somebody else right after their start.
+    vivado.do('rename run_hw_sio_scan run_hw_sio_scan_orig')
+    vivado.do('proc run_hw_sio_scan {scans} { run_hw_sio_scan_orig $scans; stop_hw_sio_scan $scans }')
+    scan_file = str(tmp_path / 'scan.csv')
+    with pytest.raises(pylinx.PylinxException, match='Stopped'):
+        vivado.run_scan(scan_file, on_progress=lambda reader: False, progress_interval=0.05, timeout=10)
+    with pytest.raises(pylinx.PylinxException, match='Stopped'):
+        vivado.run_scan(scan_file, timeout=10)
+
+
+def test_run_scans(vivado, tmp_path):
+    results = vivado.run_scans(str(tmp_path / 'quad'))
+    assert list(results) == ['link_0', 'link_1', 'link_2', 'link_3']
+    for link, scan in results.items():
+        assert isinstance(scan, pylinx.ScanStructure)
+        assert len(scan['scanData']['y']) == 31
+    # The scans run concurrently: they are started together.
+    assert vivado.do('set ::scan_runs') == '1'
+
+    vivado.do('lappend ::links link_bad')
+    results = vivado.run_scans(str(tmp_path / 'quad'), links=['link_1', 'link_bad'], dwell_ber=1e-5)
+    assert isinstance(results['link_1'], pylinx.ScanStructure)
+    assert isinstance(results['link_bad'], pylinx.PylinxException)
+    assert 'The link is down' in str(results['link_bad'])
+    # Spelled the way Vivado does.
+    assert vivado.do('set ::props(SCAN_5,DWELL_BER)') == '1e-5'
+
+    # A failure outside of the scans of the links does not return the results of the previous call.
+    vivado.do('proc run_hw_sio_scan {scans} { error "ERROR: \\[Labtoolstcl 44-2\\] Cannot run the scans" }')
+    with pytest.raises(pylinx.PylinxException, match='Cannot run the scans'):
+        vivado.run_scans(str(tmp_path / 'quad'), links=['link_1', 'link_2'])
+    vivado.do('proc run_hw_sio_scan {scans} { error "Something else" }')
+    with pytest.raises(pylinx.PylinxException, match='Something else'):
+        vivado.run_scans(str(tmp_path / 'quad'), links=['link_1', 'link_2'])
+
+
+def test_fetch_devices_cache(vivado):
+    devices = vivado.fetch_devices()
+    assert devices == ['target_0 dev_0', 'target_0 dev_1', 'target_1 dev_2']
+    assert vivado.last_fetch_timing['opened'] == 2
+    assert vivado.last_fetch_timing['open_targets'] >= 2 * 20
+    assert vivado.last_fetch_timing['total'] >= vivado.last_fetch_timing['open_targets']
+
+    # The known targets are not opened again.
+    assert vivado.fetch_devices() == devices
+    assert vivado.last_fetch_timing['opened'] == 0
+    assert vivado.last_fetch_timing['cached'] == 2
+
+    # Incremental refresh: only the given and the new targets.
+    vivado.do('dict set ::targets target_0 {dev_0}')
+    vivado.do('dict set ::targets target_2 {dev_3}')
+    devices = vivado.refresh_devices(['target_0'])
+    assert devices == ['target_0 dev_0', 'target_1 dev_2', 'target_2 dev_3']
+    assert vivado.last_fetch_timing['opened'] == 2
+    assert vivado.fetch_devices(refresh=True) == devices
+    assert vivado.last_fetch_timing['opened'] == 3
+
+
+def test_set_device_skip(vivado):
+    vivado.set_device('target_1 dev_2')
+    assert vivado.last_set_device_timing['skipped'] == 0
+    assert vivado.do('set ::opens') == '1'
+
+    # Already open and programmed.
+    vivado.set_device('target_1 dev_2')
+    assert vivado.last_set_device_timing['skipped'] == 1
+    assert vivado.do('set ::opens') == '1'
+    assert vivado.do('set ::refreshes') == '1'
+
+    # The same target is not reopened for another device.
+    vivado.do('dict set ::targets target_1 {dev_2 dev_4}')
+    vivado.set_device('target_1 dev_4')
+    assert vivado.do('set ::opens') == '1'
+    assert vivado.do('set ::refreshes') == '2'
+
+    vivado.set_device('target_1 dev_4', force=True)
+    assert vivado.last_set_device_timing['skipped'] == 0
+    assert vivado.do('set ::opens') == '2'
+
+    # The current device has no transceivers (eg. it is not programmed), but another one on the target has.
+    vivado.set_device('target_0 dev_0')
+    vivado.do('lappend ::no_gts dev_1')
+    vivado.set_device('target_0 dev_1')
+    assert vivado.do('llength [get_hw_sio_gts]') == '1'
+    vivado.set_device('target_0 dev_1')
+    assert vivado.last_set_device_timing['skipped'] == 0
+    vivado.set_device('target_0 dev_0')
+    vivado.set_device('target_0 dev_0')
+    assert vivado.last_set_device_timing['skipped'] == 1
+
+
+def test_set_device_quoted(vivado):
+    # The target names can contain spaces and brackets.
+    vivado.do('dict set ::targets {localhost:3121/xilinx_tcf/Digilent [A] 1} {dev_5}')
+    vivado.set_device('{localhost:3121/xilinx_tcf/Digilent [A] 1} dev_5')
+    assert vivado.do('current_hw_target') == 'localhost:3121/xilinx_tcf/Digilent [A] 1'
+    assert vivado.do('current_hw_device') == 'dev_5'
+    with pytest.raises(pylinx.PylinxException, match='Invalid device'):
+        vivado.set_device('dev_5')
+
+
+def test_apply_settings(vivado):
+    vivado.set_device('target_0 dev_0')
+    vivado.sio = 'MGT_X0Y0'
+    apply_settings(vivado, {'TXPRE': '{0.22 dB (00001)}', 'TXPOST': '{0.45 dB (00010)}'})
+    assert vivado.do('get_property TXPRE [get_hw_sio_gts]') == '0.22 dB (00001)'
+
+    # The failed commands and the values not taken are errors.
+    vivado.do('rename commit_hw_sio commit_hw_sio_orig')
+    vivado.do('proc commit_hw_sio {args} { error "ERROR: \\[Labtools 27-3\\] Cannot commit" }')
+    with pytest.raises(pylinx.PylinxException, match='Cannot commit'):
+        apply_settings(vivado, {'TXPRE': '{0.45 dB (00010)}'})
+    vivado.do('rename commit_hw_sio {}; rename commit_hw_sio_orig commit_hw_sio')
+    with pytest.raises(pylinx.PylinxException, match='Cannot set TXDIFFSWING'):
+        apply_settings(vivado, {'TXDIFFSWING': ''})
+
+
+def test_optimizing_finder_resume(vivado, tmp_path):
+    vivado.set_device('target_0 dev_0')
+    vivado.sio = 'MGT_X0Y0'
+    results_dir = str(tmp_path / 'runs')
+    journal_path = os.path.join(results_dir, 'journal.jsonl')
+    with SweepJournal(journal_path, resume=False) as journal:
+        best, _ = cleye.optimizing_finder(vivado, vivado, budget=3, results_dir=results_dir, journal=journal)
+    scans = int(vivado.do('set ::scan_count'))
+    assert scans == 3
+    assert journal.best == best
+
+    # The resumed search starts from the best settings, the scanned settings are not scanned again.
+    with SweepJournal(journal_path) as journal:
+        assert cleye.optimizing_finder(vivado, vivado, budget=3, results_dir=results_dir, journal=journal)[0] == best
+    assert int(vivado.do('set ::scan_count')) == scans
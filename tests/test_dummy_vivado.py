@@ -89,3 +89,199 @@ def test_vivado_interact():
         
     finally:
         assert vivado.exit() == 0
+
+
+def test_vivado_pool():
+    def reset(vivado):
+        vivado.do('unset -nocomplain a')
+
+    pool = pylinx.VivadoPool(size=2, reset=reset, max_uses=2, executable='tclsh', args=[], prompt='% ')
+    try:
+        first = pool.acquire(timeout=10)
+        second = pool.acquire(timeout=10)
+        assert first.pid() != second.pid()
+        with pytest.raises(pylinx.PylinxException):
+            pool.acquire(timeout=.1)
+
+        first.set_var('a', 5)
+        first_pid = first.pid()
+        pool.release(first)
+        pool.release(second)
+
+        # The reset hook has been run on the recycled session.
+        sessions = [pool.acquire(timeout=10) for _ in range(2)]
+        for vivado in sessions:
+            with pytest.raises(pylinx.PylinxException):
+                vivado.get_var('a')
+            pool.release(vivado)
+
+        # Both sessions has been used twice: they are replaced.
+        with pool.session(timeout=10) as vivado:
+            assert vivado.pid() != first_pid
+            assert vivado.do('expr 6 * 7') == '42'
+
+        # A session left by an error is replaced.
+        with pytest.raises(ValueError):
+            with pool.session(timeout=10) as vivado:
+                broken_pid = vivado.pid()
+                raise ValueError('broken')
+        sessions = [pool.acquire(timeout=10) for _ in range(2)]
+        for vivado in sessions:
+            assert vivado.pid() != broken_pid
+            pool.release(vivado)
+    finally:
+        pool.close()
+
+
+def test_vivado_do_batch():
+    vivado = pylinx.Vivado(executable='tclsh', args=[], prompt='% ')
+
+    try:
+        ans = vivado.do_batch(['set a 5', 'set b 4', 'expr $a + $b', 'puts hello\nputs world',
+                               'set c {x y}', 'set d x\\{', 'puts -nonewline abc', 'expr $e'])
+        assert ans == ['5', '4', '9', 'hello' + os.linesep + 'world', 'x y', 'x{', 'abc',
+                       'can\'t read "e": no such variable']
+        assert list(vivado.last_cmds)[-2:] == ['puts -nonewline abc', 'expr $e']
+        assert vivado.do('expr $a + $b') == '9'
+
+        with pytest.raises(pylinx.PylinxException):
+            vivado.do_batch(['set f 6', 'expr $e'], errmsgs=['no such variable'])
+        with pytest.raises(pylinx.PylinxException):
+            vivado.do_batch(['set f 7', ('expr $e', ['no such variable'])])
+        # The commands after the failing one have been run.
+        assert vivado.get_var('f') == '7'
+
+        assert vivado.do_batch(['incr a'] * 300)[-1] == '305'
+    finally:
+        assert vivado.exit() == 0
+
+
+def test_vivado_history(tmp_path):
+    transcript = str(tmp_path / 'transcript.log')
+    vivado = pylinx.Vivado(executable='tclsh', args=[], prompt='% ', history_size=3,
+                           history_max_bytes=2000, transcript=transcript)
+
+    try:
+        for i in range(10):
+            vivado.set_var('a', i)
+        assert list(vivado.last_cmds) == ['set a 7', 'set a 8', 'set a 9']
+        assert len(vivado.last_befores) == len(vivado.last_prompts) == 3
+
+        vivado.do('string repeat x 1500')
+        vivado.do('string repeat y 1000')
+        # The oldest entries have been dropped because of the size limit.
+        assert list(vivado.last_cmds) == ['string repeat y 1000']
+        assert vivado.history.nbytes <= 2000
+
+        vivado.interact('set a')
+    finally:
+        assert vivado.exit() == 0
+
+    with open(transcript) as f:
+        content = f.read()
+    for i in range(10):
+        assert 'set a {}'.format(i) in content
+    assert 'x' * 1500 in content
+
+
+def test_vivado_property_cache():
+    vivado = pylinx.Vivado(executable='tclsh', args=[], prompt='% ', cache=True, cache_ttl=.5)
+
+    try:
+        dummy_prop = os.path.abspath(os.path.join(__here__, 'dummy_vivado.tcl'))
+        dummy_prop = dummy_prop.replace(os.sep, '/')
+        vivado.do('source ' + dummy_prop)
+        vivado.do('proc commit_hw_sio {args} {}')
+        vivado.do('proc get_hw_sio_gts {args} {return "MGT_X0Y0 MGT_X0Y1"}')
+
+        vivado.set_property('freqency', '{100 MHz}', 'sys_clock')
+        commands = len(vivado.history)
+        # Write-through: no command is needed.
+        assert vivado.get_property('freqency', 'sys_clock') == '100 MHz'
+        assert len(vivado.history) == commands
+        assert vivado.get_objects('get_hw_sio_gts') == ['MGT_X0Y0', 'MGT_X0Y1']
+        assert vivado.get_objects('get_hw_sio_gts') == ['MGT_X0Y0', 'MGT_X0Y1']
+        assert len(vivado.history) == commands + 1
+        assert vivado.cache.hits == 2
+
+        # The property is changed behind the cache, the set_property invalidates it. The commit doesn't
+        # invalidate the object queries.
+        vivado.do('set_property freqency 200 sys_clock')
+        vivado.do('commit_hw_sio [get_hw_sio_gts]')
+        assert vivado.get_property('freqency', 'sys_clock') == '200'
+        assert vivado.get_property('freqency', 'sys_clock') == '200'
+        assert vivado.cache.stats() == {'hits': 3, 'misses': 2, 'entries': 2}
+
+        # The entries expire.
+        time.sleep(.6)
+        assert vivado.get_property('freqency', 'sys_clock') == '200'
+        assert vivado.cache.misses == 3
+    finally:
+        assert vivado.exit() == 0
+
+
+def test_vivado_property_cache_commit():
+    vivado = pylinx.Vivado(executable='tclsh', args=[], prompt='% ', cache=True)
+
+    try:
+        dummy_prop = os.path.abspath(os.path.join(__here__, 'dummy_vivado.tcl'))
+        dummy_prop = dummy_prop.replace(os.sep, '/')
+        vivado.do('source ' + dummy_prop)
+        vivado.do('proc commit_hw_sio {args} {}')
+        vivado.do('proc get_hw_sio_gts {args} {return "MGT_X0Y0"}')
+        vivado.do('proc get_hw_sio_links {args} {return "link_0"}')
+        gt = '[get_hw_sio_gts MGT_X0Y0]'
+        link = '[get_hw_sio_links link_0]'
+        assert vivado.get_objects('get_hw_sio_gts') == ['MGT_X0Y0']
+        vivado.set_property('DESCRIPTION', 'loopback', link)
+
+        # Set, commit, get: only the committed object is read again.
+        for value in ['{0.00 dB (00000)}', '{0.22 dB (00001)}']:
+            commands = len(vivado.history)
+            hits = vivado.cache.hits
+            vivado.set_property('TXPRE', value, gt)
+            vivado.do('commit_hw_sio ' + gt)
+            assert vivado.get_property('TXPRE', gt) == value[1:-1]
+            assert vivado.get_objects('get_hw_sio_gts') == ['MGT_X0Y0']
+            assert vivado.get_property('DESCRIPTION', link) == 'loopback'
+            assert len(vivado.history) == commands + 3
+            assert vivado.cache.hits == hits + 2
+
+        # The properties read by a batch are cached, unless they are changed later in the batch.
+        vivado.do_batch(['set_property TXPRE {0.45 dB (00010)} ' + gt, 'commit_hw_sio ' + gt,
+                         'get_property TXPRE ' + gt, 'get_property DESCRIPTION ' + link,
+                         'set_property DESCRIPTION other ' + link])
+        commands = len(vivado.history)
+        assert vivado.get_property('TXPRE', gt) == '0.45 dB (00010)'
+        assert len(vivado.history) == commands
+        assert vivado.get_property('DESCRIPTION', link) == 'other'
+        assert len(vivado.history) == commands + 1
+    finally:
+        assert vivado.exit() == 0
+
+
+def test_vivado_get_properties():
+    vivado = pylinx.Vivado(executable='tclsh', args=[], prompt='% ', cache=True)
+
+    try:
+        dummy_prop = os.path.abspath(os.path.join(__here__, 'dummy_vivado.tcl'))
+        dummy_prop = dummy_prop.replace(os.sep, '/')
+        vivado.do('source ' + dummy_prop)
+        vivado.set_property('TXPRE', '{0.00 dB (00000)}', 'gt0')
+        vivado.set_property('TXPOST', '{0.45 dB (00010)}', 'gt0')
+        vivado.set_property('TXPRE', '{0.22 dB (00001)}', 'gt1')
+        vivado.set_property('NOTE', '"first\\nsecond"', 'gt1')
+
+        assert vivado.get_properties('gt0', ['TXPRE', 'TXPOST']) == {
+            'TXPRE': '0.00 dB (00000)', 'TXPOST': '0.45 dB (00010)'}
+        assert vivado.get_all_properties(['gt0', 'gt1']) == {
+            'gt0': {'TXPRE': '0.00 dB (00000)', 'TXPOST': '0.45 dB (00010)'},
+            'gt1': {'TXPRE': '0.22 dB (00001)', 'NOTE': 'first\nsecond'}}
+        commands = len(vivado.history)
+        assert vivado.get_property('NOTE', 'gt1') == 'first\nsecond'
+        assert len(vivado.history) == commands
+
+        with pytest.raises(pylinx.PylinxException):
+            vivado.get_properties('gt0', ['NONEXISTENT'])
+    finally:
+        assert vivado.exit() == 0
@@ -3,8 +3,12 @@
 #
 # Import built in packages
 #
+import asyncio
 import pytest
 import time
+import socket
+import sys
+import threading
 from subprocess import Popen
 
 # inport DUT
@@ -13,16 +17,16 @@ import pylinx
 
 def test_xsct_dummy_server():
     xsct_server = pylinx.XsctServer()
-    xsct_server._start_dummy_server()
-    time.sleep(.1)
+    xsct_server._start_dummy_server(wait_ready=True)
+    assert xsct_server.startup_latency > 0
+    assert xsct_server.wait_ready() == xsct_server.startup_latency
     xsct_server.stop_server()
     
     
 def test_xsct():
     xsct_server = pylinx.XsctServer()
     try:
-        xsct_server._start_dummy_server()
-        time.sleep(.1)
+        xsct_server._start_dummy_server(wait_ready=True)
         xsct = pylinx.Xsct()
         
         assert int(xsct.do('pid')) == xsct_server.pid()
@@ -35,4 +39,196 @@ def test_xsct():
         xsct.send('exit')
         xsct.close()
     finally:
-        xsct_server.stop_server()
\ No newline at end of file
+        xsct_server.stop_server()
+
+def test_xsct_do_many():
+    xsct_server = pylinx.XsctServer()
+    try:
+        xsct_server._start_dummy_server(delay=0, wait_ready=True)
+        xsct = pylinx.Xsct()
+
+        assert xsct.do_many(['set a 5', 'set b 4', 'expr $a + $b']) == ['5', '4', '9']
+        assert xsct.do_many(['incr a'] * 10, window=3) == [str(i) for i in range(6, 16)]
+
+        # The failing command does not break the stream: the answers after it are read too.
+        with pytest.raises(pylinx.PylinxException):
+            xsct.do_many(['set c 1', 'expr $a + $d', 'set e 2'])
+        assert xsct.do('expr $c + $e') == '3'
+
+        ans = xsct.do_many(['set f 6', 'expr $a + $d', 'set g 7'], return_exceptions=True)
+        assert ans[0] == '6'
+        assert isinstance(ans[1], pylinx.PylinxException)
+        assert ans[2] == '7'
+
+        xsct.send('exit')
+        xsct.close()
+    finally:
+        xsct_server.stop_server()
+
+
+def test_xsct_large_answer():
+    xsct_server = pylinx.XsctServer()
+    try:
+        xsct_server._start_dummy_server(delay=0, wait_ready=True)
+        xsct = pylinx.Xsct()
+
+        ans = xsct.do_many(['string repeat abc 1000000', 'set a 5'])
+        assert ans == ['abc' * 1000000, '5']
+
+        xsct.send('exit')
+        xsct.close()
+    finally:
+        xsct_server.stop_server()
+
+
+def test_xsct_recv_framing():
+    xsct = pylinx.Xsct(host=None, recv_bufsize=7)
+    xsct._socket, server = socket.socketpair()
+    try:
+        # The answers and even the line-endings are split between the reads.
+        server.sendall(b'okay first\r\nokay sec')
+        server.sendall(b'ond\r')
+        server.sendall(b'\nerror third\r\nokay \xc3\xa1rv\xc3\xadzt\xc5\xb1r\xc5\x91\r\n')
+        assert xsct.recv() == 'okay first'
+        assert xsct.recv() == 'okay second'
+        assert xsct.recv() == 'error third'
+        assert xsct.recv() == 'okay \u00e1rv\u00edzt\u0171r\u0151'
+
+        server.close()
+        with pytest.raises(pylinx.PylinxException):
+            xsct.recv()
+    finally:
+        xsct.close()
+
+
+def test_async_xsct():
+    xsct_servers = [pylinx.XsctServer(), pylinx.XsctServer()]
+    ports = [pylinx.core.PORT, pylinx.core.PORT + 1]
+
+    async def session(port):
+        xsct = pylinx.AsyncXsct(timeout=5)
+        await xsct.connect(port=port)
+        try:
+            assert await xsct.do('set a {}'.format(port)) == str(port)
+            # Concurrent commands on the same connection are pipelined.
+            ans = await asyncio.gather(*[xsct.do('incr a') for _ in range(5)])
+            assert ans == [str(port + i) for i in range(1, 6)]
+            with pytest.raises(pylinx.PylinxException):
+                await xsct.do('expr $a + $c')
+            ans = await xsct.do_many(['set b 4', 'expr $c', 'expr $b + 1'], return_exceptions=True)
+            assert ans[0] == '4'
+            assert isinstance(ans[1], pylinx.PylinxException)
+            assert ans[2] == '5'
+            with pytest.raises(asyncio.TimeoutError):
+                await xsct.do('after 1000', timeout=.1)
+            # The answer of the timed out command is dropped.
+            assert await xsct.do('set b') == '4'
+            return await xsct.do('pid')
+        finally:
+            await xsct.close()
+
+    async def main():
+        return await asyncio.gather(*[session(port) for port in ports])
+
+    loop = asyncio.new_event_loop()
+    try:
+        for xsct_server, port in zip(xsct_servers, ports):
+            xsct_server._start_dummy_server(port=port, delay=10, wait_ready=True)
+        pids = loop.run_until_complete(main())
+        assert [int(pid) for pid in pids] == [xsct_server.pid() for xsct_server in xsct_servers]
+    finally:
+        loop.close()
+        for xsct_server in xsct_servers:
+            xsct_server.stop_server()
+
+
+def test_xsct_pool():
+    xsct_servers = [pylinx.XsctServer(), pylinx.XsctServer()]
+    ports = [pylinx.core.PORT, pylinx.core.PORT + 1]
+    errors = []
+
+    def worker(pool, worker_id):
+        try:
+            for i in range(10):
+                with pool.connection(timeout=10) as xsct:
+                    assert xsct.do_many(['set w{} {}'.format(worker_id, i),
+                                         'expr $w{} * 2'.format(worker_id)]) == [str(i), str(2 * i)]
+        except Exception as ex:
+            errors.append(ex)
+
+    try:
+        for xsct_server, port in zip(xsct_servers, ports):
+            xsct_server._start_dummy_server(port=port, delay=1, wait_ready=True)
+        pool = pylinx.XsctPool([('127.0.0.1', port) for port in ports], size=2, check_idle=0)
+        threads = [threading.Thread(target=worker, args=(pool, i)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+        # All the connections are open, but no more than size per endpoint.
+        xscts = [pool.checkout() for _ in range(4)]
+        assert sorted(xsct.address[1] for xsct in xscts) == sorted(ports * 2)
+        with pytest.raises(pylinx.PylinxException):
+            pool.checkout(timeout=.1)
+
+        # A broken connection is reconnected lazily.
+        xscts[0]._socket.close()
+        for xsct in xscts:
+            pool.checkin(xsct)
+        pids = set(int(pool.do('pid')) for _ in range(8))
+        assert pids <= set(xsct_server.pid() for xsct_server in xsct_servers)
+
+        # Command errors do not break the connection
+        with pytest.raises(pylinx.PylinxException):
+            pool.do('expr $nonexistent')
+        assert pool.do('expr 6 * 7') == '42'
+
+        pool.close()
+        with pytest.raises(pylinx.PylinxException):
+            pool.checkout()
+    finally:
+        for xsct_server in xsct_servers:
+            xsct_server.stop_server()
+
+
+def test_xsct_server_not_ready():
+    xsct_server = pylinx.XsctServer()
+    try:
+        # The dummy server cannot listen on a port number out of range: it exits.
+        xsct_server._start_dummy_server(port=100000)
+        with pytest.raises(pylinx.PylinxException):
+            xsct_server.wait_ready(timeout=5)
+    finally:
+        xsct_server.stop_server()
+
+
+def test_xsct_server_fleet():
+    fleet = pylinx.XsctServerFleet()
+    try:
+        servers = fleet._start_dummy_servers(8, delay=0)
+        assert len(set(server.port for server in servers)) == 8
+        assert all(fleet.alive().values())
+
+        pool = pylinx.XsctPool(fleet.endpoints(), size=1)
+        xscts = [pool.checkout() for _ in range(8)]
+        assert set(int(xsct.do('pid')) for xsct in xscts) == set(server.pid() for server in servers)
+        for xsct in xscts:
+            pool.checkin(xsct)
+        pool.close()
+
+        # A server, which ignores SIGTERM is killed after the grace time.
+        stubborn = pylinx.XsctServer()
+        stubborn._launch_child([sys.executable, '-c', 'import signal, time; '
+                                'signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)'],
+                               new_process_group=True)
+        fleet.servers.append(stubborn)
+        time.sleep(.2)
+
+        procs = [server._xsct_server for server in fleet.servers]
+        assert fleet.stop(grace=.5) < 5
+        assert all(proc.returncode is not None for proc in procs)
+        assert fleet.alive() == {}
+    finally:
+        fleet.stop()
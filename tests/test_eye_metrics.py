@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import glob
+import os
+
+import numpy as np
+import pytest
+
+# import DUT
+import pylinx
+from pylinx import eye_metrics
+
+# The directory of this script file.
+__here__ = os.path.dirname(os.path.realpath(__file__))
+resources = os.path.join(__here__, 'resources')
+
+
+def load_scans():
+    return [pylinx.ScanStructure(filename) for filename in sorted(glob.glob(os.path.join(resources, '*.csv')))]
+
+
+def test_batch_metrics_match_scan_structure():
+    scans = load_scans()
+    results = eye_metrics.batch_metrics(scans)
+    assert len(results) == len(scans)
+    for scan, metrics in zip(scans, results):
+        assert metrics['valid'] == scan._test_eye()
+        assert metrics['open_area'] == scan.get_open_area()
+        area = scan._get_area()
+        if area is False:
+            assert np.isnan(metrics['center_area'])
+        else:
+            assert metrics['center_area'] == area
+        assert len(metrics['contour_left']) == len(scan['scanData']['y'])
+
+
+def test_batch_metrics_ber_list():
+    scan = pylinx.ScanStructure(os.path.join(resources, 'valid_eye_sweep_01.csv'))
+    stack = eye_metrics.stack_scans([scan])
+    levels = [1e-6, 1e-3]
+    for metrics in eye_metrics.batch_metrics([scan, scan, scan], ber=levels):
+        assert metrics['open_area'] == scan.get_open_area()
+        assert metrics['horizontal_opening'] == list(eye_metrics.horizontal_openings(stack, levels)[:, 0])
+        assert metrics['horizontal_opening'][0] < metrics['horizontal_opening'][1]
+        assert len(metrics['contour_right']) == 2
+        assert len(metrics['contour_right'][0]) == len(scan['scanData']['y'])
+
+
+def test_stack_scans():
+    scans = [scan for scan in load_scans() if scan['scanData']['values'].shape == (31, 17)]
+    stack = eye_metrics.stack_scans(scans)
+    assert stack.values.shape == (len(scans), 31, 17)
+
+    with pytest.raises(pylinx.PylinxException):
+        eye_metrics.stack_scans(load_scans())
+
+
+def test_openings_and_contours():
+    scan = pylinx.ScanStructure(os.path.join(resources, 'valid_eye_sweep_01.csv'))
+    stack = eye_metrics.stack_scans([scan])
+    x = scan['scanData']['x']
+    center_row = scan['scanData']['values'][list(scan['scanData']['y']).index(0.0)]
+
+    # Reference: the open columns of the center row around x = 0.
+    openings = eye_metrics.horizontal_openings(stack, [1e-9, 1e-6, 1.0])
+    assert openings.shape == (3, 1)
+    open_x = x[center_row <= 1e-6]
+    assert openings[1][0] == open_x.max() - open_x.min()
+    assert openings[2][0] == 1.0
+    assert eye_metrics.horizontal_openings(stack, 1e-6)[0] == openings[1][0]
+
+    vertical = eye_metrics.vertical_openings(stack, [1e-6, 1.0])
+    assert vertical[1][0] == 240.0
+    assert 0.0 < vertical[0][0] < 240.0
+
+    left, right = eye_metrics.eye_contours(stack, 1e-6)
+    assert left.shape == right.shape == (1, 31)
+    center = list(scan['scanData']['y']).index(0.0)
+    assert right[0][center] - left[0][center] == openings[1][0]
+    # The top row is closed.
+    assert np.isnan(left[0][0]) and np.isnan(right[0][0])
+
+
+def test_normalized_metrics():
+    for scan in load_scans():
+        metrics = eye_metrics.normalized_metrics(scan)
+        assert metrics['valid'] == scan._test_eye()
+        assert 0.0 <= metrics['score'] <= 1.0
+        assert 0.0 <= metrics['open_fraction'] <= 1.0
+        if scan['scanData']['scanType'] == '1d bathtub':
+            assert metrics['vertical_opening'] is None
+        else:
+            assert 0.0 <= metrics['vertical_opening'] <= 1.0
+        if not metrics['valid']:
+            assert metrics['score'] == 0.0
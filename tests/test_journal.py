@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import os
+import shutil
+
+# import DUT
+from pylinx.journal import SweepJournal
+
+# The directory of this script file.
+__here__ = os.path.dirname(os.path.realpath(__file__))
+resources = os.path.join(__here__, 'resources')
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / 'runs' / 'journal.jsonl')
+    scans = []
+    for name in ('valid_eye_sweep_01', 'valid_eye_sweep_02'):
+        scans.append(str(tmp_path / (name + '.csv')))
+        shutil.copy(os.path.join(resources, name + '.csv'), scans[-1])
+
+    point_1 = {'iteration': 0, 'parameter': 'TXPRE', 'value': '{0.22 dB (00001)}'}
+    point_2 = {'iteration': 0, 'parameter': 'TXPRE', 'value': '{0.45 dB (00010)}'}
+    with SweepJournal(path) as journal:
+        journal.record_point(point_1, scans[0], {'open_area': 2496.0})
+        journal.record_point(point_2, scans[1], {'open_area': 784.0})
+        journal.record_best('TXPRE', '{0.22 dB (00001)}')
+    # A crash while writing a record.
+    with open(path, 'a') as f:
+        f.write('{"kind": "point", "point": {"iter')
+
+    with SweepJournal(path, resume=True) as journal:
+        assert journal.best == {'TXPRE': '{0.22 dB (00001)}'}
+        assert journal.completed(dict(reversed(list(point_1.items()))))['metrics'] == {'open_area': 2496.0}
+        assert journal.completed({'iteration': 0, 'parameter': 'TXPRE', 'value': '{0.68 dB (00011)}'}) is None
+
+        # A changed (eg. half written) scan file is scanned again.
+        with open(scans[1], 'a') as f:
+            f.write('garbage\n')
+        assert journal.completed(point_2) is None
+        assert journal.completed(point_2, verify=False) is not None
+        journal.record_point(point_2, scans[1], {'open_area': 700.0})
+
+    with SweepJournal(path) as journal:
+        assert journal.completed(point_2)['metrics'] == {'open_area': 700.0}
+        os.remove(scans[0])
+        assert journal.completed(point_1) is None
+
+    # Without resume the journal starts from scratch.
+    with SweepJournal(path, resume=False) as journal:
+        assert not journal.points and not journal.best
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+
+import pytest
+
+# import DUT
+from pylinx import optimizer
+
+
+def codes(count, unit='dB'):
+    return ['{{{}.00 {} ({:05b})}}'.format(i, unit, i) for i in range(count)]
+
+
+space = {
+    'TXDIFFSWING': codes(12, 'mV'),
+    'TXPRE': codes(10),
+    'TXPOST': codes(8),
+}
+
+
+def open_area(settings):
+    """Synthetic, unimodal open area with its maximum (1000) at 8, 2, 6."""
+    a, b, c = [int(value.strip('{}').split('.')[0]) for value in settings.values()]
+    return 1000.0 - (3 * (a - 8) ** 2 + 5 * (b - 2) ** 2 + 4 * (c - 6) ** 2 + 2 * (a - 8) * (b - 2))
+
+
+def test_dedupe_values():
+    values = ['{5.60 dB (10011)}', '{6.02 dB (10100)}', '{6.02 dB (10101)}', '{6.02 dB (10110)}', '{6.47 dB (10111)}']
+    assert optimizer.dedupe_values(values) == ['{5.60 dB (10011)}', '{6.02 dB (10100)}', '{6.47 dB (10111)}']
+    assert optimizer.value_label('{850 mV}') == '850 mV'
+    assert optimizer.ParameterSpace({'TXPRE': values}).shape == (3,)
+
+
+@pytest.mark.parametrize('strategy', [optimizer.CoordinateDescent(), optimizer.PatternSearch(),
+                                      optimizer.SurrogateSearch()])
+def test_strategies(strategy):
+    objective = optimizer.optimize(space, open_area, strategy)
+    assert objective.best_score == 1000.0
+    assert objective.space.settings(objective.best_point)['TXPRE'] == '{2.00 dB (00010)}'
+    # A fraction of the exhaustive search.
+    assert objective.evaluations < objective.space.size / 20
+
+
+def test_memoization_and_budget():
+    calls = []
+
+    def counted(settings):
+        calls.append(settings)
+        return open_area(settings)
+
+    objective = optimizer.optimize(space, counted, optimizer.PatternSearch(), budget=5)
+    assert objective.evaluations == len(calls) == 5
+    # The same point is not evaluated twice.
+    assert len(set(tuple(settings.values()) for settings in calls)) == 5
+    assert objective.best_score == max(open_area(settings) for settings in calls)
+
+    start = {'TXDIFFSWING': space['TXDIFFSWING'][8], 'TXPRE': space['TXPRE'][2], 'TXPOST': space['TXPOST'][6]}
+    objective = optimizer.optimize(space, open_area, optimizer.CoordinateDescent(), start=start)
+    assert objective.best_point == (8, 2, 6)
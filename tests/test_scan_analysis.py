@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import os
+import shutil
+
+# import DUT
+import pylinx
+from pylinx import scan_analysis
+
+# The directory of this script file.
+__here__ = os.path.dirname(os.path.realpath(__file__))
+resources = os.path.join(__here__, 'resources')
+
+
+def valid_only(scan):
+    return {'valid': scan._test_eye(), 'open_area': scan['Open Area'] if scan._test_eye() else 0.0}
+
+
+def test_analyze_scans(tmp_path):
+    for filename in ['valid_eye_sweep_01.csv', 'non_valid_eye_sweep_01.csv', 'valid_eye_bathtub_sweep_01.csv']:
+        shutil.copy(os.path.join(resources, filename), str(tmp_path))
+    with open(str(tmp_path / 'malformed.csv'), 'w') as f:
+        f.write('Scan Name,malformed\nScan Start\n2d statistical,-64,0,64\n0,1,2\nScan End\n')
+
+    for workers in [1, 2]:
+        results = dict((os.path.basename(r.path), r) for r in pylinx.analyze_scans(str(tmp_path), workers=workers))
+        assert sorted(results) == ['malformed.csv', 'non_valid_eye_sweep_01.csv', 'valid_eye_bathtub_sweep_01.csv',
+                                   'valid_eye_sweep_01.csv']
+        assert 'PylinxException' in results['malformed.csv'].error
+        for name in ['non_valid_eye_sweep_01', 'valid_eye_bathtub_sweep_01', 'valid_eye_sweep_01']:
+            result = results[name + '.csv']
+            assert result.error is None
+            assert result.scan_name == name
+            scan = pylinx.ScanStructure(result.path)
+            assert result.metrics == {'valid': scan._test_eye(), 'open_area': scan.get_open_area(), 'stopped': False}
+
+    results = list(pylinx.analyze_scans([str(tmp_path / 'valid_eye_sweep_01.csv')], workers=2, scorer=valid_only))
+    assert results[0].metrics == {'valid': True, 'open_area': 2496.0}
+
+
+def test_analyze_scans_main(capsys):
+    scan_analysis.main([resources, '--workers', '2', '--sort'])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 14
+    assert lines[0].split('\t')[1] == 'valid_eye_sweep_01'
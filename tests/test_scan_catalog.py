@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+# import DUT
+import pylinx
+
+# The directory of this script file.
+__here__ = os.path.dirname(os.path.realpath(__file__))
+resources = os.path.join(__here__, 'resources')
+
+
+def test_scan_catalog(tmp_path):
+    scan_dir = tmp_path / 'runs'
+    shutil.copytree(resources, str(scan_dir))
+    db_path = str(tmp_path / 'catalog.sqlite')
+
+    with pylinx.ScanCatalog(db_path) as catalog:
+        assert catalog.update(str(scan_dir), workers=2) == 14
+        assert len(catalog) == 14
+        # Nothing has changed.
+        assert catalog.update(str(scan_dir), workers=2) == 0
+
+        best = catalog.top(3)
+        assert [entry['scan_name'] for entry in best] == ['valid_eye_sweep_01', 'valid_eye_sweep_02',
+                                                          'valid_eye_bathtub_sweep_02']
+        assert best[0]['valid'] is True
+        assert best[0]['header']['Horizontal Opening'] == 25.0
+
+        entries = catalog.top(where={'RXTERM': '850 mV'})
+        assert [entry['scan_name'] for entry in entries] == ['valid_eye_but_closed_sweep_01']
+        assert entries[0]['params'] == {'RXTERM': '850 mV'}
+        entries = catalog.top(where={'DRP.RX_DFE_H2_CFG': '110'}, order_by='scan_name')
+        assert [entry['scan_name'] for entry in entries] == ['non_valid_eye_sweep_02', 'non_valid_eye_sweep_01']
+        assert len(catalog.top(None, valid_only=True)) == 7
+
+    # The catalog is persistent, only the changed and the new files are parsed.
+    changed = scan_dir / 'valid_eye_sweep_02.csv'
+    os.utime(str(changed), ns=(0, 12345000000001))
+    with open(str(scan_dir / 'malformed.csv'), 'w') as f:
+        f.write('Scan Name,malformed\n')
+    with pylinx.ScanCatalog(db_path) as catalog:
+        assert catalog.update(str(scan_dir), workers=1) == 2
+        assert catalog.get(str(changed))['mtime_ns'] == os.stat(str(changed)).st_mtime_ns
+        assert [os.path.basename(path) for path, _ in catalog.errors()] == ['malformed.csv']
+        assert len(catalog) == 15
+
+        os.remove(str(changed))
+        assert catalog.prune() == 1
+        assert catalog.get(str(changed)) is None
+
+
+def test_scan_catalog_mtime_ns(tmp_path):
+    scan_dir = tmp_path / 'runs'
+    scan_dir.mkdir()
+    scan = scan_dir / 'valid_eye_sweep_01.csv'
+    shutil.copy(os.path.join(resources, 'valid_eye_sweep_01.csv'), str(scan))
+    os.utime(str(scan), ns=(0, 1600000000123456789))
+    db_path = str(tmp_path / 'catalog.sqlite')
+
+    # An old catalog (with float modification times) is rebuilt.
+    with sqlite3.connect(db_path) as db:
+        db.execute('CREATE TABLE scans (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL)')
+        db.execute('CREATE TABLE params (path TEXT NOT NULL, name TEXT NOT NULL, value TEXT)')
+    with pylinx.ScanCatalog(db_path) as catalog:
+        assert catalog.update(str(scan_dir)) == 1
+        if os.stat(str(scan)).st_mtime_ns != 1600000000123456789:
+            pytest.skip('The file system has no ns resolution of the modification times.')
+        # A change within the precision of a float time stamp is detected.
+        os.utime(str(scan), ns=(0, 1600000000123456790))
+        assert catalog.update(str(scan_dir)) == 1
+        assert catalog.get(str(scan))['mtime_ns'] == 1600000000123456790
+        assert catalog.update(str(scan_dir)) == 0
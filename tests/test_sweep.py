@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+#
+# Import built in packages
+#
+import threading
+import time
+
+# import DUT
+from pylinx import sweep
+
+
+def fake_measure(link, settings, scan_file):
+    time.sleep(0.01)
+    if link.tx == 'broken':
+        raise RuntimeError('Board is not responding')
+    return {'valid': True, 'open_area': float(settings['A'] * 10 + settings['B'])}
+
+
+def test_grid_points():
+    points = sweep.grid_points({'A': [1, 2], 'B': ['x', 'y', 'z']})
+    assert len(points) == 6
+    assert points[0] == {'A': 1, 'B': 'x'}
+    assert points[-1] == {'A': 2, 'B': 'z'}
+    assert sweep.scan_filename(3, {'TXPRE': '{0.22 dB (00001)}'}) == '0003_TXPRE_0_22_dB__00001__.csv'
+
+
+def test_parallel_sweep(tmp_path):
+    links = [sweep.SweepLink('board{}'.format(i), 'tx', 'rx') for i in range(4)]
+    points = sweep.grid_points({'A': list(range(5)), 'B': list(range(4))})
+    seen = []
+    started = set()
+    barrier = threading.Barrier(len(links), timeout=10)
+
+    def measure(link, settings, scan_file):
+        # The first points of all the links are measured at the same time (else the barrier is broken).
+        if link.name not in started:
+            started.add(link.name)
+            barrier.wait()
+        return fake_measure(link, settings, scan_file)
+
+    scheduler = sweep.SweepScheduler(links, measure=measure, results_dir=str(tmp_path), on_result=seen.append)
+    results = scheduler.run(points)
+
+    assert len(results) == len(seen) == 20
+    assert [r.metrics['open_area'] for r in results] == sorted((a * 10.0 + b for a in range(5) for b in range(4)),
+                                                               reverse=True)
+    assert all(r.error is None and r.attempts == 1 for r in results)
+    # All the links have been used.
+    assert set(r.link for r in results) == set(link.name for link in links)
+
+
+def test_sweep_retries(tmp_path):
+    links = [sweep.SweepLink('good', 'tx', 'rx'), sweep.SweepLink('bad', 'broken', 'rx')]
+    points = sweep.grid_points({'A': list(range(3)), 'B': list(range(3))})
+    results = sweep.SweepScheduler(links, measure=fake_measure, results_dir=str(tmp_path),
+                                   max_link_failures=2).run(points)
+    # The points failed on the bad link are measured on the good one.
+    assert len(results) == 9
+    assert all(r.error is None and r.link == 'good' for r in results)
+    assert max(r.attempts for r in results) == 2
+
+    # Without a working link the points fail after the retries.
+    results = sweep.SweepScheduler([sweep.SweepLink('bad', 'broken', 'rx')], measure=fake_measure,
+                                   results_dir=str(tmp_path), retries=1, max_link_failures=100).run(points)
+    assert len(results) == 9
+    assert all(r.metrics is None and 'not responding' in r.error and r.attempts == 2 for r in results)
+
+    # The only link is retired, the remaining points are not measured.
+    results = sweep.SweepScheduler([sweep.SweepLink('bad', 'broken', 'rx')], measure=fake_measure,
+                                   results_dir=str(tmp_path), retries=5, max_link_failures=2).run(points)
+    assert len(results) == 9
+    assert all(r.metrics is None for r in results)
+
+
+def fidelity_measure(settings, fidelity):
+    # The coarse score is noisy, but it preserves the order of the good and the bad points.
+    score = settings['A'] * 10 + settings['B']
+    if fidelity is sweep.COARSE:
+        score += (settings['B'] % 2) * 5
+    return {'score': score / 100.0, 'fidelity': fidelity.name}
+
+
+def test_screen_and_confirm():
+    points = sweep.grid_points({'A': list(range(4)), 'B': list(range(6))})
+    measured = []
+
+    def measure(settings, fidelity):
+        measured.append(fidelity.name)
+        return fidelity_measure(settings, fidelity)
+
+    results = sweep.screen_and_confirm(points, measure, top_k=3)
+    assert measured.count('coarse') == 24 and measured.count('fine') == 3
+    best, coarse, fine = results[0]
+    assert best == {'A': 3, 'B': 5}
+    assert fine['fidelity'] == 'fine' and coarse['fidelity'] == 'coarse'
+    assert all(fine is None for _, _, fine in results[3:])
+
+
+def test_multi_fidelity_sweep(tmp_path):
+    def measure(link, settings, scan_file, fidelity):
+        assert scan_file.endswith('_{}.csv'.format(fidelity.name))
+        return fidelity_measure(settings, fidelity)
+
+    links = [sweep.SweepLink('board{}'.format(i), 'tx', 'rx') for i in range(3)]
+    points = sweep.grid_points({'A': list(range(4)), 'B': list(range(6))})
+    results = sweep.SweepScheduler(links, measure=measure, results_dir=str(tmp_path)).run_multi_fidelity(points, 2)
+    assert len(results) == 24
+    assert [r.metrics['fidelity'] for r in results[:3]] == ['fine', 'fine', 'coarse']
+    assert results[0].settings == {'A': 3, 'B': 5}
+    assert points[results[0].index] == results[0].settings
+
+
+def test_concurrent_runs(tmp_path):
+    # The runs of the same scheduler don't share their points and their results.
+    links = [sweep.SweepLink('board{}'.format(i), 'tx', 'rx') for i in range(2)]
+    scheduler = sweep.SweepScheduler(links, measure=fake_measure, results_dir=str(tmp_path))
+    points = [sweep.grid_points({'A': [a], 'B': list(range(10))}) for a in range(2)]
+    results = [None, None]
+
+    def run(i):
+        results[i] = scheduler.run(points[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i in range(2):
+        assert sorted(r.settings['B'] for r in results[i]) == list(range(10))
+        assert all(r.settings['A'] == i and r.error is None for r in results[i])
@@ -18,6 +18,11 @@
 #  - os needed for file and directory manipulation
 import sys
 import os
+import random
+import shutil
+import threading
+import time
+import pytest
 
 # To import pylinx we must add to path
 test_path = os.path.dirname(os.path.abspath(__file__))
@@ -82,3 +87,182 @@ def test_open_area():
             assert open_area > 0.0, 'Mismatch: at ' + name
         print(name + ': ' + str(open_area))
 
+
+
+def test_scan_data_arrays():
+    scan_structures = load_scans()
+    for name, scanStruct in scan_structures.items():
+        scan_data = scanStruct['scanData']
+        assert scan_data['values'].shape == (len(scan_data['y']), len(scan_data['x']))
+        assert scan_data['x'][0] == -0.5
+        assert scan_data['x'][-1] == 0.5
+        if 'bath' in name:
+            assert scan_data['scanType'] == '1d bathtub'
+            assert list(scan_data['y']) == [0.0]
+
+
+def test_lazy_scan_struct():
+    for name in names:
+        filename = os.path.join(test_path, 'resources', name + '.csv')
+        lazy = pylinx.ScanStructure(filename, lazy=True)
+        assert lazy['Scan Name'] == name
+        assert not lazy.is_loaded()
+        assert not hasattr(lazy, '__dict__')
+
+        full = pylinx.ScanStructure(filename)
+        assert lazy.get_open_area() == full.get_open_area()
+        assert lazy.is_loaded()
+        assert (lazy['scanData']['values'] == full['scanData']['values']).all()
+        assert set(lazy.keys()) == set(full.keys())
+        assert 'scanData' in lazy
+
+
+def test_scan_cache(tmp_path):
+    for name in names:
+        filename = str(tmp_path / (name + '.csv'))
+        shutil.copy(os.path.join(test_path, 'resources', name + '.csv'), filename)
+        full = pylinx.ScanStructure(filename)
+
+        # The first load creates the cache, the second one maps it.
+        first = pylinx.ScanStructure.load(filename)
+        assert os.path.exists(filename + '.pxscan')
+        cached = pylinx.ScanStructure.load(filename)
+        assert not cached['scanData']['values'].flags.writeable
+        assert not cached['scanData']['values'].flags.owndata
+        assert cached.header == full.header
+        assert cached['scanData']['scanType'] == full['scanData']['scanType']
+        for key in ('x', 'y', 'values'):
+            assert (cached['scanData'][key] == full['scanData'][key]).all()
+        assert cached.get_open_area() == full.get_open_area() == first.get_open_area()
+
+    # A changed csv regenerates the cache.
+    filename = str(tmp_path / 'valid_eye_but_closed_sweep_01.csv')
+    with open(filename) as f:
+        text = f.read()
+    with open(filename, 'w') as f:
+        f.write(text.replace('Scan Name,valid_eye_but_closed_sweep_01', 'Scan Name,changed'))
+    assert pylinx.ScanStructure.load(filename)['Scan Name'] == 'changed'
+    assert pylinx.ScanStructure.load(filename)['Scan Name'] == 'changed'
+
+    # A failed write leaves no temporary file behind.
+    os.remove(filename + '.pxscan')
+    os.mkdir(filename + '.pxscan')
+    with pytest.raises(OSError):
+        pylinx.ScanStructure(filename).write_cache()
+    assert not [f for f in os.listdir(str(tmp_path)) if f.endswith('.tmp')]
+
+
+def test_incremental_scan_reader():
+    for name in names:
+        filename = os.path.join(test_path, 'resources', name + '.csv')
+        with open(filename, 'rb') as f:
+            content = f.read()
+        full = pylinx.ScanStructure(filename)
+        rows = len(full['scanData']['y'])
+
+        reader = pylinx.IncrementalScanReader(filename)
+        position = 0
+        while position < len(content):
+            size = random.randint(1, 100)
+            reader.feed(content[position:position + size])
+            position += size
+            assert reader.rows_seen <= rows
+        assert reader.complete
+        assert reader.rows_seen == rows
+        scan = reader.scan()
+        assert scan.header == full.header
+        assert (scan['scanData']['values'] == full['scanData']['values']).all()
+        assert reader.metrics()['open_area'] == full.get_open_area()
+
+
+def test_incremental_scan_reader_partial_rows():
+    filename = os.path.join(test_path, 'resources', 'valid_eye_but_closed_sweep_01.csv')
+    with open(filename) as f:
+        lines = f.read().splitlines(True)
+    start = [line.startswith('Scan Start') for line in lines].index(True)
+
+    reader = pylinx.IncrementalScanReader(filename)
+    assert reader.metrics() == {'rows': 0, 'complete': False, 'valid': None, 'center_area': None}
+    # The header, the axis and 3 rows and a half.
+    reader.feed(''.join(lines[:start + 5]) + lines[start + 5][:7])
+    assert reader.rows_seen == 3
+    metrics = reader.metrics()
+    assert metrics['rows'] == 3 and not metrics['complete']
+    partial = pylinx.ScanStructure(filename)
+    for key in ('y', 'values'):
+        partial['scanData'][key] = partial['scanData'][key][:3]
+    assert metrics['valid'] == partial._test_eye()
+    assert metrics['center_area'] == partial._get_area()
+    reader.feed(lines[start + 5][7:])
+    assert reader.rows_seen == 4
+
+
+def test_follow_scan(tmp_path):
+    source = os.path.join(test_path, 'resources', 'valid_eye_sweep_01.csv')
+    with open(source, 'rb') as f:
+        lines = f.read().splitlines(True)
+    filename = str(tmp_path / 'scan.csv')
+
+    def write_slowly():
+        with open(filename, 'wb') as f:
+            for line in lines:
+                f.write(line)
+                f.flush()
+                time.sleep(0.002)
+
+    def write_snapshots():
+        # Growing snapshots, replaced by rename, the last one is complete.
+        for end in (len(lines) // 2, len(lines) - 1, len(lines)):
+            with open(filename + '.tmp', 'wb') as f:
+                f.writelines(lines[:end])
+            os.replace(filename + '.tmp', filename)
+            time.sleep(0.05)
+
+    for writer in (write_slowly, write_snapshots):
+        if os.path.exists(filename):
+            os.remove(filename)
+        thread = threading.Thread(target=writer)
+        thread.start()
+        reader = pylinx.IncrementalScanReader(filename)
+        progress = [r.rows_seen for r in reader.follow(interval=0.005, timeout=10)]
+        thread.join()
+        assert reader.complete
+        assert progress[-1] == 31
+        assert (reader.scan()['scanData']['values'] == pylinx.ScanStructure(source)['scanData']['values']).all()
+
+    # The writer has died before completing the scan.
+    with open(filename, 'wb') as f:
+        f.writelines(lines[:-5])
+    reader = pylinx.IncrementalScanReader(filename)
+    list(reader.follow(interval=0.005, timeout=10, running=lambda: False))
+    assert not reader.complete
+
+
+def test_scan_pruner():
+    pruner = pylinx.ScanPruner()
+    for name in names:
+        filename = os.path.join(test_path, 'resources', name + '.csv')
+        with open(filename, 'rb') as f:
+            lines = f.read().splitlines(True)
+        full = pylinx.ScanStructure(filename)
+
+        reader = pylinx.IncrementalScanReader(filename)
+        pruned_at = None
+        for line in lines:
+            reader.feed(line)
+            if pruned_at is None and pruner.check(reader, best=0.0):
+                pruned_at = reader.rows_seen
+        # Pruning is exact: only the scans with 0.0 open area are pruned.
+        if 'non_valid' in name:
+            assert pruned_at is not None, name
+            assert full.get_open_area() == 0.0
+        else:
+            assert pruned_at is None, name
+
+    # The closed eyes are pruned only if there is an open eye already.
+    pruner = pylinx.ScanPruner(closed_ber=1e-6)
+    reader = pylinx.IncrementalScanReader()
+    with open(os.path.join(test_path, 'resources', 'valid_eye_but_closed_sweep_01.csv'), 'rb') as f:
+        reader.feed(f.read())
+    assert pruner.check(reader, best=0.0) is None
+    assert pruner.check(reader, best=2496.0) == 'closed eye'